@@ -18,6 +18,11 @@ def show_detection_results(result, show_image=True):
         with col2:
             st.metric("Processing Time", f"{result['processing_time']:.2f}s")
         
+        # Full detections come with the annotated image
+        if result.get("detections"):
+            show_detections_table(result["detections"])
+            show_simple_stats(result["detections"])
+        
     else:
         # Handle regular classification response
         st.subheader("📊 Analysis Results")
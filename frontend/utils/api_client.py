@@ -32,26 +32,26 @@ class APIClient:
             return None
         
         
-    def classify_with_annotated_image(self, uploaded_file):
-        """Classify and get annotated image"""
+    def classify_with_annotated_image(self, uploaded_file, image_format="jpeg", quality=85, max_dim=1280):
+        """Classify and get annotated image together with the full result, in one request"""
         try:
             files = {"file": (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
-            response = requests.post(f"{self.api_url}/classify/annotate-image", files=files)
+            params = {"image_format": image_format, "quality": quality}
+            if max_dim:
+                params["max_dim"] = max_dim
+            response = requests.post(f"{self.api_url}/classify/annotated", files=files, params=params)
             
             if response.status_code == 200:
-                # For annotated images, we need to handle both image and data
-                annotated_image = Image.open(io.BytesIO(response.content))
+                result = response.json()
+                annotated = result.pop("annotated_image", None)
+                if annotated:
+                    image_data = base64.b64decode(annotated["data"])
+                    result["annotated_image"] = Image.open(io.BytesIO(image_data))
+                    result["image_data"] = image_data
                 
-                # Get detection info from headers
-                detection_count = response.headers.get("X-Detection-Count", 0)
-                processing_time = response.headers.get("X-Processing-Time", 0)
-                
-                return {
-                    "annotated_image": annotated_image,
-                    "detection_count": int(detection_count),
-                    "processing_time": float(processing_time),
-                    "image_data": response.content
-                }
+                # Keys of the former header-based response
+                result["detection_count"] = result["total_objects"]
+                return result
             else:
                 st.error(f"API Error: {response.json().get('detail', 'Unknown error')}")
                 return None
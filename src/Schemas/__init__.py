@@ -1,6 +1,6 @@
 from .detection import DetectionResult
 from .info import HealthCheck
-from .classificationResponse import ClassificationResponse
+from .classificationResponse import ClassificationResponse,AnnotatedClassificationResponse,AnnotatedImage,TilingReport
 from .batchProcessing import BatchClassificationResponse ,BatchClassificationResult
-from .info import ClassInfo,HealthCheck
+from .info import ClassInfo,HealthCheck,WorkerStatus,ModelStatus,ModelVersionStatus,DeployModelRequest,ModelWeightsRequest
 from .statistics import WasteStatistics
\ No newline at end of file
@@ -1,10 +1,11 @@
 from pydantic import BaseModel
 from typing import Optional,List
-from .classificationResponse import ClassificationResponse
+from .classificationResponse import ClassificationResponse,AnnotatedImage
 
 class BatchClassificationResult(BaseModel):
     filename: Optional[str]
     result: Optional[ClassificationResponse] = None
+    annotated_image: Optional[AnnotatedImage] = None
     error: Optional[str] = None
 
 class BatchClassificationResponse(BaseModel):
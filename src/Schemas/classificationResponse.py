@@ -1,12 +1,40 @@
-from pydantic import BaseModel
-from typing import List ,Dict
+from pydantic import BaseModel,Field
+from typing import List ,Dict,Optional
 from .statistics import WasteStatistics
 from .detection import DetectionResult
 
+class TilingReport(BaseModel):
+    tiles: int
+    full_frame: bool = Field(..., description="The downscaled full frame was classified along with the tiles")
+    tile_size: int
+    overlap: float
+    forward_passes: int
+    detections_before_merge: int
+    inference_ms: float
+    merge_ms: float
+    image_memory_mb: float = Field(..., description="Full-resolution decoded image")
+    input_tensor_memory_mb: float = Field(..., description="Estimated pooled input tensors of the concurrently running forward passes")
+
+
 class ClassificationResponse(BaseModel):
     detections: List[DetectionResult]
     total_objects: int
     processing_time: float
     image_size: Dict[str, int]
     waste_statistics: WasteStatistics
-    recycling_recommendations: List[str]
\ No newline at end of file
+    recycling_recommendations: List[str]
+    reused: bool = Field(False, description="True when detections were reused from a near-identical recent frame of the same source")
+    reuse_reason: Optional[str] = Field(None, description="'no_motion' (motion gate) or 'near_duplicate' (perceptual hash) when reused")
+    tracked: bool = Field(False, description="True when boxes were propagated by the tracker instead of running the detector")
+    tiling: Optional[TilingReport] = Field(None, description="Tile count, latency and memory when the image was classified tile by tile")
+
+
+class AnnotatedImage(BaseModel):
+    media_type: str
+    width: int
+    height: int
+    data: str = Field(..., description="Base64-encoded annotated image")
+
+
+class AnnotatedClassificationResponse(ClassificationResponse):
+    annotated_image: Optional[AnnotatedImage] = None
\ No newline at end of file
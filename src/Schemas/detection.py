@@ -8,4 +8,5 @@ class DetectionResult(BaseModel):
     confidence: float = Field(..., ge=0, le=1)
     bbox: BBox
     waste_category: WasteCategory
-    recycling_tip: Optional[str] = None
\ No newline at end of file
+    recycling_tip: Optional[str] = None
+    track_id: Optional[int] = Field(None, description="Stable object ID in detect-then-track mode")
\ No newline at end of file
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List ,Optional
+from pydantic import BaseModel,Field
+from typing import Dict ,List ,Optional
 from helpers.constants import WasteCategory
 
 
@@ -10,9 +10,56 @@ class ClassInfo(BaseModel):
     recycling_tip: str
     description: Optional[str] = None
 
+class WorkerStatus(BaseModel):
+    worker_id: int
+    pid: Optional[int] = None
+    alive: bool
+    cores: List[int]
+    in_flight: int
+    jobs: int
+    images: int
+    busy_seconds: float
+    utilization: float
+
+class ModelStatus(BaseModel):
+    state: str = Field(..., description="not_loaded, loading, ready or failed")
+    stage: Optional[str] = Field(None, description="Current loading step")
+    started_at: Optional[float] = None
+    elapsed_seconds: Optional[float] = None
+    load_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+class ModelVersionStatus(BaseModel):
+    name: str
+    model_version: Optional[str] = Field(None, description="Backend and weights checksum")
+    model_path: str
+    weight: float = Field(..., description="Share of the traffic relative to the other active versions")
+    state: str = Field(..., description="not_loaded, loading, ready, failed or retired")
+    main: bool = False
+    requests: int
+    in_flight: int
+    average_latency_ms: Optional[float] = None
+    deployed_at: float
+    activated_at: Optional[float] = None
+    load: ModelStatus
+
+class DeployModelRequest(BaseModel):
+    name: str = Field(..., min_length=1, max_length=64, pattern=r"^[A-Za-z0-9._-]+$")
+    model_path: str = Field(..., description="Weights (.pt) or exported ONNX graph on the server")
+    weight: Optional[float] = Field(None, ge=0, description="Serve next to the active versions with this weight instead of replacing them")
+    backend: Optional[str] = Field(None, description="ultralytics or onnx, INFERENCE_BACKEND by default")
+
+class ModelWeightsRequest(BaseModel):
+    weights: Dict[str, float]
+
 class HealthCheck(BaseModel):
     status: str
+    live: bool = True
+    ready: bool = True
     model_loaded: bool
+    model: Optional[ModelStatus] = None
     total_classes: int
     class_names: List[str]
-    version: str
\ No newline at end of file
+    version: str
+    workers: Optional[List[WorkerStatus]] = None
+    versions: Optional[List[ModelVersionStatus]] = None
\ No newline at end of file
@@ -1 +1,7 @@
-from .classification import ClassificationService
\ No newline at end of file
+from .classification import ClassificationService
+from .result_cache import result_cache
+from .frame_dedup import frame_deduplicator
+from .motion_gate import motion_gate
+from .stream_session import stream_registry
+from .tracking import ObjectTracker
+from .annotation import annotation_renderer
\ No newline at end of file
@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from helpers.constants import WasteCategory
+from helpers.image_utils import resize_to_max_dim
+from helpers.metrics import timed
+
+CATEGORY_COLORS={
+    WasteCategory.RECYCLABLE:(0,255,0),        # Green
+    WasteCategory.BIODEGRADABLE:(0,165,255),   # Orange
+}
+NON_RECYCLABLE_COLOR=(0,0,255)                 # Red for non-recyclable
+TEXT_COLOR=(255,255,255)
+FONT=cv2.FONT_HERSHEY_SIMPLEX
+
+
+class AnnotationRenderer:
+    """
+    Draw detection boxes and labels with as little per-detection work as possible.
+
+    Labels are rendered once per (class, category, confidence bucket) into small
+    sprites, anti-aliased text included, and then pasted with a slice assignment;
+    only the box outlines are drawn per detection. When a maximum size is requested
+    the image is downscaled first, so drawing and encoding run on the smaller canvas.
+    """
+    def __init__(self,font_scale:float=0.5,thickness:int=1,box_thickness:int=2,
+                 confidence_step:float=0.01,max_sprites:int=1024):
+        self.font_scale=font_scale
+        self.thickness=thickness
+        self.box_thickness=box_thickness
+        self.confidence_step=confidence_step
+        self.max_sprites=max(1,max_sprites)
+        self._sprites:"OrderedDict[tuple,np.ndarray]"=OrderedDict()
+        self._lock=threading.Lock()
+        self.sprite_hits=0
+        self.sprite_misses=0
+
+    @staticmethod
+    def color_for(category)->Tuple[int,int,int]:
+        return CATEGORY_COLORS.get(category,NON_RECYCLABLE_COLOR)
+
+    def _bucket(self,confidence:float)->int:
+        return int(round(confidence / self.confidence_step))
+
+    def label_sprite(self,class_name:str,category,confidence:float)->np.ndarray:
+        """Pre-rendered BGR label of a class at a confidence bucket"""
+        key=(class_name,category,self._bucket(confidence))
+        with self._lock:
+            sprite=self._sprites.get(key)
+            if sprite is not None:
+                self._sprites.move_to_end(key)
+                self.sprite_hits += 1
+                return sprite
+            self.sprite_misses += 1
+
+        label=f"{class_name} ({key[2] * self.confidence_step * 100:.0f}%)"
+        (text_width,text_height),baseline=cv2.getTextSize(label,FONT,self.font_scale,self.thickness)
+        sprite=np.empty((text_height + baseline,text_width,3),dtype=np.uint8)
+        sprite[:]=self.color_for(category)
+        cv2.putText(sprite,label,(0,text_height),FONT,self.font_scale,TEXT_COLOR,self.thickness,lineType=cv2.LINE_AA)
+
+        with self._lock:
+            self._sprites[key]=sprite
+            while len(self._sprites) > self.max_sprites:
+                self._sprites.popitem(last=False)
+        return sprite
+
+    @timed("annotate")
+    def render(self,image:np.ndarray,detections:list,scale:float=1.0,max_dim:Optional[int]=None)->np.ndarray:
+        """
+        Annotated copy of `image`.
+        Args:
+            image (np.ndarray): BGR image.
+            detections (List[DetectionResult]): List of detection results.
+            scale (float): Factor from detection coordinates to `image` pixels (reduced decode).
+            max_dim (int): Downscale the output so its long side fits, before drawing.
+        """
+        canvas=resize_to_max_dim(image,max_dim) if max_dim else image
+        if canvas is image:
+            canvas=image.copy()
+        scale*=canvas.shape[1] / image.shape[1]
+        height,width=canvas.shape[:2]
+
+        for det in detections:
+            x1,y1=int(det.bbox.x1 * scale),int(det.bbox.y1 * scale)
+            x2,y2=int(det.bbox.x2 * scale),int(det.bbox.y2 * scale)
+            color=self.color_for(det.waste_category)
+            cv2.rectangle(canvas,(x1,y1),(x2,y2),color,self.box_thickness)
+            self._paste(canvas,self.label_sprite(det.class_name,det.waste_category,det.confidence),x1,y1,width,height)
+        return canvas
+
+    @staticmethod
+    def _paste(canvas:np.ndarray,sprite:np.ndarray,x1:int,y1:int,width:int,height:int):
+        """Paste a label above the box corner, inside the box when there is no room above"""
+        sprite_height,sprite_width=sprite.shape[:2]
+        top=y1 - sprite_height if y1 >= sprite_height else max(0,y1)
+        left=min(max(0,x1),max(0,width - 1))
+        bottom=min(height,top + sprite_height)
+        right=min(width,left + sprite_width)
+        if bottom > top and right > left:
+            canvas[top:bottom,left:right]=sprite[:bottom - top,:right - left]
+
+    def stats(self):
+        lookups=self.sprite_hits + self.sprite_misses
+        return {
+            "sprites":len(self._sprites),
+            "sprite_hit_rate":self.sprite_hits / lookups if lookups else 0.0
+        }
+
+
+annotation_renderer=AnnotationRenderer()
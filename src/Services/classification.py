@@ -1,98 +1,366 @@
+import asyncio
 import logging
 import numpy as np
 import time
-from models import classifier
-from typing import List 
+from models import classifier,registry,Detections
+from models.tiling import tile_grid,merge_tile_detections
+from helpers.Settings import get_settings
+from helpers.executor import executor
+from helpers.image_utils import wants_tiling
+from helpers.metrics import timed,observe_stage,DETECTIONS
+from .frame_dedup import frame_deduplicator
+from .motion_gate import motion_gate
+from .tracking import ObjectTracker
+from .annotation import annotation_renderer
+from typing import Dict,List,Optional,Tuple 
 from helpers.constants import (
     WASTE_CATEGORY_MAPPING,
     RECYCLING_TIPS,
     WasteCategory
 )
 from Schemas import DetectionResult
-import cv2
+from Schemas.bbox import BBox
 logger=logging.getLogger(__name__)
 
 class ClassificationService:
     @staticmethod
-    def classify_image(image:np.ndarray):
+    def classify_image(image:np.ndarray,original_size:Optional[Tuple[int,int]]=None):
         start_time=time.time()
         
         #run prediction
-        detections=classifier.predict(image)
-        enhanced_detections = []
-        for detection in detections:
-            waste_category = WASTE_CATEGORY_MAPPING.get(
-                detection["class_name"],
-                WasteCategory.RECYCLABLE
-            )
-            recycling_tip=RECYCLING_TIPS.get(
-                detection["class_name"],
-                "Check local recycling guidelines."
-            )
-            enhanced_detection=DetectionResult(
-                class_id=detection["class_id"],
-                class_name=detection["class_name"],
-                confidence=detection["confidence"],
-                bbox=detection["bbox"],
-                waste_category=waste_category,
-                recycling_tip=recycling_tip
-            )
-            enhanced_detections.append(enhanced_detection)
+        detections=registry.current().classifier.predict(image)
+        return ClassificationService._build_result(image,detections,start_time,original_size=original_size)
+    
+    @staticmethod
+    async def classify_image_async(image:np.ndarray,source_id:Optional[str]=None,original_size:Optional[Tuple[int,int]]=None,
+                                   tiled:Optional[bool]=None):
+        """
+        Classify an image without blocking the event loop, batching it with concurrent requests when enabled.
+        Frames tagged with a `source_id` may reuse earlier detections of that source when the
+        scene did not change (motion gate) or the frame is a near-duplicate of a recent one.
+        `original_size` is the (height, width) of the upload when `image` was decoded at reduced
+        resolution; boxes and image_size are reported in original coordinates.
+        High-resolution images are classified tile by tile when tiling is enabled (`tiled`
+        overrides ENABLE_TILED_INFERENCE), the result then carries a `tiling` report.
+        """
+        start_time=time.time()
+        tiled=wants_tiling(image.shape[1],image.shape[0],tiled)
+        
+        if source_id is None or not (motion_gate.enabled or frame_deduplicator.enabled):
+            detections,tiling=await ClassificationService._detect_async(image,tiled)
+            result=ClassificationService._build_result(image,detections,start_time,original_size=original_size)
+            result["tiling"]=tiling
+            return result
+        
+        signatures,detections,reason=await executor.run(ClassificationService._find_reusable,source_id,image)
+        if detections is not None:
+            result=ClassificationService._build_result(image,detections,start_time,original_size=original_size)
+            result["reused"]=True
+            result["reuse_reason"]=reason
+            return result
+        
+        detections,tiling=await ClassificationService._detect_async(image,tiled)
+        inference_time=time.time()-start_time
+        if "thumbnail" in signatures:
+            motion_gate.remember(source_id,signatures["thumbnail"],image,detections,inference_time)
+        if "hash" in signatures:
+            frame_deduplicator.remember(source_id,signatures["hash"],image,detections,inference_time)
+        result=ClassificationService._build_result(image,detections,start_time,original_size=original_size)
+        result["tiling"]=tiling
+        return result
+    
+    @staticmethod
+    @timed("reuse_lookup")
+    def _find_reusable(source_id:str,image:np.ndarray):
+        """Cheapest check first: motion gate, then perceptual hash. Returns (signatures, detections, reason)"""
+        signatures={}
+        if motion_gate.enabled:
+            signatures["thumbnail"],detections,_=motion_gate.lookup(source_id,image)
+            if detections is not None:
+                return signatures,detections,"no_motion"
+        if frame_deduplicator.enabled:
+            signatures["hash"],detections=frame_deduplicator.lookup(source_id,image)
+            if detections is not None:
+                return signatures,detections,"near_duplicate"
+        return signatures,None,None
+    
+    @staticmethod
+    async def classify_tracked_async(image:np.ndarray,tracker:ObjectTracker,original_size:Optional[Tuple[int,int]]=None):
+        """
+        Classify a video frame in detect-then-track mode: the detector only runs when
+        the tracker asks for it, other frames get the tracked boxes moved by optical flow.
+        """
+        start_time=time.time()
+        
+        tiling=None
+        if tracker.needs_detection():
+            tiled=wants_tiling(image.shape[1],image.shape[0])
+            detections,tiling=await ClassificationService._detect_async(image,tiled)
+            detections,track_ids=await executor.run(tracker.update,image,detections)
+            tracked=False
+        else:
+            detections,track_ids=await executor.run(tracker.propagate,image)
+            tracked=True
+        result=ClassificationService._build_result(image,detections,start_time,track_ids,original_size)
+        result["tracked"]=tracked
+        result["tiling"]=tiling
+        return result
+    
+    @staticmethod
+    async def _detect_async(image:np.ndarray,tiled:bool)->Tuple[Detections,Optional[dict]]:
+        """Detections of the whole image, or of its tiles merged, with the tiling report"""
+        if tiled:
+            return await ClassificationService._predict_tiled_async(image)
+        return await ClassificationService._predict_async(image),None
+    
+    @staticmethod
+    @timed("inference")
+    async def _predict_async(image:np.ndarray)->Detections:
+        #model version the request was pinned to
+        version=registry.current()
+        if get_settings.ENABLE_BATCHING:
+            return await asyncio.wrap_future(version.scheduler.submit(image))
+        return await executor.run(version.classifier.predict,image)
+    
+    @staticmethod
+    @timed("inference")
+    async def _predict_tiled_async(image:np.ndarray)->Tuple[Detections,dict]:
+        """
+        Detections of a high-resolution image from overlapping TILE_SIZE tiles (and the full frame),
+        run as chunked batched forward passes (concurrently with worker processes) and merged
+        across tiles in image coordinates. Returns the detections and a per-request report.
+        """
+        started=time.perf_counter()
+        height,width=image.shape[:2]
+        grid=tile_grid(height,width,get_settings.TILE_SIZE,get_settings.TILE_OVERLAP)
+        #tiles are views of the decoded image, letterboxing copies them straight into the input tensor
+        crops=[image[y1:y2,x1:x2] for x1,y1,x2,y2 in grid]
+        offsets=[(x1,y1) for x1,y1,_,_ in grid]
+        if get_settings.TILE_INCLUDE_FULL_FRAME:
+            crops.append(image)
+            offsets.append((0,0))
+        
+        model=registry.current().classifier
+        chunk_size=max(1,get_settings.MAX_BATCH_SIZE)
+        chunks=[crops[offset:offset+chunk_size] for offset in range(0,len(crops),chunk_size)]
+        chunk_detections=await asyncio.gather(*(executor.run(model.predict_batch,chunk) for chunk in chunks))
+        tile_detections=[detections for chunk in chunk_detections for detections in chunk]
+        inference_seconds=time.perf_counter() - started
+        
+        merge_started=time.perf_counter()
+        detections=await executor.run(
+            merge_tile_detections,tile_detections,offsets,get_settings.TILE_MERGE_THRESHOLD
+        )
+        merge_seconds=time.perf_counter() - merge_started
+        observe_stage("tiled_forward",inference_seconds)
+        observe_stage("tile_merge",merge_seconds)
+        
+        #pooled input tensors of the chunks that run at once, next to the full-resolution decode
+        concurrent_chunks=min(len(chunks),get_settings.EXECUTOR_WORKERS)
+        tensor_bytes=concurrent_chunks * chunk_size * 3 * get_settings.IMAGE_SIZE ** 2 * 4
+        return detections,{
+            "tiles":len(grid),
+            "full_frame":get_settings.TILE_INCLUDE_FULL_FRAME,
+            "tile_size":get_settings.TILE_SIZE,
+            "overlap":get_settings.TILE_OVERLAP,
+            "forward_passes":len(chunks),
+            "detections_before_merge":sum(len(d) for d in tile_detections),
+            "inference_ms":inference_seconds * 1000,
+            "merge_ms":merge_seconds * 1000,
+            "image_memory_mb":image.nbytes / (1024*1024),
+            "input_tensor_memory_mb":tensor_bytes / (1024*1024)
+        }
+    
+    @staticmethod
+    async def classify_batch_async(images:List[np.ndarray],original_sizes:Optional[List[Optional[Tuple[int,int]]]]=None):
+        """
+        Classify several images with chunked batched forward passes, chunks run concurrently when worker
+        processes are available. Images that qualify for tiled inference are classified tile by tile.
+        """
+        chunk_size=max(1,get_settings.MAX_BATCH_SIZE)
+        model=registry.current().classifier
+        original_sizes=original_sizes or [None]*len(images)
+        tiled=[i for i,image in enumerate(images) if wants_tiling(image.shape[1],image.shape[0])]
+        tiled_set=set(tiled)
+        regular=[i for i in range(len(images)) if i not in tiled_set]
+        chunks=[regular[offset:offset+chunk_size] for offset in range(0,len(regular),chunk_size)]
+        
+        async def _classify_chunk(indices):
+            start_time=time.time()
+            chunk_detections=await executor.run(model.predict_batch,[images[i] for i in indices])
+            return [
+                (i,ClassificationService._build_result(images[i],detections,start_time,original_size=original_sizes[i]))
+                for i,detections in zip(indices,chunk_detections)
+            ]
+        
+        async def _classify_tiled(i):
+            result=await ClassificationService.classify_image_async(images[i],original_size=original_sizes[i],tiled=True)
+            return [(i,result)]
+        
+        chunk_results=await asyncio.gather(
+            *(_classify_chunk(indices) for indices in chunks),
+            *(_classify_tiled(i) for i in tiled)
+        )
+        results=dict(pair for pairs in chunk_results for pair in pairs)
+        return [results[i] for i in range(len(images))]
+    
+    @staticmethod
+    @timed("postprocess")
+    def _build_result(image:np.ndarray,detections:Detections,start_time:float,track_ids:Optional[np.ndarray]=None,
+                      original_size:Optional[Tuple[int,int]]=None):
+        height,width=image.shape[:2]
+        if original_size is not None and original_size != (height,width):
+            #image was decoded at reduced resolution, report boxes in upload coordinates
+            detections=detections.scaled(original_size[1] / width,original_size[0] / height)
+            height,width=original_size
+        #per-class lookups happen once per distinct class, not once per box
+        material_counts=ClassificationService._count_materials(detections)
+        for material,count in material_counts.items():
+            DETECTIONS.inc(count,class_name=material)
+        enhanced_detections=ClassificationService._to_detection_results(detections,track_ids)
             
         processing_time=time.time() -start_time
         
         #calculate waste statistics 
-        waste_stats=ClassificationService._calculate_waste_statistics(enhanced_detections)
+        waste_stats=ClassificationService._calculate_waste_statistics(material_counts)
         
         return {
             "detections":enhanced_detections,
-            "total_objects":len(enhanced_detections),
+            "total_objects":len(detections),
             "processing_time":processing_time,
             "image_size":{
-                 "height": image.shape[0],
-                "width": image.shape[1]
+                 "height": height,
+                "width": width
             },
             "waste_statistics":waste_stats,
-            "recycling_recommendations":ClassificationService._get_recycling_recommandations(enhanced_detections)
-            
-            
+            "recycling_recommendations":ClassificationService._get_recycling_recommandations(material_counts),
+            "reused":False,
+            "reuse_reason":None,
+            "tracked":False,
+            "tiling":None,
+            #columnar detections in upload coordinates, for the compact response format
+            "columns":detections,
+            "track_ids":track_ids
         }    
+    
+    @staticmethod
+    def class_table():
+        """Class metadata indexed by class id, referenced once by compact responses"""
+        table={"names":[],"waste_categories":[],"recycling_tips":[]}
+        for class_id in range(len(classifier.class_names)):
+            class_name,waste_category,recycling_tip=ClassificationService._class_metadata(class_id)
+            table["names"].append(class_name)
+            table["waste_categories"].append(waste_category.value)
+            table["recycling_tips"].append(recycling_tip)
+        return table
+    
+    @staticmethod
+    def to_columnar(result:dict):
+        """
+        Compact form of a classification result: parallel class_ids/confidences arrays and an
+        Nx4 box array instead of one object per detection, class metadata left to `class_table`.
+        """
+        detections=result["columns"]
+        return {
+            "detections":{
+                "class_ids":detections.class_ids,
+                "confidences":detections.confidences,
+                "boxes":detections.boxes,
+                "track_ids":result["track_ids"]
+            },
+            "total_objects":result["total_objects"],
+            "processing_time":result["processing_time"],
+            "image_size":result["image_size"],
+            "waste_statistics":result["waste_statistics"],
+            "recycling_recommendations":result["recycling_recommendations"],
+            "reused":result["reused"],
+            "reuse_reason":result["reuse_reason"],
+            "tracked":result["tracked"],
+            "tiling":result["tiling"]
+        }
+    
+    @staticmethod
+    def _class_metadata(class_id:int):
+        """Name, waste category and recycling tip of a class id"""
+        class_name=classifier._get_class_name(class_id)
+        waste_category = WASTE_CATEGORY_MAPPING.get(
+            class_name,
+            WasteCategory.RECYCLABLE
+        )
+        recycling_tip=RECYCLING_TIPS.get(
+            class_name,
+            "Check local recycling guidelines."
+        )
+        return class_name,waste_category,recycling_tip
+    
+    @staticmethod
+    def _count_materials(detections:Detections)->Dict[str,int]:
+        """Count detections per material with a single vectorized pass over the class ids"""
+        class_ids,counts=np.unique(detections.class_ids,return_counts=True)
+        return {
+            classifier._get_class_name(class_id):count
+            for class_id,count in zip(class_ids.tolist(),counts.tolist())
+        }
+    
+    @staticmethod
+    def _to_detection_results(detections:Detections,track_ids:Optional[np.ndarray]=None)->List[DetectionResult]:
+        """Materialize response objects from the columnar detections"""
+        metadata={}
+        enhanced_detections = []
+        track_ids=track_ids.tolist() if track_ids is not None else [None]*len(detections)
+        for class_id,confidence,(x1,y1,x2,y2),track_id in zip(
+            detections.class_ids.tolist(),
+            detections.confidences.tolist(),
+            detections.boxes.tolist(),
+            track_ids
+        ):
+            if class_id not in metadata:
+                metadata[class_id]=ClassificationService._class_metadata(class_id)
+            class_name,waste_category,recycling_tip=metadata[class_id]
+            enhanced_detections.append(DetectionResult(
+                class_id=class_id,
+                class_name=class_name,
+                confidence=confidence,
+                bbox=BBox(x1=x1,y1=y1,x2=x2,y2=y2),
+                waste_category=waste_category,
+                recycling_tip=recycling_tip,
+                track_id=track_id
+            ))
+        return enhanced_detections
         
     @staticmethod    
-    def _calculate_waste_statistics(detections:List[DetectionResult]):
+    def _calculate_waste_statistics(material_counts:Dict[str,int]):
         """Calculate statistics about detected waste"""
         stats={
             "by_category":{},
-            "by_material":{},
+            "by_material":dict(material_counts),
             "total_recyclable":0,
             "total_biodegradable":0,
             "total_non_recyclable":0
             
         }
-        for detection in detections:
+        for material,count in material_counts.items():
             #count by waste category
-            category=detection.waste_category.value
-            stats["by_category"][category]=stats["by_category"].get(category,0)+1
-            #count by material
-            material=detection.class_name
-            stats["by_material"][material]=stats["by_material"].get(material,0)+1
+            waste_category=WASTE_CATEGORY_MAPPING.get(material,WasteCategory.RECYCLABLE)
+            category=waste_category.value
+            stats["by_category"][category]=stats["by_category"].get(category,0)+count
             
             #update total
-            if detection.waste_category == WasteCategory.RECYCLABLE:
-                stats["total_recyclable"] += 1
-            elif detection.waste_category == WasteCategory.BIODEGRADABLE:
-                stats["total_biodegradable"] += 1
+            if waste_category == WasteCategory.RECYCLABLE:
+                stats["total_recyclable"] += count
+            elif waste_category == WasteCategory.BIODEGRADABLE:
+                stats["total_biodegradable"] += count
             else:
-                stats["total_non_recyclable"] += 1
+                stats["total_non_recyclable"] += count
                 
         return stats
     
     
     @staticmethod
-    def _get_recycling_recommandations(detections:List[DetectionResult]):
+    def _get_recycling_recommandations(material_counts:Dict[str,int]):
         """Generate recycling recommendations based on detected items"""
         recommendations=[]
-        materials=set(detection.class_name for detection in detections)
+        materials=set(material_counts)
         if 'PLASTIC' in materials:
             recommendations.append("Separate plastics by type for better recycling efficiency.")
         
@@ -116,64 +384,29 @@ class ClassificationService:
     
     
     @staticmethod
-    def _draw_detections(image: np.ndarray, detections: list) -> np.ndarray:
+    def _draw_detections(image: np.ndarray, detections: list, scale: float = 1.0, max_dim: Optional[int] = None) -> np.ndarray:
         """
         Draw bounding boxes, class names, and confidence scores on the image.
         Args:
             image (np.ndarray): Original BGR image.
             detections (List[DetectionResult]): List of detection results.
+            scale (float): Factor from detection coordinates to image pixels (reduced decode).
+            max_dim (int): Draw on a copy downscaled so its long side fits.
         Returns:
             np.ndarray: Annotated image.
         """
-        annotated_image = image.copy()
-
-        for det in detections:
-            # Convert bbox coordinates to integers
-            x1, y1 = int(det.bbox.x1), int(det.bbox.y1)
-            x2, y2 = int(det.bbox.x2), int(det.bbox.y2)
-
-            # Choose color based on waste category
-            if det.waste_category == WasteCategory.RECYCLABLE:
-                color = (0, 255, 0)  # Green
-            elif det.waste_category == WasteCategory.BIODEGRADABLE:
-                color = (0, 165, 255)  # Orange
-            else:
-                color = (0, 0, 255)  # Red for non-recyclable
-
-            # Draw bounding box
-            cv2.rectangle(annotated_image, (x1, y1), (x2, y2), color, 2)
-
-            # Prepare label text
-            label = f"{det.class_name} ({det.confidence*100:.1f}%)"
-
-            # Calculate text size
-            (text_width, text_height), baseline = cv2.getTextSize(
-                label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1
-            )
-
-            # Draw filled rectangle behind text for readability
-            cv2.rectangle(
-                annotated_image,
-                (x1, y1 - text_height - baseline),
-                (x1 + text_width, y1),
-                color,
-                thickness=cv2.FILLED
-            )
-
-            # Put text on image
-            cv2.putText(
-                annotated_image,
-                label,
-                (x1, y1 - baseline),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.5,
-                (255, 255, 255),  # White text
-                1,
-                lineType=cv2.LINE_AA
+        return annotation_renderer.render(image, detections, scale, max_dim)
+    
+    @staticmethod
+    async def annotate_batch_async(images: List[np.ndarray], results: List[dict], max_dim: Optional[int] = None) -> List[np.ndarray]:
+        """Annotate several classified images in parallel on the executor"""
+        return await asyncio.gather(*(
+            executor.run(
+                ClassificationService._draw_detections,
+                image,
+                result["detections"],
+                image.shape[1] / result["image_size"]["width"],
+                max_dim
             )
-
-        return annotated_image
-                
-            
-        
-    
\ No newline at end of file
+            for image, result in zip(images, results)
+        ))
@@ -0,0 +1,94 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from helpers.Settings import get_settings
+from models import Detections
+
+logger=logging.getLogger(__name__)
+
+
+class PerceptualDeduplicator:
+    """
+    Reuse the detections of a recent, visually near-identical frame from the same source.
+
+    Each frame is reduced to a 64-bit difference hash (dHash) of a 9x8 grayscale
+    thumbnail. A frame whose hash is within `max_distance` bits of one of the last
+    `history_size` frames of its source (and not older than `ttl_seconds`)
+    reuses that frame's detections instead of running the model.
+    """
+    def __init__(self,enabled:bool,max_distance:int,history_size:int,ttl_seconds:float,max_sources:int):
+        self.enabled=enabled
+        self.max_distance=max_distance
+        self.history_size=max(1,history_size)
+        self.ttl_seconds=ttl_seconds
+        self.max_sources=max(1,max_sources)
+        self._sources:"OrderedDict[str,deque]"=OrderedDict()
+        self._lock=threading.Lock()
+        self.frames=0
+        self.reused=0
+        self.inference_seconds_saved=0.0
+
+    @staticmethod
+    def dhash(image:np.ndarray)->int:
+        """64-bit difference hash of a BGR or grayscale frame"""
+        small=cv2.resize(image,(9,8),interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small=cv2.cvtColor(small,cv2.COLOR_BGR2GRAY)
+        bits=small[:,1:] > small[:,:-1]
+        return int.from_bytes(np.packbits(bits).tobytes(),"big")
+
+    def lookup(self,source_id:str,image:np.ndarray)->Tuple[int,Optional[Detections]]:
+        """Hash the frame and return (hash, detections of a near-duplicate or None)"""
+        frame_hash=self.dhash(image)
+        now=time.monotonic()
+        with self._lock:
+            self.frames += 1
+            history=self._sources.get(source_id)
+            if history is None:
+                return frame_hash,None
+            self._sources.move_to_end(source_id)
+            for previous_hash,shape,detections,inference_time,seen_at in reversed(history):
+                if now - seen_at > self.ttl_seconds or shape != image.shape:
+                    continue
+                if bin(previous_hash ^ frame_hash).count("1") <= self.max_distance:
+                    self.reused += 1
+                    self.inference_seconds_saved += inference_time
+                    return frame_hash,detections
+        return frame_hash,None
+
+    def remember(self,source_id:str,frame_hash:int,image:np.ndarray,detections:Detections,inference_time:float):
+        with self._lock:
+            history=self._sources.get(source_id)
+            if history is None:
+                history=deque(maxlen=self.history_size)
+                self._sources[source_id]=history
+                while len(self._sources) > self.max_sources:
+                    self._sources.popitem(last=False)
+            self._sources.move_to_end(source_id)
+            history.append((frame_hash,image.shape,detections,inference_time,time.monotonic()))
+
+    def stats(self):
+        return {
+            "enabled":self.enabled,
+            "sources":len(self._sources),
+            "frames":self.frames,
+            "reused":self.reused,
+            "reuse_rate":self.reused / self.frames if self.frames else 0.0,
+            "inference_seconds_saved":self.inference_seconds_saved,
+            "max_hamming_distance":self.max_distance
+        }
+
+
+frame_deduplicator=PerceptualDeduplicator(
+    enabled=get_settings.ENABLE_PERCEPTUAL_DEDUP,
+    max_distance=get_settings.DEDUP_MAX_HAMMING_DISTANCE,
+    history_size=get_settings.DEDUP_HISTORY_SIZE,
+    ttl_seconds=get_settings.DEDUP_TTL_SECONDS,
+    max_sources=get_settings.DEDUP_MAX_SOURCES
+)
@@ -0,0 +1,129 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from helpers.Settings import get_settings
+from models import Detections
+
+logger=logging.getLogger(__name__)
+
+
+class _SourceState:
+    __slots__=("reference","shape","detections","inference_time","skipped","gated","inferred")
+
+    def __init__(self):
+        self.reference=None
+        self.shape=None
+        self.detections=None
+        self.inference_time=0.0
+        self.skipped=0
+        self.gated=0
+        self.inferred=0
+
+
+class MotionGate:
+    """
+    Skip inference on frames where nothing changed since the last inferred frame of a source.
+
+    Frames are shrunk to `width` pixels wide, converted to grayscale and blurred.
+    The share of pixels that differ from the last inferred frame by more than
+    `pixel_threshold` grey levels is compared with the source's change threshold.
+    Below it, the previous detections are returned. Comparing with the last
+    *inferred* frame, not the previous one, means slow cumulative changes still
+    trigger inference. At most `max_skipped_frames` frames in a row are gated.
+    """
+    def __init__(self,enabled:bool,change_threshold:float,source_thresholds:Dict[str,float],
+                 pixel_threshold:int,width:int,max_skipped_frames:int,max_sources:int):
+        self.enabled=enabled
+        self.change_threshold=change_threshold
+        self.source_thresholds=dict(source_thresholds)
+        self.pixel_threshold=pixel_threshold
+        self.width=width
+        self.max_skipped_frames=max_skipped_frames
+        self.max_sources=max(1,max_sources)
+        self._sources:"OrderedDict[str,_SourceState]"=OrderedDict()
+        self._lock=threading.Lock()
+        self.gated=0
+        self.inferred=0
+        self.inference_seconds_saved=0.0
+
+    def threshold_for(self,source_id:str)->float:
+        return self.source_thresholds.get(source_id,self.change_threshold)
+
+    def thumbnail(self,image:np.ndarray)->np.ndarray:
+        height,width=image.shape[:2]
+        scale=min(1.0,self.width / width)
+        small=cv2.resize(image,(max(1,int(width * scale)),max(1,int(height * scale))),interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small=cv2.cvtColor(small,cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small,(3,3),0)
+
+    def lookup(self,source_id:str,image:np.ndarray)->Tuple[np.ndarray,Optional[Detections],float]:
+        """Return (thumbnail, previous detections if the frame is gated else None, changed-pixel fraction)"""
+        thumbnail=self.thumbnail(image)
+        with self._lock:
+            state=self._sources.get(source_id)
+            if state is None or state.reference is None or state.shape != image.shape \
+                    or state.reference.shape != thumbnail.shape or state.skipped >= self.max_skipped_frames:
+                return thumbnail,None,1.0
+            self._sources.move_to_end(source_id)
+            changed=cv2.absdiff(thumbnail,state.reference) > self.pixel_threshold
+            fraction=float(np.count_nonzero(changed)) / changed.size
+            if fraction >= self.threshold_for(source_id):
+                return thumbnail,None,fraction
+            state.skipped += 1
+            state.gated += 1
+            self.gated += 1
+            self.inference_seconds_saved += state.inference_time
+            return thumbnail,state.detections,fraction
+
+    def remember(self,source_id:str,thumbnail:np.ndarray,image:np.ndarray,detections:Detections,inference_time:float):
+        with self._lock:
+            state=self._sources.get(source_id)
+            if state is None:
+                state=_SourceState()
+                self._sources[source_id]=state
+                while len(self._sources) > self.max_sources:
+                    self._sources.popitem(last=False)
+            self._sources.move_to_end(source_id)
+            state.reference=thumbnail
+            state.shape=image.shape
+            state.detections=detections
+            state.inference_time=inference_time
+            state.skipped=0
+            state.inferred += 1
+            self.inferred += 1
+
+    def stats(self):
+        frames=self.gated + self.inferred
+        return {
+            "enabled":self.enabled,
+            "gated_frames":self.gated,
+            "inferred_frames":self.inferred,
+            "gated_rate":self.gated / frames if frames else 0.0,
+            "inference_seconds_saved":self.inference_seconds_saved,
+            "default_change_threshold":self.change_threshold,
+            "sources":{
+                source_id:{
+                    "gated":state.gated,
+                    "inferred":state.inferred,
+                    "change_threshold":self.threshold_for(source_id)
+                }
+                for source_id,state in list(self._sources.items())
+            }
+        }
+
+
+motion_gate=MotionGate(
+    enabled=get_settings.ENABLE_MOTION_GATING,
+    change_threshold=get_settings.MOTION_CHANGE_THRESHOLD,
+    source_thresholds=get_settings.MOTION_SOURCE_THRESHOLDS,
+    pixel_threshold=get_settings.MOTION_PIXEL_THRESHOLD,
+    width=get_settings.MOTION_WIDTH,
+    max_skipped_frames=get_settings.MOTION_MAX_SKIPPED_FRAMES,
+    max_sources=get_settings.DEDUP_MAX_SOURCES
+)
@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from helpers.Settings import get_settings
+from models import registry
+
+logger=logging.getLogger(__name__)
+
+
+class ResultCache:
+    """
+    Content-addressed LRU cache of classification results with single-flight coalescing.
+
+    Entries are keyed on the hash of the uploaded bytes plus the inference settings
+    and model version, bounded by `max_entries` and expire after `ttl_seconds`.
+    While a key is being computed, concurrent requests for it await the same
+    in-flight future instead of running their own inference.
+    Values rejected by `cacheable` are handed to concurrent waiters but never stored.
+    """
+    def __init__(self,max_entries:int,ttl_seconds:float,enabled:bool=True,cacheable:Optional[Callable[[Any],bool]]=None):
+        self.enabled=enabled and max_entries > 0
+        self.cacheable=cacheable
+        self.max_entries=max_entries
+        self.ttl_seconds=ttl_seconds
+        self._entries:"OrderedDict[str,tuple]"=OrderedDict()
+        self._inflight:Dict[str,asyncio.Future]={}
+        self._lock=threading.Lock()
+        self.hits=0
+        self.misses=0
+        self.coalesced=0
+        self.evictions=0
+
+    @staticmethod
+    def make_key(contents:bytes,variant:str="")->str:
+        """Hash of the image bytes combined with everything that changes the model output (`variant`: per-request options)"""
+        digest=hashlib.sha256(contents).hexdigest()
+        return (
+            f"{digest}:{get_settings.CONFIDENCE_THRESHOLD}:{get_settings.IOU_THRESHOLD}"
+            f":{get_settings.IMAGE_SIZE}:{registry.current().classifier.model_version}:{variant}"
+        )
+
+    def get(self,key:str)->Optional[Any]:
+        """Return a fresh cached value (counting a hit) or None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry=self._entries.get(key)
+            if entry is None:
+                return None
+            value,expires_at=entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self,key:str,value:Any):
+        if not self.enabled or (self.cacheable is not None and not self.cacheable(value)):
+            return
+        with self._lock:
+            self._entries[key]=(value,time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def claim(self,key:str)->Optional[asyncio.Future]:
+        """
+        Register the caller as the producer of `key`.
+        Returns None when the caller must compute the value and then call
+        `resolve` or `fail`, or the future of the request already computing it.
+        """
+        inflight=self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return inflight
+        self.misses += 1
+        future=asyncio.get_running_loop().create_future()
+        #waiters may all be cancelled, make sure a failure is never reported as unretrieved
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key]=future
+        return None
+
+    def resolve(self,key:str,value:Any):
+        self.put(key,value)
+        future=self._inflight.pop(key,None)
+        if future is not None and not future.done():
+            future.set_result(value)
+
+    def fail(self,key:str,error:BaseException):
+        future=self._inflight.pop(key,None)
+        if future is not None and not future.done():
+            future.set_exception(error)
+
+    async def get_or_compute(self,key:str,compute:Callable[[],Awaitable[Any]])->Any:
+        """Return the cached value for `key`, sharing a single computation between concurrent callers"""
+        if not self.enabled:
+            return await compute()
+        value=self.get(key)
+        if value is not None:
+            return value
+        inflight=self.claim(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        try:
+            value=await compute()
+        except BaseException as e:
+            self.fail(key,e)
+            raise
+        self.resolve(key,value)
+        return value
+
+    def __len__(self)->int:
+        return len(self._entries)
+
+    def stats(self):
+        lookups=self.hits + self.misses + self.coalesced
+        return {
+            "enabled":self.enabled,
+            "entries":len(self._entries),
+            "max_entries":self.max_entries,
+            "ttl_seconds":self.ttl_seconds,
+            "hits":self.hits,
+            "misses":self.misses,
+            "coalesced":self.coalesced,
+            "evictions":self.evictions,
+            "hit_rate":(self.hits + self.coalesced) / lookups if lookups else 0.0
+        }
+
+
+result_cache=ResultCache(
+    max_entries=get_settings.RESULT_CACHE_MAX_ENTRIES,
+    ttl_seconds=get_settings.RESULT_CACHE_TTL_SECONDS,
+    enabled=get_settings.ENABLE_RESULT_CACHE,
+    #detections reused from an earlier frame of a source are approximate, never serve them for these bytes
+    cacheable=lambda result: not result.get("reused")
+)
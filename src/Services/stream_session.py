@@ -0,0 +1,120 @@
+import asyncio
+import itertools
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+
+class _RateMeter:
+    """Events per second over the last `window` events"""
+    def __init__(self,window:int=60):
+        self._timestamps=deque(maxlen=window)
+
+    def tick(self):
+        self._timestamps.append(time.monotonic())
+
+    def rate(self)->float:
+        if len(self._timestamps) < 2:
+            return 0.0
+        elapsed=self._timestamps[-1] - self._timestamps[0]
+        return (len(self._timestamps) - 1) / elapsed if elapsed > 0 else 0.0
+
+
+class StreamSession:
+    """
+    Latest-frame-wins buffer of one camera stream.
+
+    The receiver overwrites a single slot with each incoming frame; the processor
+    always takes the newest one. A frame replaced before it was picked up is
+    counted as dropped, so a slow model never builds a backlog of stale frames.
+    """
+    _ids=itertools.count(1)
+
+    def __init__(self,source_id:Optional[str]):
+        self.stream_id=next(self._ids)
+        self.source_id=source_id
+        self.started_at=time.monotonic()
+        self.received=0
+        self.processed=0
+        self.dropped=0
+        self.errors=0
+        self.last_latency=0.0
+        self._incoming=_RateMeter()
+        self._outgoing=_RateMeter()
+        self._slot:Optional[Tuple[int,bytes,float]]=None
+        self._ready=asyncio.Event()
+        self.closed=False
+        #ObjectTracker of the stream in detect-then-track mode
+        self.tracker=None
+
+    def put(self,frame:bytes):
+        self.received += 1
+        self._incoming.tick()
+        if self._slot is not None:
+            self.dropped += 1
+        self._slot=(self.received,frame,time.monotonic())
+        self._ready.set()
+
+    async def next_frame(self)->Optional[Tuple[int,bytes,float]]:
+        """Wait for the newest unprocessed frame, None once the stream is closed"""
+        while self._slot is None:
+            if self.closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        frame,self._slot=self._slot,None
+        return frame
+
+    def done(self,received_at:float,error:bool=False):
+        self.last_latency=time.monotonic() - received_at
+        if error:
+            self.errors += 1
+        else:
+            self.processed += 1
+            self._outgoing.tick()
+
+    def close(self):
+        self.closed=True
+        self._ready.set()
+
+    def stats(self):
+        return {
+            "stream_id":self.stream_id,
+            "source_id":self.source_id,
+            "received":self.received,
+            "processed":self.processed,
+            "dropped":self.dropped,
+            "errors":self.errors,
+            "input_fps":round(self._incoming.rate(),2),
+            "processed_fps":round(self._outgoing.rate(),2),
+            "last_latency_ms":round(self.last_latency * 1000,2),
+            "uptime_seconds":round(time.monotonic() - self.started_at,1),
+            "tracking":self.tracker.stats() if self.tracker is not None else None
+        }
+
+
+class StreamRegistry:
+    """Active stream sessions, for the stats endpoint"""
+    def __init__(self):
+        self._sessions:Dict[int,StreamSession]={}
+
+    def open(self,source_id:Optional[str])->StreamSession:
+        session=StreamSession(source_id)
+        self._sessions[session.stream_id]=session
+        return session
+
+    def close(self,session:StreamSession):
+        session.close()
+        self._sessions.pop(session.stream_id,None)
+
+    def __len__(self)->int:
+        return len(self._sessions)
+
+    def stats(self):
+        return {
+            "active_streams":len(self._sessions),
+            "streams":[session.stats() for session in self._sessions.values()]
+        }
+
+
+stream_registry=StreamRegistry()
@@ -0,0 +1,155 @@
+import logging
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+from helpers.Settings import get_settings
+from helpers.metrics import timed
+from models import Detections
+from models.postprocess import box_iou
+
+logger=logging.getLogger(__name__)
+
+FLOW_GRID=3  # FLOW_GRID x FLOW_GRID points sampled inside each box
+FLOW_PARAMS=dict(winSize=(15,15),maxLevel=2,criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT,10,0.03))
+MAX_FORWARD_BACKWARD_ERROR=1.0
+
+
+class ObjectTracker:
+    """
+    Detect-then-track state of one video stream.
+
+    The detector runs every `detect_interval` frames, or sooner when the tracking
+    confidence of an object drops under `min_confidence`. In between, boxes are
+    moved by the median pyramidal Lucas-Kanade optical flow of a grid of points
+    inside each box, on a downscaled grayscale frame. A forward-backward check
+    rejects unreliable points and the share of reliable points scales the
+    object's confidence. Detections are matched to tracks by same-class IoU so
+    every object keeps a stable track ID.
+    """
+    def __init__(self,detect_interval:int,min_confidence:float,match_iou:float,confidence_decay:float,flow_width:int):
+        self.detect_interval=max(1,detect_interval)
+        self.min_confidence=min_confidence
+        self.match_iou=match_iou
+        self.confidence_decay=confidence_decay
+        self.flow_width=flow_width
+        self.track_ids=np.empty(0,dtype=np.int64)
+        self.tracks=Detections.empty()
+        self._next_id=1
+        self._previous_gray=None
+        self._scale=1.0
+        self._since_detection=0
+        self.detector_frames=0
+        self.tracked_frames=0
+
+    @classmethod
+    def from_settings(cls)->"ObjectTracker":
+        return cls(
+            detect_interval=get_settings.TRACK_DETECT_INTERVAL,
+            min_confidence=get_settings.TRACK_MIN_CONFIDENCE,
+            match_iou=get_settings.TRACK_MATCH_IOU,
+            confidence_decay=get_settings.TRACK_CONFIDENCE_DECAY,
+            flow_width=get_settings.TRACK_FLOW_WIDTH
+        )
+
+    def needs_detection(self)->bool:
+        if self._previous_gray is None or self._since_detection >= self.detect_interval:
+            return True
+        return bool(len(self.tracks) and self.tracks.confidences.min() < self.min_confidence)
+
+    @timed("tracking")
+    def update(self,image:np.ndarray,detections:Detections)->Tuple[Detections,np.ndarray]:
+        """Take a detector result for `image`, returning it with the matched track IDs"""
+        gray=self._gray(image)
+        if len(self.tracks) and self._previous_gray is not None:
+            #bring existing tracks to this frame before matching so moving objects still overlap
+            self._move_tracks(gray,image.shape)
+
+        track_ids=np.zeros(len(detections),dtype=np.int64)
+        if len(self.tracks) and len(detections):
+            iou=box_iou(self.tracks.boxes,detections.boxes)
+            iou[self.tracks.class_ids[:,None] != detections.class_ids[None,:]]=0
+            pairs=np.argwhere(iou >= self.match_iou)
+            pairs=pairs[np.argsort(-iou[pairs[:,0],pairs[:,1]],kind="stable")]
+            used_tracks=set()
+            for track_index,detection_index in pairs.tolist():
+                if track_index in used_tracks or track_ids[detection_index]:
+                    continue
+                used_tracks.add(track_index)
+                track_ids[detection_index]=self.track_ids[track_index]
+        for i in np.flatnonzero(track_ids == 0):
+            track_ids[i]=self._next_id
+            self._next_id += 1
+
+        self.tracks=detections
+        self.track_ids=track_ids
+        self._previous_gray=gray
+        self._since_detection=0
+        self.detector_frames += 1
+        return detections,track_ids
+
+    @timed("tracking")
+    def propagate(self,image:np.ndarray)->Tuple[Detections,np.ndarray]:
+        """Move the tracked boxes onto `image` without running the detector"""
+        gray=self._gray(image)
+        if len(self.tracks):
+            self._move_tracks(gray,image.shape)
+        self._previous_gray=gray
+        self._since_detection += 1
+        self.tracked_frames += 1
+        return self.tracks,self.track_ids
+
+    def stats(self):
+        frames=self.detector_frames + self.tracked_frames
+        return {
+            "detector_frames":self.detector_frames,
+            "tracked_frames":self.tracked_frames,
+            "detector_ratio":self.detector_frames / frames if frames else 0.0,
+            "active_tracks":len(self.tracks),
+            "total_tracks":self._next_id - 1
+        }
+
+    def _gray(self,image:np.ndarray)->np.ndarray:
+        height,width=image.shape[:2]
+        self._scale=min(1.0,self.flow_width / width)
+        if self._scale < 1.0:
+            image=cv2.resize(image,(int(width * self._scale),int(height * self._scale)),interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(image,cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+    def _move_tracks(self,gray:np.ndarray,shape):
+        if gray.shape != self._previous_gray.shape:
+            #frame size changed, flow between the two frames is meaningless
+            return
+        boxes=self.tracks.boxes * self._scale
+        steps=(np.arange(FLOW_GRID,dtype=np.float32) + 1) / (FLOW_GRID + 1)
+        xs=boxes[:,0:1] + (boxes[:,2:3] - boxes[:,0:1]) * steps
+        ys=boxes[:,1:2] + (boxes[:,3:4] - boxes[:,1:2]) * steps
+        grid_x=np.repeat(xs,FLOW_GRID,axis=1)
+        grid_y=np.tile(ys,(1,FLOW_GRID))
+        points=np.stack([grid_x,grid_y],axis=2).reshape(-1,1,2).astype(np.float32)
+
+        moved,status,_=cv2.calcOpticalFlowPyrLK(self._previous_gray,gray,points,None,**FLOW_PARAMS)
+        back,back_status,_=cv2.calcOpticalFlowPyrLK(gray,self._previous_gray,moved,None,**FLOW_PARAMS)
+        error=np.linalg.norm((points - back).reshape(-1,2),axis=1)
+        good=(status.reshape(-1) == 1) & (back_status.reshape(-1) == 1) & (error < MAX_FORWARD_BACKWARD_ERROR)
+
+        per_box=FLOW_GRID * FLOW_GRID
+        good=good.reshape(-1,per_box)
+        displacement=(moved - points).reshape(-1,per_box,2)
+        shift=np.zeros((len(boxes),2),dtype=np.float32)
+        tracked=good.any(axis=1)
+        if tracked.any():
+            masked=np.where(good[tracked][...,None],displacement[tracked],np.nan)
+            shift[tracked]=np.nanmedian(masked,axis=1)
+        quality=good.mean(axis=1)
+
+        shift/=self._scale
+        new_boxes=self.tracks.boxes + np.concatenate([shift,shift],axis=1)
+        new_boxes[:,[0,2]]=new_boxes[:,[0,2]].clip(0,shape[1])
+        new_boxes[:,[1,3]]=new_boxes[:,[1,3]].clip(0,shape[0])
+        confidences=(self.tracks.confidences * self.confidence_decay * np.minimum(1.0,quality * 2)).astype(np.float32)
+
+        order=np.argsort(-confidences,kind="stable")
+        self.tracks=Detections(self.tracks.class_ids[order],confidences[order],new_boxes[order].astype(np.float32))
+        self.track_ids=self.track_ids[order]
@@ -0,0 +1,34 @@
+"""
+Multi-worker launch with the model shared between workers (run from src/):
+
+    gunicorn -c gunicorn.conf.py main:app
+
+The app and the model are loaded once in the master (`preload_app` + `when_ready`)
+and uvicorn workers are forked from it, sharing the weights copy-on-write.
+Compare with `uvicorn main:app --workers N` using `python -m scripts.measure_worker_rss`.
+"""
+import os
+import sys
+
+sys.path.insert(0,os.path.dirname(os.path.abspath(__file__)))
+
+from helpers.Settings import get_settings
+
+bind=get_settings.WEB_BIND
+workers=get_settings.WEB_WORKERS
+worker_class="uvicorn.workers.UvicornWorker"
+preload_app=True
+#the model is warmed up before the first fork, workers only bind and start their event loop
+timeout=120
+
+
+def when_ready(server):
+    #runs in the master after the app is imported and before any worker is forked
+    from helpers.prefork import preload_model
+    if get_settings.PRELOAD_MODEL:
+        preload_model()
+
+
+def post_fork(server,worker):
+    from helpers.prefork import configure_worker
+    configure_worker(get_settings.WEB_WORKERS)
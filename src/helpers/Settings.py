@@ -8,6 +8,104 @@ class Settings(BaseSettings):
     IOU_THRESHOLD:float
     ALLOWED_IMAGE_TYPES :list[str]
     
+    #upload ingestion limits, checked before decoding
+    MAX_UPLOAD_BYTES:int=10*1024*1024
+    MAX_IMAGE_PIXELS:int=50_000_000
+    UPLOAD_CHUNK_SIZE:int=1024*1024
+    
+    #compact (?format=columnar) responses larger than this are gzip/brotli compressed
+    COMPRESSION_MIN_BYTES:int=1024
+    
+    #inference runtime: "ultralytics" (PyTorch) or "onnx" (ONNX Runtime CPU)
+    INFERENCE_BACKEND:str="ultralytics"
+    ONNX_MODEL_PATH:str=""
+    ONNX_INTRA_OP_THREADS:int=0
+    #"fp32" or "int8" (quantized ONNX graph from scripts.quantize_model)
+    MODEL_PRECISION:str="fp32"
+    ONNX_INT8_MODEL_PATH:str=""
+    
+    #inference worker processes (0 = run the model in the API process)
+    INFERENCE_WORKERS:int=0
+    WORKER_CORES:str=""
+    WORKER_START_TIMEOUT:float=300.0
+    #longest wait for a batch result from a worker process
+    WORKER_RESULT_TIMEOUT:float=120.0
+    
+    #dynamic micro-batching
+    ENABLE_BATCHING:bool=True
+    MAX_BATCH_SIZE:int=8
+    MAX_BATCH_WAIT_MS:float=10.0
+    #preallocated input tensors kept between forward passes, per input size
+    INPUT_BUFFER_POOL_SIZE:int=2
+    
+    #thread pool for decode, inference and encode
+    EXECUTOR_WORKERS:int=4
+    EXECUTOR_MAX_PENDING:int=64
+    
+    #content-addressed result cache
+    ENABLE_RESULT_CACHE:bool=True
+    RESULT_CACHE_MAX_ENTRIES:int=512
+    RESULT_CACHE_TTL_SECONDS:float=300.0
+    
+    #perceptual near-duplicate skipping per camera source
+    ENABLE_PERCEPTUAL_DEDUP:bool=False
+    DEDUP_MAX_HAMMING_DISTANCE:int=5
+    DEDUP_HISTORY_SIZE:int=4
+    DEDUP_TTL_SECONDS:float=10.0
+    DEDUP_MAX_SOURCES:int=1024
+    
+    #motion-gated inference per camera source
+    ENABLE_MOTION_GATING:bool=False
+    MOTION_CHANGE_THRESHOLD:float=0.01
+    MOTION_SOURCE_THRESHOLDS:dict[str,float]={}
+    MOTION_PIXEL_THRESHOLD:int=25
+    MOTION_WIDTH:int=64
+    MOTION_MAX_SKIPPED_FRAMES:int=30
+    
+    #detect-then-track mode for video streams
+    TRACK_DETECT_INTERVAL:int=5
+    TRACK_MIN_CONFIDENCE:float=0.3
+    TRACK_MATCH_IOU:float=0.3
+    TRACK_CONFIDENCE_DECAY:float=0.97
+    TRACK_FLOW_WIDTH:int=320
+    
+    #compiled model artifacts (TorchScript / optimized ONNX graph) cached on disk,
+    #keyed by weights checksum and runtime version; empty dir = models/compiled
+    ENABLE_COMPILED_CACHE:bool=True
+    COMPILED_CACHE_DIR:str=""
+    #forward passes run while loading, per batch size and input shape (WxH);
+    #empty batch sizes = powers of two up to MAX_BATCH_SIZE
+    WARMUP_BATCH_SIZES:str=""
+    WARMUP_IMAGE_SHAPES:str="640x480,1280x720"
+    
+    #multi-worker launch (gunicorn.conf.py): model preloaded in the master and shared by forked workers;
+    #threads per worker for PyTorch/OpenCV, 0 = available cores / WEB_WORKERS
+    WEB_BIND:str="0.0.0.0:8000"
+    WEB_WORKERS:int=2
+    PRELOAD_MODEL:bool=True
+    WORKER_THREADS:int=0
+    
+    #/api/models (deploy, traffic split, retire model versions) is disabled unless a token is set,
+    #requests then pass it in the X-Admin-Token header
+    MODEL_ADMIN_TOKEN:str=""
+    
+    #Retry-After of the 503 answered to model routes while the model loads in the background
+    MODEL_RETRY_AFTER_SECONDS:int=5
+    
+    #decode large JPEGs at reduced resolution matched to IMAGE_SIZE
+    ENABLE_REDUCED_DECODE:bool=True
+    
+    #tiled inference of high-resolution images: overlapping TILE_SIZE crops at native resolution,
+    #merged across tiles; only images whose long side is at least TILING_MIN_SIDE are tiled
+    ENABLE_TILED_INFERENCE:bool=False
+    TILE_SIZE:int=640
+    TILE_OVERLAP:float=0.2
+    TILING_MIN_SIDE:int=1600
+    #also run the downscaled full frame, for objects larger than a tile
+    TILE_INCLUDE_FULL_FRAME:bool=True
+    #boxes of a class overlapping by more than this (intersection over the smaller box) are merged
+    TILE_MERGE_THRESHOLD:float=0.5
+    
     
     class Config:
         case_sensitive=True
@@ -0,0 +1,122 @@
+"""
+Encoding of the opt-in compact (`?format=columnar`) responses.
+
+Payloads may hold NumPy arrays and are written with orjson (NumPy-aware) or,
+when the client sends `Accept: application/msgpack`, with msgpack. Bodies above
+COMPRESSION_MIN_BYTES are compressed with brotli or gzip, whichever the client
+accepts (brotli preferred). orjson, msgpack and brotli are optional: without
+them the stdlib json encoder and gzip are used.
+"""
+import enum
+import gzip
+import json
+from typing import Optional, Tuple
+
+import numpy as np
+from fastapi import Request
+from fastapi.responses import Response
+
+from helpers.Settings import get_settings
+from helpers.executor import executor
+from helpers.metrics import timed
+
+try:
+    import orjson
+except ImportError:
+    orjson=None
+try:
+    import msgpack
+except ImportError:
+    msgpack=None
+try:
+    import brotli
+except ImportError:
+    brotli=None
+
+JSON_MEDIA_TYPE="application/json"
+MSGPACK_MEDIA_TYPE="application/msgpack"
+GZIP_LEVEL=6
+BROTLI_QUALITY=5
+
+
+def to_builtin(value):
+    """NumPy arrays/scalars and enums converted for encoders without NumPy support"""
+    if isinstance(value,dict):
+        return {key:to_builtin(item) for key,item in value.items()}
+    if isinstance(value,(list,tuple)):
+        return [to_builtin(item) for item in value]
+    if isinstance(value,(np.ndarray,np.generic)):
+        return value.tolist()
+    if isinstance(value,enum.Enum):
+        return value.value
+    return value
+
+
+def encode_payload(payload:dict,media_type:str)->bytes:
+    if media_type == MSGPACK_MEDIA_TYPE and msgpack is not None:
+        return msgpack.packb(to_builtin(payload),use_bin_type=True)
+    if orjson is not None:
+        return orjson.dumps(payload,option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(to_builtin(payload),separators=(",",":")).encode()
+
+
+def _accepted(header:str)->set:
+    """Tokens of an Accept/Accept-Encoding header, excluding the ones with q=0"""
+    tokens=set()
+    for part in header.lower().split(","):
+        token,*params=[item.strip() for item in part.split(";")]
+        quality=1.0
+        for param in params:
+            name,_,value=param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality=float(value)
+                except ValueError:
+                    quality=0.0
+        if token and quality > 0:
+            tokens.add(token)
+    return tokens
+
+
+def choose_media_type(accept:str)->str:
+    if msgpack is not None and MSGPACK_MEDIA_TYPE in _accepted(accept):
+        return MSGPACK_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def choose_encoding(accept_encoding:str,size:int)->Optional[str]:
+    if size < get_settings.COMPRESSION_MIN_BYTES:
+        return None
+    accepted=_accepted(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+@timed("serialize")
+def render_compact(payload:dict,accept:str,accept_encoding:str)->Tuple[bytes,str,Optional[str]]:
+    """(body, media type, content encoding) of a compact payload"""
+    media_type=choose_media_type(accept)
+    body=encode_payload(payload,media_type)
+    encoding=choose_encoding(accept_encoding,len(body))
+    if encoding == "br":
+        body=brotli.compress(body,quality=BROTLI_QUALITY)
+    elif encoding == "gzip":
+        body=gzip.compress(body,compresslevel=GZIP_LEVEL)
+    return body,media_type,encoding
+
+
+async def compact_response(request:Request,payload:dict)->Response:
+    """Encode and compress a compact payload off the event loop"""
+    body,media_type,encoding=await executor.run(
+        render_compact,
+        payload,
+        request.headers.get("accept",""),
+        request.headers.get("accept-encoding","")
+    )
+    headers={"Vary":"Accept, Accept-Encoding"}
+    if encoding is not None:
+        headers["Content-Encoding"]=encoding
+    return Response(content=body,media_type=media_type,headers=headers)
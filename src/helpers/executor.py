@@ -0,0 +1,61 @@
+import asyncio
+import contextvars
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from helpers.Settings import get_settings
+
+logger=logging.getLogger(__name__)
+
+
+class InferenceExecutor:
+    """
+    Bounded thread pool for the CPU-bound parts of a request (decode, inference, encode).
+
+    OpenCV, NumPy and PyTorch release the GIL in their heavy kernels, so threads
+    run in parallel without having to pickle frames across process boundaries.
+    A semaphore caps the number of jobs waiting for the pool so a burst of
+    uploads queues in the event loop instead of piling up unbounded work.
+    """
+    def __init__(self,max_workers:int,max_pending:int):
+        self.max_workers=max(1,max_workers)
+        self.max_pending=max(self.max_workers,max_pending)
+        self._pool:Optional[ThreadPoolExecutor]=None
+        self._semaphore:Optional[asyncio.Semaphore]=None
+        self._pending=0
+
+    @property
+    def pool(self)->ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool=ThreadPoolExecutor(max_workers=self.max_workers,thread_name_prefix="inference")
+        return self._pool
+
+    async def run(self,func:Callable,*args,**kwargs):
+        """Run `func` in the pool and await its result"""
+        if self._semaphore is None:
+            self._semaphore=asyncio.Semaphore(self.max_pending)
+        loop=asyncio.get_running_loop()
+        async with self._semaphore:
+            self._pending += 1
+            try:
+                #like asyncio.to_thread, run in a copy of the caller's context (model version of the request)
+                context=contextvars.copy_context()
+                return await loop.run_in_executor(self.pool,functools.partial(context.run,func,*args,**kwargs))
+            finally:
+                self._pending -= 1
+
+    def pending(self)->int:
+        return self._pending
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False,cancel_futures=True)
+            self._pool=None
+
+
+executor=InferenceExecutor(
+    max_workers=get_settings.EXECUTOR_WORKERS,
+    max_pending=get_settings.EXECUTOR_MAX_PENDING
+)
@@ -0,0 +1,123 @@
+import io
+import numpy as np
+import cv2
+from PIL import Image
+from typing import Optional, Tuple
+
+from helpers.Settings import get_settings
+from helpers.metrics import timed
+
+# cv2 flags decoding JPEGs at 1/2, 1/4 and 1/8 scale through libjpeg's DCT scaling
+REDUCED_DECODE_FLAGS={
+    8:cv2.IMREAD_REDUCED_COLOR_8,
+    4:cv2.IMREAD_REDUCED_COLOR_4,
+    2:cv2.IMREAD_REDUCED_COLOR_2,
+}
+
+# image_format query value -> (cv2 extension, media type)
+IMAGE_FORMATS={
+    "jpeg":(".jpg","image/jpeg"),
+    "webp":(".webp","image/webp"),
+}
+
+QUALITY_FLAGS={
+    ".jpg":cv2.IMWRITE_JPEG_QUALITY,
+    ".webp":cv2.IMWRITE_WEBP_QUALITY,
+}
+
+
+def read_image_header(contents:bytes)->Optional[Tuple[int,int,str]]:
+    """
+    (width, height, format) read from the image header without decoding pixels, None if unrecognized.
+    Raises Image.DecompressionBombError for headers far beyond Pillow's own pixel limit.
+    """
+    try:
+        with Image.open(io.BytesIO(contents)) as header:
+            width,height=header.size
+            return width,height,header.format or ""
+    except Image.DecompressionBombError:
+        raise
+    except Exception:
+        return None
+
+
+def reduced_decode_factor(width:int,height:int,target_size:int)->int:
+    """Largest DCT scale factor that keeps the long side at or above the model input size"""
+    long_side=max(width,height)
+    for factor in sorted(REDUCED_DECODE_FLAGS,reverse=True):
+        if long_side // factor >= target_size:
+            return factor
+    return 1
+
+
+@timed("decode")
+def decode_image_reduced(contents:bytes,target_size:Optional[int]=None):
+    """
+    Decode uploaded bytes into a BGR image no smaller than needed for a model input of `target_size`.
+
+    Large JPEGs are decoded directly at 1/2, 1/4 or 1/8 scale, which skips most of the
+    IDCT work and memory of a full decode. Returns (image, (original_height, original_width)),
+    (None, None) if the bytes are not a readable image.
+    """
+    nparr=np.frombuffer(contents,np.uint8)
+    header=read_image_header(contents) if target_size else None
+    factor=1
+    if header is not None and header[2] == "JPEG":
+        factor=reduced_decode_factor(header[0],header[1],target_size)
+    image=cv2.imdecode(nparr,REDUCED_DECODE_FLAGS.get(factor,cv2.IMREAD_COLOR))
+    if image is None:
+        return None,None
+    if factor == 1:
+        return image,image.shape[:2]
+
+    width,height=header[0],header[1]
+    decoded_height,decoded_width=image.shape[:2]
+    #imdecode applies the EXIF orientation, the header size is before rotation
+    if (decoded_width > decoded_height) != (width > height):
+        width,height=height,width
+    return image,(height,width)
+
+
+def wants_tiling(width:int,height:int,tiled:Optional[bool]=None)->bool:
+    """Whether an image is classified tile by tile: ENABLE_TILED_INFERENCE (or a per-request override) and a long side of at least TILING_MIN_SIDE"""
+    if tiled is None:
+        tiled=get_settings.ENABLE_TILED_INFERENCE
+    return tiled and max(width,height) >= get_settings.TILING_MIN_SIDE
+
+
+def decode_for_inference(contents:bytes,target_size:Optional[int]=None,tiled:Optional[bool]=None):
+    """
+    Decode uploaded bytes into the BGR image fed to the model and the original (height, width).
+    Large JPEGs are decoded at reduced resolution for a model input of `target_size`
+    (IMAGE_SIZE by default when ENABLE_REDUCED_DECODE, 0 forces a full decode).
+    Images that will be tiled (`wants_tiling`) are always decoded in full.
+    (None,None) if unreadable.
+    """
+    if target_size is None and get_settings.ENABLE_REDUCED_DECODE:
+        header=read_image_header(contents)
+        if header is not None and wants_tiling(header[0],header[1],tiled):
+            target_size=0
+        else:
+            target_size=get_settings.IMAGE_SIZE
+    return decode_image_reduced(contents,target_size)
+
+
+def resize_to_max_dim(image:np.ndarray,max_dim:int)->np.ndarray:
+    """Downscale so the long side is at most `max_dim`, never upscaling"""
+    height,width=image.shape[:2]
+    scale=max_dim / max(height,width)
+    if scale >= 1:
+        return image
+    return cv2.resize(image,(max(1,round(width * scale)),max(1,round(height * scale))),interpolation=cv2.INTER_AREA)
+
+
+@timed("encode")
+def encode_image(image:np.ndarray,extension:str=".jpg",quality:Optional[int]=None)->bytes:
+    """Encode a BGR image into the given format, with an optional JPEG/WebP quality (1-100)"""
+    params=[]
+    if quality is not None and extension in QUALITY_FLAGS:
+        params=[QUALITY_FLAGS[extension],int(quality)]
+    ok,encoded_image=cv2.imencode(extension,image,params)
+    if not ok:
+        raise ValueError(f"Could not encode image as {extension}")
+    return encoded_image.tobytes()
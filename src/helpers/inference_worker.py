@@ -0,0 +1,75 @@
+"""
+Entry point of the inference worker processes started by models.worker_pool.
+
+It lives outside the `models` package on purpose: a spawned child imports the
+module of its target function first. Keeping the entry point here lets the worker
+pin its cores and size its thread pools before anything imports the runtime.
+"""
+import logging
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from helpers.Settings import get_settings
+
+logger=logging.getLogger(__name__)
+
+MAX_ATTACHED_BLOCKS=32
+
+
+def _configure_cpu(cores):
+    if cores and hasattr(os,"sched_setaffinity"):
+        os.sched_setaffinity(0,cores)
+    threads=len(cores) or os.cpu_count() or 1
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    if get_settings.ONNX_INTRA_OP_THREADS <= 0:
+        get_settings.ONNX_INTRA_OP_THREADS=threads
+
+
+def run_worker(worker_id:int,cores,requests,results,model_path=None,backend_name=None):
+    _configure_cpu(cores)
+    #the worker serves its model in-process
+    get_settings.INFERENCE_WORKERS=0
+    try:
+        from models.yolo_model import GarbageClassifier
+        classifier=GarbageClassifier(model_path,backend=backend_name)
+        classifier.load_model()
+        backend=classifier.model
+    except Exception as e:
+        results.put(("error",worker_id,repr(e)))
+        return
+    results.put(("ready",worker_id,{"pid":os.getpid(),"names":backend.names}))
+
+    attached={}
+    while True:
+        job=requests.get()
+        if job is None:
+            break
+        job_id,block_name,layout,conf,iou,imgsz=job
+        images=[]
+        try:
+            #the parent creates and unlinks the blocks and its resource tracker is shared with the workers,
+            #which only attach and close them
+            block=attached.pop(block_name,None) or shared_memory.SharedMemory(name=block_name)
+            attached[block_name]=block
+            images=[np.ndarray(shape,dtype=np.uint8,buffer=block.buf,offset=offset) for offset,shape in layout]
+            detections=backend.predict_batch(images,conf,iou,imgsz)
+            columns=[(d.class_ids,d.confidences,d.boxes) for d in detections]
+            results.put(("result",job_id,(None,columns)))
+        except Exception as e:
+            logger.error(f"Inference worker {worker_id} error: {e}")
+            results.put(("result",job_id,(repr(e),None)))
+        finally:
+            #views into the block must be gone before it can be closed
+            del images
+        while len(attached) > MAX_ATTACHED_BLOCKS:
+            oldest=next(iter(attached))
+            attached.pop(oldest).close()
+
+    for block in attached.values():
+        block.close()
@@ -0,0 +1,269 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format.
+
+Counters and histograms are updated on the request path with one lock per metric
+and a bisect over a handful of buckets; values that other components already
+count (cache hits, queue depth, ...) are read from callbacks at scrape time only.
+"""
+import asyncio
+import bisect
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+# seconds, from sub-millisecond stages to slow whole requests
+LATENCY_BUCKETS=(0.0005,0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1.0,2.5,5.0,10.0)
+SIZE_BUCKETS=(1,2,4,8,16,32,64)
+
+LabelValues=Tuple[str,...]
+
+
+def _escape(value:str)->str:
+    return str(value).replace("\\","\\\\").replace("\n","\\n").replace('"','\\"')
+
+
+def _labels(names:Sequence[str],values:Sequence[str],extra:str="")->str:
+    pairs=[f'{name}="{_escape(value)}"' for name,value in zip(names,values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value:float)->str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind="untyped"
+
+    def __init__(self,name:str,description:str,labelnames:Sequence[str]=()):
+        self.name=name
+        self.description=description
+        self.labelnames=tuple(labelnames)
+        self._lock=threading.Lock()
+
+    def _key(self,labels:Dict[str,str])->LabelValues:
+        return tuple(str(labels.get(name,"")) for name in self.labelnames)
+
+    def header(self)->List[str]:
+        return [f"# HELP {self.name} {self.description}",f"# TYPE {self.name} {self.kind}"]
+
+    def render(self)->List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind="counter"
+
+    def __init__(self,name,description,labelnames=()):
+        super().__init__(name,description,labelnames)
+        self._values:Dict[LabelValues,float]={}
+
+    def inc(self,amount:float=1,**labels):
+        key=self._key(labels)
+        with self._lock:
+            self._values[key]=self._values.get(key,0) + amount
+
+    def render(self):
+        with self._lock:
+            values=list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames,key)} {_number(value)}" for key,value in values
+        ]
+
+
+class Histogram(_Metric):
+    kind="histogram"
+
+    def __init__(self,name,description,labelnames=(),buckets:Sequence[float]=LATENCY_BUCKETS):
+        super().__init__(name,description,labelnames)
+        self.buckets=tuple(sorted(buckets))
+        #label values -> [per-bucket counts (+Inf last), sum, count]
+        self._values:Dict[LabelValues,list]={}
+
+    def observe(self,value:float,**labels):
+        key=self._key(labels)
+        index=bisect.bisect_left(self.buckets,value)
+        with self._lock:
+            state=self._values.get(key)
+            if state is None:
+                state=[[0] * (len(self.buckets) + 1),0.0,0]
+                self._values[key]=state
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self,**labels):
+        start=time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start,**labels)
+
+    def render(self):
+        with self._lock:
+            values=[(key,list(counts),total,count) for key,(counts,total,count) in self._values.items()]
+        lines=self.header()
+        for key,counts,total,count in values:
+            cumulative=0
+            for bound,bucket_count in zip(self.buckets + (math.inf,),counts):
+                cumulative += bucket_count
+                bucket_label='le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames,key,bucket_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames,key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames,key)} {count}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """Counter or gauge whose value(s) are read from another component at scrape time"""
+    def __init__(self,name,description,kind:str,callback:Callable[[],Union[float,Dict[LabelValues,float]]],labelnames=()):
+        super().__init__(name,description,labelnames)
+        self.kind=kind
+        self.callback=callback
+
+    def render(self):
+        try:
+            value=self.callback()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        values=value.items() if isinstance(value,dict) else [((),value)]
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames,key)} {_number(item)}" for key,item in values
+        ]
+
+
+class MetricsRegistry:
+    def __init__(self,prefix:str=""):
+        self.prefix=prefix
+        self._metrics:Dict[str,_Metric]={}
+
+    def _register(self,metric:_Metric)->_Metric:
+        return self._metrics.setdefault(metric.name,metric)
+
+    def counter(self,name:str,description:str,labelnames:Sequence[str]=())->Counter:
+        return self._register(Counter(self.prefix + name,description,labelnames))
+
+    def histogram(self,name:str,description:str,labelnames:Sequence[str]=(),buckets:Sequence[float]=LATENCY_BUCKETS)->Histogram:
+        return self._register(Histogram(self.prefix + name,description,labelnames,buckets))
+
+    def gauge_callback(self,name:str,description:str,callback,labelnames:Sequence[str]=())->CallbackMetric:
+        return self._register(CallbackMetric(self.prefix + name,description,"gauge",callback,labelnames))
+
+    def counter_callback(self,name:str,description:str,callback,labelnames:Sequence[str]=())->CallbackMetric:
+        return self._register(CallbackMetric(self.prefix + name,description,"counter",callback,labelnames))
+
+    def render(self)->str:
+        lines=[]
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics=MetricsRegistry(prefix="garbage_api_")
+
+STAGE_SECONDS=metrics.histogram(
+    "stage_duration_seconds",
+    "Time spent in each stage of request processing",
+    labelnames=("stage",)
+)
+REQUESTS=metrics.counter(
+    "http_requests_total",
+    "HTTP requests by route, method and status code",
+    labelnames=("route","method","status")
+)
+REQUEST_SECONDS=metrics.histogram(
+    "http_request_duration_seconds",
+    "End-to-end HTTP request latency",
+    labelnames=("route","method")
+)
+DETECTIONS=metrics.counter(
+    "detections_total",
+    "Detections returned, by class",
+    labelnames=("class_name",)
+)
+ERRORS=metrics.counter(
+    "errors_total",
+    "Errors by stage",
+    labelnames=("stage",)
+)
+MODEL_REQUESTS=metrics.counter(
+    "model_version_requests_total",
+    "Model-backed requests by the model version that served them",
+    labelnames=("version",)
+)
+MODEL_REQUEST_SECONDS=metrics.histogram(
+    "model_version_request_seconds",
+    "Latency of model-backed requests by model version",
+    labelnames=("version",)
+)
+BATCH_SIZE=metrics.histogram(
+    "inference_batch_size",
+    "Images per model forward pass",
+    buckets=SIZE_BUCKETS
+)
+
+
+def stage_timer(stage:str):
+    """Context manager recording the wall time of a processing stage"""
+    return STAGE_SECONDS.time(stage=stage)
+
+
+def observe_stage(stage:str,seconds:float):
+    STAGE_SECONDS.observe(seconds,stage=stage)
+
+
+def timed(stage:str):
+    """Decorator recording every call of a function (sync or async) as a stage"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args,**kwargs):
+                with stage_timer(stage):
+                    return await func(*args,**kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args,**kwargs):
+            with stage_timer(stage):
+                return func(*args,**kwargs)
+        return wrapper
+    return decorator
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting HTTP requests and their latency per route template"""
+    def __init__(self,app):
+        self.app=app
+
+    async def __call__(self,scope,receive,send):
+        if scope["type"] != "http":
+            await self.app(scope,receive,send)
+            return
+        start=time.perf_counter()
+        status_code=500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code=message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope,receive,send_wrapper)
+        finally:
+            #route template rather than raw path keeps label cardinality bounded
+            route=scope.get("route")
+            route_path=getattr(route,"path","unmatched")
+            REQUEST_SECONDS.observe(time.perf_counter() - start,route=route_path,method=scope["method"])
+            REQUESTS.inc(route=route_path,method=scope["method"],status=str(status_code))
@@ -0,0 +1,69 @@
+"""
+Preload-and-fork support for multi-worker deployments (see gunicorn.conf.py).
+
+The model is loaded and warmed up once in the master process, then the heap is
+frozen and workers are forked from it: the weights, compiled graph and warmed-up
+runtime state are shared copy-on-write instead of being loaded once per worker.
+
+Thread pools do not survive a fork (OpenMP and OpenCV pools can deadlock in the
+child), so the master runs PyTorch and OpenCV single-threaded and each worker
+sizes its own pools after the fork.
+"""
+import gc
+import logging
+import os
+
+from helpers.Settings import get_settings
+
+logger=logging.getLogger(__name__)
+
+
+def _set_threads(threads:int):
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    try:
+        import cv2
+        cv2.setNumThreads(threads)
+    except ImportError:
+        pass
+
+
+def preload_supported()->bool:
+    """Only an in-process PyTorch model is safe to fork; ONNX Runtime sessions and worker pools own threads/processes"""
+    return get_settings.INFERENCE_WORKERS == 0 and get_settings.INFERENCE_BACKEND.lower() == "ultralytics"
+
+
+def preload_model()->bool:
+    """Load and warm up the model in the master, then freeze the heap. Returns False when skipped."""
+    if not preload_supported():
+        logger.warning(
+            f"Model preloading is not supported with INFERENCE_BACKEND={get_settings.INFERENCE_BACKEND} "
+            f"and INFERENCE_WORKERS={get_settings.INFERENCE_WORKERS}, each worker loads its own model"
+        )
+        return False
+    from models import classifier
+    _set_threads(1)
+    classifier.load_model()
+    #move everything allocated so far out of the collector's reach, so collections in the
+    #workers do not write to (and un-share) the pages holding these objects
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Model preloaded in master process {os.getpid()}, {gc.get_freeze_count()} objects frozen")
+    return True
+
+
+def worker_threads(workers:int)->int:
+    if get_settings.WORKER_THREADS > 0:
+        return get_settings.WORKER_THREADS
+    cores=len(os.sched_getaffinity(0)) if hasattr(os,"sched_getaffinity") else (os.cpu_count() or 1)
+    return max(1,cores // max(1,workers))
+
+
+def configure_worker(workers:int):
+    """Size the thread pools of a freshly forked worker"""
+    threads=worker_threads(workers)
+    _set_threads(threads)
+    logger.info(f"Worker {os.getpid()} using {threads} threads")
@@ -0,0 +1,87 @@
+from fastapi import HTTPException, UploadFile, status
+from PIL import Image
+from typing import List
+
+from helpers.Settings import get_settings
+from helpers.image_utils import read_image_header
+from helpers.metrics import timed
+
+
+def _too_large(detail:str)->HTTPException:
+    return HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,detail=detail)
+
+
+def _size_limit_detail()->str:
+    return f"File too large. Maximum size is {get_settings.MAX_UPLOAD_BYTES // (1024*1024)}MB."
+
+
+def check_image_header(contents:bytes,final:bool=True)->bool:
+    """
+    Reject images whose header announces more than MAX_IMAGE_PIXELS pixels, before any decode.
+    Returns False when the header could not be parsed and more bytes may still complete it
+    (`final=False`); with `final=True` an unreadable header is rejected.
+    """
+    try:
+        header=read_image_header(contents)
+    except Image.DecompressionBombError:
+        raise _too_large(f"Image dimensions too large. Maximum is {get_settings.MAX_IMAGE_PIXELS} pixels.")
+    if header is None:
+        if not final:
+            return False
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Could not decode image. Please check the file format."
+        )
+    width,height,_=header
+    if width * height > get_settings.MAX_IMAGE_PIXELS:
+        raise _too_large(
+            f"Image dimensions too large ({width}x{height}). Maximum is {get_settings.MAX_IMAGE_PIXELS} pixels."
+        )
+    return True
+
+
+def check_image_bytes(contents:bytes)->None:
+    """Byte and pixel-count limits of an image received in one piece (e.g. a stream frame)"""
+    if len(contents) > get_settings.MAX_UPLOAD_BYTES:
+        raise _too_large(_size_limit_detail())
+    check_image_header(contents)
+
+
+@timed("upload_read")
+async def read_image_upload(file:UploadFile)->bytes:
+    """
+    Validate the content type of an uploaded image and read it in chunks.
+
+    The multipart parser has already spooled the whole body by the time this runs;
+    reading stops as soon as MAX_UPLOAD_BYTES is exceeded and the pixel count in the
+    image header is checked on the first chunk, so oversized uploads are rejected
+    with 413 without being joined into memory or decoded.
+    """
+    if file.content_type not in get_settings.ALLOWED_IMAGE_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File type not supported. Allowed types: {', '.join(get_settings.ALLOWED_IMAGE_TYPES)}"
+        )
+    max_bytes=get_settings.MAX_UPLOAD_BYTES
+    #size of the spooled upload, when the server knows it
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(_size_limit_detail())
+
+    chunks:List[bytes]=[]
+    total=0
+    header_checked=False
+    while True:
+        chunk=await file.read(get_settings.UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        total+=len(chunk)
+        if total > max_bytes:
+            raise _too_large(_size_limit_detail())
+        chunks.append(chunk)
+        if len(chunks) == 1:
+            header_checked=check_image_header(chunk,final=False)
+
+    contents=b"".join(chunks)
+    if not header_checked:
+        check_image_header(contents)
+    return contents
@@ -1,17 +1,35 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from routes import (health,router_classify,batch_router,helper_router)
+from routes import (health,router_classify,batch_router,helper_router,stream_router,models_router,ModelReadinessMiddleware)
 
 from helpers.Settings import get_settings
+from helpers.executor import executor
+from helpers.metrics import MetricsMiddleware
+from models import registry
+
+
+@asynccontextmanager
+async def lifespan(app:FastAPI):
+    #load and warm up the model in the background, the server binds and answers health checks meanwhile
+    registry.start_loading()
+    yield
+    registry.close()
+    executor.shutdown()
+
 
 app=FastAPI(
     title=get_settings.APP_NAME,
     version=get_settings.APP_VERSION,
     description="Garbage Classification API using YOLO and FastAPI",
-    
+    lifespan=lifespan
 )
 
+app.add_middleware(ModelReadinessMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(health)
 app.include_router(router_classify)
 app.include_router(batch_router)
 app.include_router(helper_router)
-
+app.include_router(stream_router)
+app.include_router(models_router)
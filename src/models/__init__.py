@@ -1 +1,4 @@
-from .yolo_model import classifier
\ No newline at end of file
+from .detections import Detections
+from .yolo_model import classifier
+from .batch_scheduler import scheduler
+from .registry import registry,ModelRegistry,ModelVersion
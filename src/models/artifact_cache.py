@@ -0,0 +1,91 @@
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, Optional
+
+from helpers.Settings import get_settings
+
+logger=logging.getLogger(__name__)
+
+
+def file_checksum(path:Path)->str:
+    """Short sha256 of a model file, used to version compiled artifacts and cached results"""
+    digest=hashlib.sha256()
+    with open(path,"rb") as f:
+        for chunk in iter(lambda: f.read(1024*1024),b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+class ArtifactCache:
+    """
+    On-disk cache of compiled model artifacts (TorchScript modules, optimized ONNX graphs).
+
+    Artifacts are named after the checksum of the source weights, the runtime and its
+    version, and the input size, so a new model or runtime upgrade never loads a stale
+    graph. Writes go to a temporary file that is renamed into place, which keeps
+    processes that start together from reading half-written artifacts. A failed build
+    leaves a `.failed` marker next to the artifact so it is not retried on every start.
+    """
+    def __init__(self,directory:Path):
+        self.directory=Path(directory)
+
+    def path_for(self,source:Path,runtime:str,version:str,imgsz:int,suffix:str)->Path:
+        source=Path(source)
+        safe_version=version.replace("+","-").replace("/","-")
+        name=f"{source.stem}-{file_checksum(source)}-{runtime}-{safe_version}-{imgsz}{suffix}"
+        return self.directory / name
+
+    @staticmethod
+    def failed_marker(path:Path)->Path:
+        """Marker left by a failed build, named after the artifact so a new model or runtime is tried again"""
+        return path.with_name(path.name + ".failed")
+
+    def get_or_build(self,path:Path,build:Callable[[Path],None])->Optional[Path]:
+        """
+        Path of the cached artifact, built with `build(tmp_path)` on a miss.
+        Returns None when building fails, callers then run the uncompiled model.
+        """
+        if path.exists():
+            logger.info(f"Using compiled model artifact {path.name}")
+            return path
+        failed_marker=self.failed_marker(path)
+        if failed_marker.exists():
+            logger.info(f"Compiled model artifact {path.name} failed to build before, delete {failed_marker} to retry")
+            return None
+        try:
+            self.directory.mkdir(parents=True,exist_ok=True)
+            fd,tmp_name=tempfile.mkstemp(dir=self.directory,prefix=".tmp-",suffix=path.suffix)
+            os.close(fd)
+            tmp_path=Path(tmp_name)
+            try:
+                build(tmp_path)
+                os.replace(tmp_path,path)
+            finally:
+                if tmp_path.exists():
+                    tmp_path.unlink()
+        except Exception as e:
+            logger.warning(f"Could not build compiled model artifact {path.name}: {e}")
+            try:
+                failed_marker.write_text(f"{type(e).__name__}: {e}\n")
+            except OSError:
+                pass
+            return None
+        logger.info(f"Compiled model artifact written to {path}")
+        return path
+
+
+
+def default_cache_dir(model_path:Path)->Path:
+    if get_settings.COMPILED_CACHE_DIR:
+        return Path(get_settings.COMPILED_CACHE_DIR)
+    return Path(model_path).resolve().parent / "compiled"
+
+
+def artifact_cache_for(model_path:Path)->Optional[ArtifactCache]:
+    """Cache next to the weights (or in COMPILED_CACHE_DIR), None when ENABLE_COMPILED_CACHE is off"""
+    if not get_settings.ENABLE_COMPILED_CACHE:
+        return None
+    return ArtifactCache(default_cache_dir(model_path))
@@ -0,0 +1,267 @@
+import ast
+import copy
+import logging
+import platform
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from helpers.Settings import get_settings
+from .artifact_cache import ArtifactCache, artifact_cache_for
+from .detections import Detections
+from .input_pool import InputBufferPool, prepare_input
+from .postprocess import scale_boxes, decode_yolo_output
+
+logger=logging.getLogger(__name__)
+
+
+class InferenceBackend:
+    """Runtime that turns a batch of BGR images into columnar detections"""
+    name="base"
+
+    def __init__(self,model_path:Path):
+        self.model_path=Path(model_path)
+        self.names:Dict[int,str]={}
+        #letterboxed input tensors reused across forward passes
+        self.input_pool=InputBufferPool(get_settings.MAX_BATCH_SIZE,get_settings.INPUT_BUFFER_POOL_SIZE)
+
+    def load(self):
+        raise NotImplementedError
+
+    def predict_batch(self,images:List[np.ndarray],conf:float,iou:float,imgsz:int)->List[Detections]:
+        raise NotImplementedError
+
+    def submit_batch(self,images:List[np.ndarray],conf:float,iou:float,imgsz:int)->Future:
+        """Future of `predict_batch`; in-process backends compute it before returning"""
+        future=Future()
+        try:
+            future.set_result(self.predict_batch(images,conf,iou,imgsz))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def worker_stats(self)->Optional[List[dict]]:
+        """Per-process load for backends that run out of process"""
+        return None
+
+    def close(self):
+        pass
+
+
+def decode_batch(outputs:np.ndarray,images:List[np.ndarray],transforms,conf:float,iou:float)->List[Detections]:
+    """Raw detection head outputs of a batch -> columnar detections in image coordinates"""
+    detections=[]
+    for output,image,(gain,pad) in zip(outputs,images,transforms):
+        class_ids,confidences,boxes=decode_yolo_output(output,conf,iou)
+        boxes=scale_boxes(boxes,gain,pad,image.shape[:2])
+        detections.append(Detections.from_arrays(class_ids,confidences,boxes))
+    return detections
+
+
+class UltralyticsBackend(InferenceBackend):
+    """
+    PyTorch model served through the Ultralytics predictor.
+
+    Images are letterboxed into a pooled tensor and handed over as a zero-copy
+    torch view, which the predictor runs as is; boxes come back in letterboxed
+    coordinates and are mapped onto each image here.
+
+    With ENABLE_COMPILED_CACHE the fused network is traced to TorchScript once and
+    cached on disk; later starts load the frozen graph and skip building the
+    Ultralytics model graph for every forward pass. Its raw head output is decoded
+    like the ONNX backend's.
+    """
+    name="ultralytics"
+
+    def __init__(self,model_path:Path):
+        super().__init__(model_path)
+        self.model=None
+        self.compiled=None
+        self.compiled_size:Optional[int]=None
+        #the Ultralytics predictor is not thread-safe, serialize forward passes
+        self._lock=threading.Lock()
+
+    def load(self):
+        from ultralytics import YOLO
+        self.model=YOLO(self.model_path)
+        self.names=dict(getattr(self.model,'names',None) or {})
+        cache=artifact_cache_for(self.model_path)
+        if cache is not None:
+            self._load_compiled(cache,get_settings.IMAGE_SIZE)
+
+    def _load_compiled(self,cache:ArtifactCache,imgsz:int):
+        import torch
+        path=cache.path_for(self.model_path,"torchscript",torch.__version__,imgsz,".torchscript")
+
+        class _Predictions(torch.nn.Module):
+            """Keeps only the decoded predictions, the eval-mode head also returns a dict of raw feature maps"""
+            def __init__(self,model):
+                super().__init__()
+                self.model=model
+
+            def forward(self,x):
+                outputs=self.model(x)
+                return outputs[0] if isinstance(outputs,(list,tuple)) else outputs
+
+        def _trace(out_path:Path):
+            module=_Predictions(copy.deepcopy(self.model.model).float().fuse(verbose=False).eval()).eval()
+            with torch.no_grad():
+                #the trace check compares a re-run of the graph and fails on float64/int64 dtype differences in the head
+                traced=torch.jit.trace(module,torch.zeros(1,3,imgsz,imgsz),strict=False,check_trace=False)
+            torch.jit.save(torch.jit.freeze(traced),str(out_path))
+
+        if cache.get_or_build(path,_trace) is None:
+            return
+        try:
+            self.compiled=torch.jit.load(str(path),map_location="cpu").eval()
+            self.compiled_size=imgsz
+        except Exception as e:
+            logger.warning(f"Could not load compiled model {path.name}, using the Ultralytics predictor: {e}")
+
+    def predict_batch(self,images,conf,iou,imgsz):
+        import torch
+        if self.compiled is not None and imgsz == self.compiled_size:
+            with self._lock,self.input_pool.batch(images,imgsz) as (tensor,transforms):
+                with torch.no_grad():
+                    outputs=self.compiled(torch.from_numpy(tensor))
+                #eval-mode detection head returns (predictions, raw feature maps)
+                if isinstance(outputs,(list,tuple)):
+                    outputs=outputs[0]
+                outputs=outputs.numpy()
+            return decode_batch(outputs,images,transforms,conf,iou)
+
+        with self._lock,self.input_pool.batch(images,imgsz) as (tensor,transforms):
+            results=self.model(
+                torch.from_numpy(tensor),
+                conf=conf,
+                iou=iou,
+                imgsz=imgsz,
+                verbose=False
+            )
+            detections=[]
+            for result,image,(gain,pad) in zip(results,images,transforms):
+                result_detections=Detections.from_ultralytics(result.boxes)
+                result_detections.boxes=scale_boxes(result_detections.boxes,gain,pad,image.shape[:2])
+                detections.append(result_detections)
+        return detections
+
+
+class OnnxBackend(InferenceBackend):
+    """
+    ONNX Runtime CPU session with NumPy letterboxing and NMS.
+
+    Inputs share the pooled letterbox stage with the Ultralytics backend,
+    so both backends see the same pixels. With ENABLE_COMPILED_CACHE the graph
+    optimized by ONNX Runtime is saved once and later sessions load it without
+    re-running the optimizer.
+    """
+    name="onnx"
+
+    def __init__(self,model_path:Path,intra_op_threads:int=0):
+        super().__init__(model_path)
+        self.intra_op_threads=intra_op_threads
+        self.session=None
+        self.input_name=None
+        self.dynamic_batch=False
+
+    def load(self):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("INFERENCE_BACKEND=onnx requires the onnxruntime package") from e
+        if not self.model_path.exists():
+            raise FileNotFoundError(
+                f"ONNX model not found at {self.model_path}, export it with `python -m scripts.export_onnx`"
+            )
+        model_file=self.model_path
+        options=self._session_options(ort)
+        cache=artifact_cache_for(self.model_path)
+        if cache is not None:
+            #fully optimized graphs may use CPU-specific kernels, key them by architecture too
+            version=f"{ort.__version__}-{platform.machine()}"
+            path=cache.path_for(self.model_path,"ort",version,get_settings.IMAGE_SIZE,".onnx")
+
+            def _optimize(out_path:Path):
+                build_options=self._session_options(ort)
+                build_options.optimized_model_filepath=str(out_path)
+                ort.InferenceSession(str(self.model_path),sess_options=build_options,providers=["CPUExecutionProvider"])
+
+            if cache.get_or_build(path,_optimize) is not None:
+                model_file=path
+                options.graph_optimization_level=ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        self.session=ort.InferenceSession(str(model_file),sess_options=options,providers=["CPUExecutionProvider"])
+        model_input=self.session.get_inputs()[0]
+        self.input_name=model_input.name
+        self.dynamic_batch=not isinstance(model_input.shape[0],int)
+        metadata=self.session.get_modelmeta().custom_metadata_map
+        if "names" in metadata:
+            self.names=ast.literal_eval(metadata["names"])
+
+    def _session_options(self,ort):
+        options=ort.SessionOptions()
+        options.graph_optimization_level=ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.intra_op_threads > 0:
+            options.intra_op_num_threads=self.intra_op_threads
+        return options
+
+    def preprocess(self,image:np.ndarray,imgsz:int):
+        """Letterbox one BGR image into a normalized CHW float32 tensor"""
+        return prepare_input(image,imgsz)
+
+    def predict_batch(self,images,conf,iou,imgsz):
+        with self.input_pool.batch(images,imgsz) as (tensors,transforms):
+            if self.dynamic_batch:
+                outputs=self.session.run(None,{self.input_name:tensors})[0]
+            else:
+                outputs=np.concatenate([
+                    self.session.run(None,{self.input_name:tensors[i:i+1]})[0]
+                    for i in range(len(tensors))
+                ])
+        return decode_batch(outputs,images,transforms,conf,iou)
+
+
+def default_onnx_path(model_path:Path,precision:str="fp32")->Path:
+    """best.pt -> best.onnx (fp32) or best.int8.onnx (int8)"""
+    model_path=Path(model_path)
+    if precision == "int8":
+        return model_path.with_suffix(".int8.onnx")
+    return model_path.with_suffix(".onnx")
+
+
+def create_backend(model_path:Path,backend:Optional[str]=None,precision:Optional[str]=None)->InferenceBackend:
+    """Instantiate the backend selected by INFERENCE_BACKEND and MODEL_PRECISION, behind a worker pool if INFERENCE_WORKERS > 0"""
+    if get_settings.INFERENCE_WORKERS > 0:
+        from .worker_pool import WorkerPoolBackend
+        return WorkerPoolBackend(
+            create_local_backend(model_path,backend,precision),
+            get_settings.INFERENCE_WORKERS,
+            weights_path=model_path
+        )
+    return create_local_backend(model_path,backend,precision)
+
+
+def create_local_backend(model_path:Path,backend:Optional[str]=None,precision:Optional[str]=None)->InferenceBackend:
+    """Instantiate the in-process backend selected by INFERENCE_BACKEND and MODEL_PRECISION"""
+    backend=(backend or get_settings.INFERENCE_BACKEND).lower()
+    precision=(precision or get_settings.MODEL_PRECISION).lower()
+    if precision not in ("fp32","int8"):
+        raise ValueError(f"Unknown MODEL_PRECISION '{precision}', expected 'fp32' or 'int8'")
+    if backend == UltralyticsBackend.name:
+        if precision != "fp32":
+            raise ValueError("MODEL_PRECISION=int8 is served through INFERENCE_BACKEND=onnx")
+        return UltralyticsBackend(model_path)
+    if backend == OnnxBackend.name:
+        if Path(model_path).suffix == ".onnx":
+            #an exported graph given directly, e.g. a version deployed through the model registry
+            onnx_path=Path(model_path)
+        elif precision == "int8" and get_settings.ONNX_INT8_MODEL_PATH:
+            onnx_path=Path(get_settings.ONNX_INT8_MODEL_PATH)
+        elif precision == "fp32" and get_settings.ONNX_MODEL_PATH:
+            onnx_path=Path(get_settings.ONNX_MODEL_PATH)
+        else:
+            onnx_path=default_onnx_path(model_path,precision)
+        return OnnxBackend(onnx_path,intra_op_threads=get_settings.ONNX_INTRA_OP_THREADS)
+    raise ValueError(f"Unknown INFERENCE_BACKEND '{backend}', expected 'ultralytics' or 'onnx'")
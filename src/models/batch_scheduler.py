@@ -0,0 +1,143 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List
+
+import numpy as np
+
+from helpers.Settings import get_settings
+from helpers.metrics import observe_stage
+from .yolo_model import classifier
+
+logger=logging.getLogger(__name__)
+
+
+class BatchScheduler:
+    """
+    Collect concurrent single-image requests into one batched model call.
+
+    Callers submit one image and get a Future back. A dispatcher thread waits
+    for up to `max_batch_size` images or `max_wait_ms` after the first one,
+    submits a single batched prediction and resolves every caller's Future with
+    its own detections. Up to `max_inflight` batches run at once (one per
+    inference worker process); while all are busy, new requests keep
+    accumulating into the next batch.
+    """
+    def __init__(self,submit_batch:Callable[[List[np.ndarray]],Future],max_batch_size:int,max_wait_ms:float,max_inflight:int=1):
+        self.submit_batch=submit_batch
+        self.max_batch_size=max(1,max_batch_size)
+        self.max_wait=max(0.0,max_wait_ms) / 1000.0
+        self.max_inflight=max(1,max_inflight)
+        self._inflight=threading.BoundedSemaphore(self.max_inflight)
+        self._queue=queue.Queue()
+        self._lock=threading.Lock()
+        self._thread=None
+        self.total_batches=0
+        self.total_images=0
+
+    def submit(self,image:np.ndarray)->Future:
+        """Queue an image for the next batch and return a Future of its detections"""
+        self._ensure_started()
+        future=Future()
+        self._queue.put((image,future,time.perf_counter()))
+        return future
+
+    def close(self):
+        """Stop the dispatcher thread once the queued requests are dispatched"""
+        if self._thread is not None:
+            self._queue.put(None)
+
+    def queue_depth(self)->int:
+        return self._queue.qsize()
+
+    def stats(self):
+        return {
+            "total_batches":self.total_batches,
+            "total_images":self.total_images,
+            "average_batch_size":self.total_images / self.total_batches if self.total_batches else 0.0,
+            "queue_depth":self.queue_depth(),
+            "max_batch_size":self.max_batch_size,
+            "max_inflight_batches":self.max_inflight,
+            "max_wait_ms":self.max_wait * 1000.0
+        }
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread=threading.Thread(target=self._run,name="batch-scheduler",daemon=True)
+                self._thread.start()
+
+    def _collect_batch(self):
+        first=self._queue.get()
+        if first is None:
+            return None
+        batch=[first]
+        deadline=time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining=deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+            if batch[-1] is None:
+                #close() was called, dispatch what came before and stop afterwards
+                batch.pop()
+                self._queue.put(None)
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            #wait for a free inference slot first, so requests pile up into the next batch meanwhile
+            self._inflight.acquire()
+            batch=self._collect_batch()
+            if batch is None:
+                self._inflight.release()
+                return
+            dispatched_at=time.perf_counter()
+            for _,_,queued_at in batch:
+                observe_stage("batch_queue_wait",dispatched_at - queued_at)
+            #drop requests whose caller already gave up
+            batch=[(image,future) for image,future,_ in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                self._inflight.release()
+                continue
+            try:
+                batch_future=self.submit_batch([image for image,_ in batch])
+            except Exception as e:
+                self._inflight.release()
+                self._fail(batch,e)
+                continue
+            batch_future.add_done_callback(lambda f,batch=batch: self._complete(batch,f))
+
+    def _complete(self,batch,batch_future:Future):
+        self._inflight.release()
+        try:
+            results=batch_future.result()
+        except Exception as e:
+            self._fail(batch,e)
+            return
+        self.total_batches += 1
+        self.total_images += len(batch)
+        for (_,future),detections in zip(batch,results):
+            future.set_result(detections)
+
+    @staticmethod
+    def _fail(batch,error:Exception):
+        logger.error(f"Batch scheduler error: {error}")
+        for _,future in batch:
+            future.set_exception(error)
+
+
+scheduler=BatchScheduler(
+    classifier.submit_batch,
+    max_batch_size=get_settings.MAX_BATCH_SIZE,
+    max_wait_ms=get_settings.MAX_BATCH_WAIT_MS,
+    max_inflight=max(1,get_settings.INFERENCE_WORKERS)
+)
@@ -0,0 +1,53 @@
+import numpy as np
+
+
+class Detections:
+    """
+    Columnar detections of one image, sorted by descending confidence.
+
+    class_ids   (N,)   int64
+    confidences (N,)   float32
+    boxes       (N,4)  float32 x1,y1,x2,y2 in image pixels
+    """
+    __slots__=("class_ids","confidences","boxes")
+
+    def __init__(self,class_ids:np.ndarray,confidences:np.ndarray,boxes:np.ndarray):
+        self.class_ids=class_ids
+        self.confidences=confidences
+        self.boxes=boxes
+
+    @classmethod
+    def empty(cls)->"Detections":
+        return cls(
+            np.empty(0,dtype=np.int64),
+            np.empty(0,dtype=np.float32),
+            np.empty((0,4),dtype=np.float32)
+        )
+
+    @classmethod
+    def from_arrays(cls,class_ids,confidences,boxes)->"Detections":
+        """Build detections from unsorted arrays, sorting them by confidence with one argsort"""
+        class_ids=np.asarray(class_ids,dtype=np.int64).reshape(-1)
+        confidences=np.asarray(confidences,dtype=np.float32).reshape(-1)
+        boxes=np.asarray(boxes,dtype=np.float32).reshape(-1,4)
+        order=np.argsort(-confidences,kind="stable")
+        return cls(class_ids[order],confidences[order],boxes[order])
+
+    @classmethod
+    def from_ultralytics(cls,boxes)->"Detections":
+        """Convert an Ultralytics `Boxes` object with a single device-to-host copy"""
+        if boxes is None or len(boxes) == 0:
+            return cls.empty()
+        #data columns: x1,y1,x2,y2,[track_id],conf,cls
+        data=boxes.data.cpu().numpy()
+        return cls.from_arrays(data[:,-1],data[:,-2],data[:,:4])
+
+    def __len__(self)->int:
+        return len(self.class_ids)
+
+    def scaled(self,scale_x:float,scale_y:float)->"Detections":
+        """Detections with boxes multiplied by the given factors, e.g. back to original image coordinates"""
+        if scale_x == 1 and scale_y == 1:
+            return self
+        factors=np.asarray([scale_x,scale_y,scale_x,scale_y],dtype=np.float32)
+        return Detections(self.class_ids,self.confidences,self.boxes * factors)
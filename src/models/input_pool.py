@@ -0,0 +1,84 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .postprocess import letterbox_into
+
+
+class _InputBuffer:
+    """One NCHW float32 batch tensor and the uint8 canvas its slots are letterboxed through"""
+    __slots__=("tensor","canvas")
+
+    def __init__(self,capacity:int,size:int):
+        self.tensor=np.empty((capacity,3,size,size),dtype=np.float32)
+        self.canvas=np.empty((size,size,3),dtype=np.uint8)
+
+
+class InputBufferPool:
+    """
+    Preallocated model input tensors reused across requests and batch slots.
+
+    A batch of BGR images is letterboxed one by one into a single reusable canvas and
+    written, channel-reversed and scaled to [0, 1], into its slot of a pooled NCHW tensor.
+    The only per-request allocations left are the ones OpenCV makes internally.
+    Up to `max_free` buffers per input size are kept between forward passes; concurrent
+    batches beyond that get temporary buffers.
+    """
+    def __init__(self,capacity:int,max_free:int=2):
+        self.capacity=max(1,capacity)
+        self.max_free=max(0,max_free)
+        self._free:Dict[int,List[_InputBuffer]]={}
+        self._lock=threading.Lock()
+        self.allocated=0
+        self.reused=0
+
+    def _acquire(self,batch_size:int,size:int)->_InputBuffer:
+        with self._lock:
+            free=self._free.get(size,[])
+            for i,buffer in enumerate(free):
+                if buffer.tensor.shape[0] >= batch_size:
+                    self.reused += 1
+                    return free.pop(i)
+            self.allocated += 1
+        return _InputBuffer(max(batch_size,self.capacity),size)
+
+    def _release(self,buffer:_InputBuffer,size:int):
+        with self._lock:
+            free=self._free.setdefault(size,[])
+            if len(free) < self.max_free:
+                free.append(buffer)
+
+    @contextmanager
+    def batch(self,images:List[np.ndarray],size:int):
+        """
+        Yield (tensor, [(gain, pad), ...]) for `images`; `tensor` is a view of a pooled
+        buffer, valid only inside the `with` block.
+        """
+        buffer=self._acquire(len(images),size)
+        try:
+            tensor=buffer.tensor[:len(images)]
+            transforms=[]
+            for image,slot in zip(images,tensor):
+                transforms.append(letterbox_into(image,buffer.canvas))
+                #BGR HWC uint8 -> RGB CHW float32 in a single pass
+                np.multiply(buffer.canvas[...,::-1].transpose(2,0,1),1 / 255.0,out=slot,casting="unsafe")
+            yield tensor,transforms
+        finally:
+            self._release(buffer,size)
+
+    def stats(self):
+        return {
+            "allocated":self.allocated,
+            "reused":self.reused,
+            "free":{size:len(buffers) for size,buffers in list(self._free.items())}
+        }
+
+
+def prepare_input(image:np.ndarray,size:int)->Tuple[np.ndarray,float,Tuple[int,int]]:
+    """Letterbox one BGR image into a freshly allocated normalized CHW float32 tensor"""
+    pool=InputBufferPool(1,max_free=0)
+    with pool.batch([image],size) as (tensor,transforms):
+        gain,pad=transforms[0]
+        return tensor[0],gain,pad
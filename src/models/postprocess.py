@@ -0,0 +1,119 @@
+"""
+Framework-free YOLO pre/post-processing (letterbox, output decoding, NMS).
+
+Mirrors the Ultralytics defaults so runtimes other than PyTorch produce the
+same detections without importing Ultralytics at request time.
+"""
+import cv2
+import numpy as np
+from typing import Tuple
+
+LETTERBOX_COLOR=(114,114,114)
+MAX_DETECTIONS=300
+MAX_NMS_CANDIDATES=30000
+MAX_WH=7680  # class offset used for batched class-aware NMS
+
+
+def letterbox_geometry(h:int,w:int,size:int)->Tuple[float,Tuple[int,int],Tuple[int,int]]:
+    """(gain, (new_w, new_h), (pad_x, pad_y)) of letterboxing an `h` x `w` image into a `size` square"""
+    gain=min(size / h,size / w)
+    new_w,new_h=int(round(w * gain)),int(round(h * gain))
+    dw,dh=(size - new_w) / 2,(size - new_h) / 2
+    return gain,(new_w,new_h),(int(round(dw - 0.1)),int(round(dh - 0.1)))
+
+
+def letterbox_into(image:np.ndarray,canvas:np.ndarray)->Tuple[float,Tuple[int,int]]:
+    """
+    Letterbox `image` into a preallocated square uint8 `canvas`, resizing straight into
+    its centre region and filling only the borders. Returns (gain, (pad_x, pad_y)).
+    """
+    size=canvas.shape[0]
+    h,w=image.shape[:2]
+    gain,(new_w,new_h),(left,top)=letterbox_geometry(h,w,size)
+    region=canvas[top:top + new_h,left:left + new_w]
+    if (new_w,new_h) != (w,h):
+        resized=cv2.resize(image,(new_w,new_h),dst=region,interpolation=cv2.INTER_LINEAR)
+        if resized is not region:
+            #OpenCV allocated its own output for this view, copy it in
+            region[...]=resized
+    else:
+        region[...]=image
+    canvas[:top]=LETTERBOX_COLOR
+    canvas[top + new_h:]=LETTERBOX_COLOR
+    canvas[top:top + new_h,:left]=LETTERBOX_COLOR
+    canvas[top:top + new_h,left + new_w:]=LETTERBOX_COLOR
+    return gain,(left,top)
+
+
+def scale_boxes(boxes:np.ndarray,gain:float,pad:Tuple[int,int],shape:Tuple[int,int])->np.ndarray:
+    """Map xyxy boxes from letterboxed model coordinates back onto an image of `shape` (h, w)"""
+    boxes=boxes.copy()
+    boxes[:,[0,2]]-=pad[0]
+    boxes[:,[1,3]]-=pad[1]
+    boxes/=gain
+    boxes[:,[0,2]]=boxes[:,[0,2]].clip(0,shape[1])
+    boxes[:,[1,3]]=boxes[:,[1,3]].clip(0,shape[0])
+    return boxes
+
+
+def box_iou(a:np.ndarray,b:np.ndarray)->np.ndarray:
+    """Pairwise IoU of two xyxy box arrays, shape (len(a), len(b))"""
+    top_left=np.maximum(a[:,None,:2],b[None,:,:2])
+    bottom_right=np.minimum(a[:,None,2:],b[None,:,2:])
+    inter=(bottom_right - top_left).clip(0).prod(axis=2)
+    area_a=(a[:,2:] - a[:,:2]).clip(0).prod(axis=1)
+    area_b=(b[:,2:] - b[:,:2]).clip(0).prod(axis=1)
+    return inter / (area_a[:,None] + area_b[None,:] - inter + 1e-9)
+
+
+def nms(boxes:np.ndarray,scores:np.ndarray,iou_threshold:float)->np.ndarray:
+    """Greedy non-maximum suppression over xyxy boxes, returning kept indices by descending score"""
+    x1,y1,x2,y2=boxes[:,0],boxes[:,1],boxes[:,2],boxes[:,3]
+    areas=(x2 - x1).clip(0) * (y2 - y1).clip(0)
+    order=np.argsort(-scores,kind="stable")
+    keep=[]
+    while order.size:
+        i=order[0]
+        keep.append(i)
+        rest=order[1:]
+        inter_w=(np.minimum(x2[i],x2[rest]) - np.maximum(x1[i],x1[rest])).clip(0)
+        inter_h=(np.minimum(y2[i],y2[rest]) - np.maximum(y1[i],y1[rest])).clip(0)
+        inter=inter_w * inter_h
+        iou=inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order=rest[iou <= iou_threshold]
+    return np.asarray(keep,dtype=np.int64)
+
+
+def batched_nms(boxes:np.ndarray,scores:np.ndarray,class_ids:np.ndarray,iou_threshold:float)->np.ndarray:
+    """Class-aware NMS: boxes of different classes never suppress each other"""
+    if len(boxes) == 0:
+        return np.empty(0,dtype=np.int64)
+    offset_boxes=boxes + (class_ids.astype(np.float32) * MAX_WH)[:,None]
+    return nms(offset_boxes,scores,iou_threshold)
+
+
+def decode_yolo_output(output:np.ndarray,conf_threshold:float,iou_threshold:float):
+    """
+    Decode one image of a YOLOv8/YOLO11 detection head, shape (4 + num_classes, num_anchors)
+    with rows cx, cy, w, h, class scores. Returns (class_ids, confidences, xyxy boxes)
+    in letterboxed model coordinates.
+    """
+    predictions=output.T
+    class_scores=predictions[:,4:]
+    class_ids=class_scores.argmax(axis=1)
+    confidences=class_scores[np.arange(len(class_scores)),class_ids]
+    mask=confidences > conf_threshold
+    predictions,class_ids,confidences=predictions[mask],class_ids[mask],confidences[mask]
+    if len(confidences) > MAX_NMS_CANDIDATES:
+        top=np.argsort(-confidences)[:MAX_NMS_CANDIDATES]
+        predictions,class_ids,confidences=predictions[top],class_ids[top],confidences[top]
+
+    boxes=np.empty((len(predictions),4),dtype=np.float32)
+    half_w,half_h=predictions[:,2] / 2,predictions[:,3] / 2
+    boxes[:,0]=predictions[:,0] - half_w
+    boxes[:,1]=predictions[:,1] - half_h
+    boxes[:,2]=predictions[:,0] + half_w
+    boxes[:,3]=predictions[:,1] + half_h
+
+    keep=batched_nms(boxes,confidences,class_ids,iou_threshold)[:MAX_DETECTIONS]
+    return class_ids[keep],confidences[keep],boxes[keep]
@@ -0,0 +1,259 @@
+import contextvars
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from helpers.Settings import get_settings
+from helpers.metrics import MODEL_REQUESTS, MODEL_REQUEST_SECONDS
+from .batch_scheduler import BatchScheduler, scheduler
+from .yolo_model import GarbageClassifier, classifier
+
+logger=logging.getLogger(__name__)
+
+DEFAULT_VERSION="default"
+
+#model version serving the current request, set by ModelReadinessMiddleware / `ModelRegistry.use`
+_current_version:contextvars.ContextVar[Optional["ModelVersion"]]=contextvars.ContextVar("model_version",default=None)
+
+
+class ModelVersion:
+    """A classifier deployed under a name, with its own batch scheduler, traffic weight and counters"""
+    def __init__(self,name:str,model:GarbageClassifier,weight:float=1.0,batch_scheduler:Optional[BatchScheduler]=None):
+        self.name=name
+        self.classifier=model
+        self.weight=weight
+        self.scheduler=batch_scheduler or BatchScheduler(
+            model.submit_batch,
+            max_batch_size=get_settings.MAX_BATCH_SIZE,
+            max_wait_ms=get_settings.MAX_BATCH_WAIT_MS,
+            max_inflight=max(1,get_settings.INFERENCE_WORKERS)
+        )
+        self.requests=0
+        self.in_flight=0
+        self.total_seconds=0.0
+        self.retired=False
+        self.closed=False
+        self.deployed_at=time.time()
+        self.activated_at:Optional[float]=None
+
+    @property
+    def is_ready(self)->bool:
+        return self.classifier.is_ready and not self.retired
+
+    def stats(self)->dict:
+        return {
+            "name":self.name,
+            "model_version":self.classifier.model_version,
+            "model_path":str(self.classifier.model_path),
+            "weight":self.weight,
+            "state":"retired" if self.retired else self.classifier.state,
+            "requests":self.requests,
+            "in_flight":self.in_flight,
+            "average_latency_ms":self.total_seconds / self.requests * 1000 if self.requests else None,
+            "deployed_at":self.deployed_at,
+            "activated_at":self.activated_at,
+            "load":self.classifier.load_status()
+        }
+
+
+class ModelRegistry:
+    """
+    Model versions served side by side, swapped without downtime.
+
+    `deploy` loads and warms up a new version on a background thread while the active
+    versions keep serving. Once it is ready it either replaces them (atomic swap of the
+    active set) or joins them with a traffic weight for a side-by-side comparison.
+    Every request is pinned to one version when it starts (`acquire`), so requests
+    already running finish on the version they started on; a replaced version is
+    closed when its last request completes.
+    """
+    def __init__(self,default:ModelVersion):
+        self._active:Dict[str,ModelVersion]={default.name:default}
+        self._staged:Dict[str,ModelVersion]={}
+        self._retiring:List[ModelVersion]=[]
+        self._lock=threading.Lock()
+        self._random=random.Random()
+
+    @property
+    def is_ready(self)->bool:
+        return any(version.is_ready for version in self._active.values())
+
+    def start_loading(self):
+        """Load the versions active at startup in the background"""
+        for version in list(self._active.values()):
+            version.classifier.start_loading()
+
+    def main(self)->ModelVersion:
+        """Active version with the largest traffic share, reported by health checks"""
+        versions=list(self._active.values())
+        ready=[version for version in versions if version.is_ready] or versions
+        return max(ready,key=lambda version: version.weight)
+
+    def current(self)->ModelVersion:
+        """Version pinned to the running request, the main version outside of requests"""
+        return _current_version.get() or self.main()
+
+    def acquire(self)->Optional[ModelVersion]:
+        """Pick a ready version by traffic weight and count the request on it, None when none is ready"""
+        with self._lock:
+            ready=[version for version in self._active.values() if version.is_ready and version.weight > 0]
+            if not ready:
+                return None
+            version=self._random.choices(ready,weights=[v.weight for v in ready])[0] if len(ready) > 1 else ready[0]
+            version.requests += 1
+            version.in_flight += 1
+        MODEL_REQUESTS.inc(version=version.name)
+        return version
+
+    def release(self,version:ModelVersion,seconds:float):
+        MODEL_REQUEST_SECONDS.observe(seconds,version=version.name)
+        with self._lock:
+            version.in_flight -= 1
+            version.total_seconds += seconds
+            drained=version.retired and version.in_flight == 0
+        if drained:
+            self._close(version)
+
+    @contextmanager
+    def use(self,version:Optional[ModelVersion]=None):
+        """Pin the enclosed work to `version` (a weighted pick by default) for its whole duration"""
+        version=version or self.acquire()
+        if version is None:
+            raise RuntimeError("No model version is ready")
+        token=_current_version.set(version)
+        started=time.perf_counter()
+        try:
+            yield version
+        finally:
+            _current_version.reset(token)
+            self.release(version,time.perf_counter() - started)
+
+    def deploy(self,name:str,model_path:Path,weight:Optional[float]=None,backend:Optional[str]=None)->ModelVersion:
+        """
+        Load `model_path` as version `name` in the background. When ready it replaces the active
+        versions, or with `weight` is added next to them and receives that share of the traffic.
+        """
+        model_path=Path(model_path)
+        if not model_path.exists():
+            raise FileNotFoundError(f"Model file {model_path} does not exist")
+        if weight is not None and weight < 0:
+            raise ValueError("Traffic weight must not be negative")
+        with self._lock:
+            staged=self._staged.get(name)
+            if name in self._active or (staged is not None and staged.classifier.state != "failed"):
+                raise ValueError(f"Model version '{name}' is already deployed")
+            version=ModelVersion(name,GarbageClassifier(model_path,backend=backend),weight=weight if weight is not None else 1.0)
+            self._staged[name]=version
+        threading.Thread(
+            target=self._load_and_activate,
+            args=(version,weight is None),
+            name=f"model-deploy-{name}",
+            daemon=True
+        ).start()
+        return version
+
+    def _load_and_activate(self,version:ModelVersion,replace:bool):
+        try:
+            version.classifier.load_model()
+        except Exception as e:
+            logger.error(f"Model version '{version.name}' failed to load, active versions unchanged: {e}")
+            return
+        retired=[]
+        with self._lock:
+            cancelled=self._staged.get(version.name) is not version
+            if not cancelled:
+                del self._staged[version.name]
+                version.activated_at=time.time()
+                if replace:
+                    retired=list(self._active.values())
+                    self._active={version.name:version}
+                else:
+                    self._active={**self._active,version.name:version}
+        if cancelled:
+            #retired while loading
+            self._close(version)
+            return
+        for old in retired:
+            self._retire(old)
+        logger.info(
+            f"Model version '{version.name}' ({version.classifier.model_version}) is active"
+            + (f", replaced {[old.name for old in retired]}" if retired else f" with weight {version.weight}")
+        )
+
+    def set_weights(self,weights:Dict[str,float]):
+        """Change the traffic split between active versions"""
+        with self._lock:
+            unknown=set(weights) - set(self._active)
+            if unknown:
+                raise KeyError(f"Unknown model versions: {sorted(unknown)}")
+            if any(weight < 0 for weight in weights.values()):
+                raise ValueError("Traffic weights must not be negative")
+            new_weights={name:weights.get(name,version.weight) for name,version in self._active.items()}
+            if sum(new_weights.values()) <= 0:
+                raise ValueError("At least one active version needs a positive weight")
+            for name,weight in new_weights.items():
+                self._active[name].weight=weight
+
+    def retire(self,name:str):
+        """Stop routing to an active version (or cancel a staged one); it is closed once drained"""
+        with self._lock:
+            if name in self._staged:
+                version=self._staged.pop(name)
+            elif name in self._active:
+                remaining={key:value for key,value in self._active.items() if key != name}
+                if not any(value.weight > 0 for value in remaining.values()):
+                    raise ValueError("Cannot retire the last version receiving traffic")
+                version=self._active[name]
+                self._active=remaining
+            else:
+                raise KeyError(f"Unknown model version '{name}'")
+        self._retire(version)
+
+    def _retire(self,version:ModelVersion):
+        with self._lock:
+            version.retired=True
+            drained=version.in_flight == 0
+            if not drained:
+                self._retiring.append(version)
+        if drained:
+            self._close(version)
+
+    def _close(self,version:ModelVersion):
+        with self._lock:
+            if version.closed:
+                return
+            version.closed=True
+            if version in self._retiring:
+                self._retiring.remove(version)
+
+        def _shutdown():
+            version.scheduler.close()
+            version.classifier.close()
+            logger.info(f"Model version '{version.name}' closed after {version.requests} requests")
+
+        #closing a worker pool joins processes, keep it off the event loop
+        threading.Thread(target=_shutdown,name=f"model-close-{version.name}",daemon=True).start()
+
+    def versions(self)->List[dict]:
+        """Active, loading and draining versions"""
+        with self._lock:
+            versions=[*self._active.values(),*self._staged.values(),*self._retiring]
+        main=self.main()
+        return [{**version.stats(),"main":version is main} for version in versions]
+
+    def active_versions(self)->List[ModelVersion]:
+        return list(self._active.values())
+
+    def close(self):
+        with self._lock:
+            versions=[*self._active.values(),*self._staged.values(),*self._retiring]
+        for version in versions:
+            version.scheduler.close()
+            version.classifier.close()
+
+
+registry=ModelRegistry(ModelVersion(DEFAULT_VERSION,classifier,batch_scheduler=scheduler))
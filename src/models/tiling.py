@@ -0,0 +1,85 @@
+"""
+Tiled (sliced) inference geometry and cross-tile merging.
+
+Small objects in high-resolution frames vanish when the whole frame is letterboxed
+to IMAGE_SIZE. Tiled images are cut into overlapping TILE_SIZE crops that the model
+sees at native resolution (plus, optionally, the downscaled full frame for objects
+larger than a tile); the detections of all crops are shifted back to image
+coordinates and merged.
+
+Objects cut by a tile border come back as a partial box from one tile and a full box
+from the overlapping one, which IoU-based NMS keeps apart. Merging therefore matches
+boxes of the same class by intersection over the smaller box and fuses each group
+into the union box with the highest confidence.
+"""
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from .detections import Detections
+from .postprocess import MAX_DETECTIONS
+
+
+def tile_starts(length:int,tile:int,overlap:float)->List[int]:
+    """Start offsets covering [0, length) with tiles of `tile` pixels overlapping by `overlap` of a tile"""
+    if length <= tile:
+        return [0]
+    stride=max(1,int(tile * (1 - overlap)))
+    starts=list(range(0,length - tile,stride))
+    #last tile is aligned to the border instead of running past it
+    starts.append(length - tile)
+    return starts
+
+
+def tile_grid(height:int,width:int,tile:int,overlap:float)->List[Tuple[int,int,int,int]]:
+    """(x1, y1, x2, y2) of every tile of an image"""
+    return [
+        (x,y,min(x + tile,width),min(y + tile,height))
+        for y in tile_starts(height,tile,overlap)
+        for x in tile_starts(width,tile,overlap)
+    ]
+
+
+def _intersection_over_smaller(box:np.ndarray,boxes:np.ndarray)->np.ndarray:
+    inter_w=(np.minimum(box[2],boxes[:,2]) - np.maximum(box[0],boxes[:,0])).clip(0)
+    inter_h=(np.minimum(box[3],boxes[:,3]) - np.maximum(box[1],boxes[:,1])).clip(0)
+    area=(box[2] - box[0]) * (box[3] - box[1])
+    areas=(boxes[:,2] - boxes[:,0]) * (boxes[:,3] - boxes[:,1])
+    return inter_w * inter_h / (np.minimum(area,areas) + 1e-9)
+
+
+def merge_boxes(class_ids:np.ndarray,confidences:np.ndarray,boxes:np.ndarray,threshold:float):
+    """
+    Greedy cross-tile merge: the most confident remaining box absorbs the boxes of its class
+    overlapping it by more than `threshold` (intersection over the smaller box), growing to their union.
+    """
+    order=np.argsort(-confidences,kind="stable")
+    class_ids,confidences,boxes=class_ids[order],confidences[order],boxes[order].copy()
+    alive=np.ones(len(order),dtype=bool)
+    keep=[]
+    for i in range(len(order)):
+        if not alive[i]:
+            continue
+        keep.append(i)
+        alive[i]=False
+        candidates=np.flatnonzero(alive & (class_ids == class_ids[i]))
+        if candidates.size == 0:
+            continue
+        matched=candidates[_intersection_over_smaller(boxes[i],boxes[candidates]) > threshold]
+        if matched.size:
+            boxes[i,:2]=np.minimum(boxes[i,:2],boxes[matched,:2].min(axis=0))
+            boxes[i,2:]=np.maximum(boxes[i,2:],boxes[matched,2:].max(axis=0))
+            alive[matched]=False
+    keep=np.asarray(keep[:MAX_DETECTIONS],dtype=np.int64)
+    return class_ids[keep],confidences[keep],boxes[keep]
+
+
+def merge_tile_detections(detections:Sequence[Detections],offsets:Sequence[Tuple[int,int]],threshold:float)->Detections:
+    """Shift per-tile detections by their tile origin (x, y) and merge them across tiles"""
+    parts=[(d,offset) for d,offset in zip(detections,offsets) if len(d)]
+    if not parts:
+        return Detections.empty()
+    class_ids=np.concatenate([d.class_ids for d,_ in parts])
+    confidences=np.concatenate([d.confidences for d,_ in parts])
+    boxes=np.concatenate([d.boxes + np.asarray([x,y,x,y],dtype=np.float32) for d,(x,y) in parts])
+    return Detections(*merge_boxes(class_ids,confidences,boxes,threshold))
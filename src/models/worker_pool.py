@@ -0,0 +1,284 @@
+import atexit
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from helpers.Settings import get_settings
+from .backends import InferenceBackend
+from .detections import Detections
+
+logger=logging.getLogger(__name__)
+
+SHM_ALIGNMENT=1024*1024
+#longest wait for a result before the worker processes are checked for liveness again
+RECEIVE_POLL_SECONDS=0.2
+
+
+def split_cores(num_workers:int,spec:str="")->List[List[int]]:
+    """
+    Core sets of each worker. `spec` pins explicitly ("0-7;8-15;..."), otherwise the
+    cores available to this process are split into `num_workers` contiguous groups.
+    """
+    if spec:
+        groups=[]
+        for group in spec.split(";")[:num_workers]:
+            cores=[]
+            for part in group.split(","):
+                if "-" in part:
+                    start,end=part.split("-")
+                    cores.extend(range(int(start),int(end) + 1))
+                elif part.strip():
+                    cores.append(int(part))
+            groups.append(cores)
+        return groups + [[] for _ in range(num_workers - len(groups))]
+    if not hasattr(os,"sched_getaffinity"):
+        return [[] for _ in range(num_workers)]
+    available=sorted(os.sched_getaffinity(0))
+    per_worker=max(1,len(available) // num_workers)
+    return [
+        available[i*per_worker:(i+1)*per_worker] or available[i % len(available):i % len(available) + 1]
+        for i in range(num_workers)
+    ]
+
+
+class _SharedFrameArena:
+    """Free list of shared memory blocks reused across batches instead of one segment per request"""
+    def __init__(self,max_free_blocks:int):
+        self.max_free_blocks=max_free_blocks
+        self._free:List[shared_memory.SharedMemory]=[]
+        self._all:Dict[str,shared_memory.SharedMemory]={}
+        self._lock=threading.Lock()
+
+    def acquire(self,nbytes:int)->shared_memory.SharedMemory:
+        with self._lock:
+            candidates=[block for block in self._free if block.size >= nbytes]
+            if candidates:
+                block=min(candidates,key=lambda b: b.size)
+                self._free.remove(block)
+                return block
+        size=-(-nbytes // SHM_ALIGNMENT) * SHM_ALIGNMENT
+        block=shared_memory.SharedMemory(create=True,size=size)
+        with self._lock:
+            self._all[block.name]=block
+        return block
+
+    def release(self,block:shared_memory.SharedMemory):
+        with self._lock:
+            self._free.append(block)
+            if len(self._free) <= self.max_free_blocks:
+                return
+            #drop the smallest spare block, large ones are the expensive ones to recreate
+            smallest=min(self._free,key=lambda b: b.size)
+            self._free.remove(smallest)
+            del self._all[smallest.name]
+        smallest.close()
+        smallest.unlink()
+
+    def close(self):
+        with self._lock:
+            blocks=list(self._all.values())
+            self._all.clear()
+            self._free.clear()
+        for block in blocks:
+            block.close()
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class _WorkerHandle:
+    def __init__(self,worker_id:int,cores:List[int],process,requests):
+        self.worker_id=worker_id
+        self.cores=cores
+        self.process=process
+        self.requests=requests
+        self.pid=None
+        self.in_flight=0
+        self.jobs=0
+        self.images=0
+        self.busy_seconds=0.0
+        self.started_at=time.monotonic()
+
+
+class WorkerPoolBackend(InferenceBackend):
+    """
+    Run a backend in N worker processes, each with its own model and pinned to its own cores.
+
+    Decoded frames are copied once into a shared memory block and workers read them
+    in place; only the block name, offsets and shapes go through the request queue,
+    and the compact columnar detections come back over a shared result queue.
+    Each batch goes to the worker with the fewest batches in flight.
+    """
+    def __init__(self,local_backend:InferenceBackend,num_workers:int,weights_path:Optional[Path]=None):
+        super().__init__(local_backend.model_path)
+        #weights each worker loads, the default model when None
+        self.weights_path=weights_path
+        self.name=local_backend.name
+        self.num_workers=num_workers
+        self._context=mp.get_context("spawn")
+        self._arena=_SharedFrameArena(max_free_blocks=num_workers * 2)
+        self._workers:List[_WorkerHandle]=[]
+        self._results=None
+        self._pending:Dict[int,tuple]={}
+        self._job_ids=itertools.count()
+        self._lock=threading.Lock()
+        self._receiver=None
+        self._closed=False
+
+    def load(self):
+        from helpers.inference_worker import run_worker
+
+        self._results=self._context.Queue()
+        for worker_id,cores in enumerate(split_cores(self.num_workers,get_settings.WORKER_CORES)):
+            requests=self._context.Queue()
+            process=self._context.Process(
+                target=run_worker,
+                args=(worker_id,cores,requests,self._results,self.weights_path and str(self.weights_path),self.name),
+                name=f"inference-worker-{worker_id}",
+                daemon=True
+            )
+            process.start()
+            self._workers.append(_WorkerHandle(worker_id,cores,process,requests))
+
+        #wait until every worker has loaded and warmed up its model
+        ready=0
+        deadline=time.monotonic() + get_settings.WORKER_START_TIMEOUT
+        while ready < len(self._workers):
+            try:
+                message=self._results.get(timeout=max(0.1,deadline - time.monotonic()))
+            except queue.Empty:
+                self.close()
+                raise RuntimeError("Inference workers did not start in time")
+            kind,worker_id,payload=message
+            if kind == "error":
+                self.close()
+                raise RuntimeError(f"Inference worker {worker_id} failed to load the model: {payload}")
+            if kind == "ready":
+                self._workers[worker_id].pid=payload["pid"]
+                self.names=payload["names"]
+                ready += 1
+
+        self._receiver=threading.Thread(target=self._receive,name="inference-results",daemon=True)
+        self._receiver.start()
+        atexit.register(self.close)
+        logger.info(f"Started {len(self._workers)} inference workers on cores {[w.cores for w in self._workers]}")
+
+    def predict_batch(self,images,conf,iou,imgsz):
+        return self.submit_batch(images,conf,iou,imgsz).result(timeout=get_settings.WORKER_RESULT_TIMEOUT)
+
+    def submit_batch(self,images,conf,iou,imgsz)->Future:
+        future=Future()
+        if not any(w.process.is_alive() for w in self._workers):
+            future.set_exception(RuntimeError("No inference worker is alive"))
+            return future
+        images=[np.ascontiguousarray(image,dtype=np.uint8) for image in images]
+        offsets=np.cumsum([0] + [image.nbytes for image in images])
+        block=self._arena.acquire(int(offsets[-1]))
+        layout=[]
+        for image,offset in zip(images,offsets[:-1]):
+            np.ndarray(image.shape,dtype=np.uint8,buffer=block.buf,offset=int(offset))[...]=image
+            layout.append((int(offset),image.shape))
+
+        with self._lock:
+            alive=[w for w in self._workers if w.process.is_alive()]
+            if not alive:
+                self._arena.release(block)
+                future.set_exception(RuntimeError("No inference worker is alive"))
+                return future
+            worker=min(alive,key=lambda w: w.in_flight)
+            job_id=next(self._job_ids)
+            worker.in_flight += 1
+            self._pending[job_id]=(future,block,worker,len(images),time.monotonic())
+        worker.requests.put((job_id,block.name,layout,conf,iou,imgsz))
+        return future
+
+    def _receive(self):
+        while not self._closed:
+            #checked on every iteration: under load results keep arriving from the live workers,
+            #the jobs of a crashed one must still be failed
+            self._fail_dead_workers()
+            try:
+                kind,job_id,payload=self._results.get(timeout=RECEIVE_POLL_SECONDS)
+            except queue.Empty:
+                continue
+            except (EOFError,OSError):
+                break
+            if kind != "result":
+                continue
+            with self._lock:
+                entry=self._pending.pop(job_id,None)
+                if entry is None:
+                    continue
+                future,block,worker,num_images,submitted_at=entry
+                worker.in_flight -= 1
+                worker.jobs += 1
+                worker.images += num_images
+                worker.busy_seconds += time.monotonic() - submitted_at
+            self._arena.release(block)
+            error,columns=payload
+            if error is not None:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result([Detections(*arrays) for arrays in columns])
+
+    def _fail_dead_workers(self):
+        with self._lock:
+            dead={w.worker_id for w in self._workers if not w.process.is_alive()}
+            if not dead:
+                return
+            failed=[(job_id,entry) for job_id,entry in self._pending.items() if entry[2].worker_id in dead]
+            for job_id,_ in failed:
+                del self._pending[job_id]
+        for _,(future,block,worker,_,_) in failed:
+            worker.in_flight=0
+            self._arena.release(block)
+            future.set_exception(RuntimeError(f"Inference worker {worker.worker_id} exited"))
+
+    def worker_stats(self):
+        now=time.monotonic()
+        return [
+            {
+                "worker_id":w.worker_id,
+                "pid":w.pid,
+                "alive":w.process.is_alive(),
+                "cores":w.cores,
+                "in_flight":w.in_flight,
+                "jobs":w.jobs,
+                "images":w.images,
+                "busy_seconds":round(w.busy_seconds,3),
+                "utilization":round(min(1.0,w.busy_seconds / max(now - w.started_at,1e-9)),3)
+            }
+            for w in self._workers
+        ]
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed=True
+        for worker in self._workers:
+            try:
+                worker.requests.put(None)
+            except (OSError,ValueError):
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        with self._lock:
+            pending=list(self._pending.values())
+            self._pending.clear()
+        for future,_,_,_,_ in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Inference worker pool closed"))
+        self._arena.close()
@@ -1,86 +1,213 @@
 from pathlib import Path
 from helpers.Settings import get_settings
+import threading
+import time
 import logging
-from ultralytics import YOLO
 import numpy as np
-import cv2
-from typing import List ,Optional
+from concurrent.futures import Future
+from typing import List ,Optional ,Tuple
 logger=logging.getLogger(__name__)
 from helpers.constants import (CLASS_NAMES,WASTE_CATEGORY_MAPPING,RECYCLING_TIPS,WasteCategory)
+from helpers.metrics import observe_stage,BATCH_SIZE,ERRORS
+from .detections import Detections
+from .artifact_cache import file_checksum
+from .backends import InferenceBackend,create_backend
+
+class ModelNotReadyError(RuntimeError):
+    """Raised when a prediction is requested before the model finished loading"""
+
+
+def warmup_batch_sizes()->List[int]:
+    """WARMUP_BATCH_SIZES ("1,4,8"), by default powers of two up to MAX_BATCH_SIZE plus MAX_BATCH_SIZE"""
+    if get_settings.WARMUP_BATCH_SIZES:
+        sizes={int(size) for size in get_settings.WARMUP_BATCH_SIZES.split(",") if size.strip()}
+    else:
+        max_batch=get_settings.MAX_BATCH_SIZE if get_settings.ENABLE_BATCHING else 1
+        sizes={1 << i for i in range(max_batch.bit_length()) if 1 << i <= max_batch} | {max_batch}
+    return sorted(size for size in sizes if size > 0)
+
+
+def warmup_image_shapes()->List[Tuple[int,int]]:
+    """(height, width) of the WARMUP_IMAGE_SHAPES entries ("640x480,1280x720", width x height)"""
+    shapes=[]
+    for spec in get_settings.WARMUP_IMAGE_SHAPES.split(","):
+        if spec.strip():
+            width,height=(int(v) for v in spec.lower().split("x"))
+            shapes.append((height,width))
+    return shapes or [(get_settings.IMAGE_SIZE,get_settings.IMAGE_SIZE)]
+
 
 class GarbageClassifier:
-    def __init__(self):
+    """
+    Detector facade. Creating it is cheap: weights, runtime imports and warmup happen in
+    `load_model`, which the app runs on a background thread during startup (`start_loading`)
+    so the server can bind and answer health checks while the model loads.
+    """
+    def __init__(self,model_path:Optional[Path]=None,backend:Optional[str]=None):
         current_dir=Path(__file__).resolve().parent
-        self.model_path=current_dir / "best.pt"
-        self.model=None
+        self.model_path=Path(model_path) if model_path else current_dir / "best.pt"
+        #runtime of this model, INFERENCE_BACKEND when None
+        self.backend=backend
+        self.model:Optional[InferenceBackend]=None
+        self.model_version=None
         self.class_names=CLASS_NAMES
-        self.load_model()
+        #load progress: not_loaded -> loading -> ready | failed
+        self.state="not_loaded"
+        self.load_stage:Optional[str]=None
+        self.load_error:Optional[str]=None
+        self.load_started_at:Optional[float]=None
+        self.load_seconds:Optional[float]=None
+        self._loader:Optional[threading.Thread]=None
+        self._load_lock=threading.Lock()
+    
+    @property
+    def is_ready(self)->bool:
+        return self.state == "ready"
+    
+    def start_loading(self)->Optional[threading.Thread]:
+        """
+        Load the model on a background thread, unless it is loaded or already loading.
+        A model preloaded before the worker was forked is ready already, no thread is started.
+        """
+        with self._load_lock:
+            idle=self._loader is None or not self._loader.is_alive()
+            if idle and self.state in ("not_loaded","failed"):
+                self.state="loading"
+                self._loader=threading.Thread(target=self._load_in_background,name="model-loader",daemon=True)
+                self._loader.start()
+            return self._loader
+    
+    def _load_in_background(self):
+        try:
+            self.load_model()
+        except Exception:
+            #already logged and recorded in load_error, reported by /api/health
+            pass
         
-    def load_model(self):
+    def load_model(self,backend:Optional[str]=None):
+        self.state="loading"
+        self.load_error=None
+        self.load_started_at=time.time()
+        started=time.perf_counter()
         try:
-            self.model=YOLO(self.model_path)
+            self.load_stage="loading_weights"
+            model=create_backend(self.model_path,backend or self.backend)
+            model.load()
             #verify model matches our expected classes
-            if hasattr(self.model,'names') and self.model.names:
-                model_classes=list(self.model.names.values())
+            if model.names:
+                model_classes=list(model.names.values())
                 if set(model_classes) != set(self.class_names):
                     logger.warning(f"Model Classes {model_classes} don't match expected {self.class_names}")
             
-            #Warm up the model(preparation using dummy_input)
-            dummy_input=np.random.randint(0,255,(get_settings.IMAGE_SIZE,get_settings.IMAGE_SIZE,3),dtype=np.uint8)
-            _ = self.model(dummy_input,verbose=False)
-            logger.info(f"Model loaded successfully for classes: {self.class_names}")
+            self.load_stage="warming_up"
+            self._warm_up(model)
+            self.load_stage="checksum"
+            self.model_version=f"{model.name}-{file_checksum(model.model_path)}"
+            self.model=model
+            self.load_seconds=time.perf_counter() - started
+            self.load_stage=None
+            self.state="ready"
+            logger.info(
+                f"Model loaded successfully with {model.name} backend in {self.load_seconds:.1f}s "
+                f"for classes: {self.class_names}"
+            )
         except Exception as e:
+            self.load_seconds=time.perf_counter() - started
+            self.load_error=repr(e)
+            self.state="failed"
             logger.error(f"Error loading model: {e}")
             raise
-        
-    def preprocess_image(self,image:np.ndarray)->np.ndarray:
+    
+    def load_status(self)->dict:
+        """State, current stage and timing of model loading"""
+        loading=self.state == "loading" and self.load_started_at is not None
+        return {
+            "state":self.state,
+            "stage":self.load_stage,
+            "started_at":self.load_started_at,
+            "elapsed_seconds":time.time() - self.load_started_at if loading else None,
+            "load_seconds":self.load_seconds,
+            "error":self.load_error
+        }
+    
+    def close(self):
+        if self.model is not None:
+            self.model.close()
+    
+    @staticmethod
+    def _warm_up(model:InferenceBackend):
         """
-        Preprocess image for YOLO model with proper resizing 
+        One forward pass per warmup batch size and input shape, so that kernel selection,
+        TorchScript profiling runs and pooled input buffers are done before the first request.
+        Worker processes warm up their own model, the pool only gets a single pass.
         """
-        original_h,original_w=image.shape[:2]
-        resized=cv2.resize(image,(get_settings.IMAGE_SIZE,get_settings.IMAGE_SIZE))
+        if model.worker_stats() is not None:
+            batch_sizes,shapes=[1],warmup_image_shapes()[:1]
+        else:
+            batch_sizes,shapes=warmup_batch_sizes(),warmup_image_shapes()
+        rng=np.random.default_rng(0)
+        started=time.perf_counter()
+        for height,width in shapes:
+            for batch_size in batch_sizes:
+                images=[rng.integers(0,255,(height,width,3),dtype=np.uint8) for _ in range(batch_size)]
+                model.predict_batch(
+                    images,
+                    conf=get_settings.CONFIDENCE_THRESHOLD,
+                    iou=get_settings.IOU_THRESHOLD,
+                    imgsz=get_settings.IMAGE_SIZE
+                )
+        logger.info(
+            f"Warmed up batch sizes {batch_sizes} for shapes {shapes} in {time.perf_counter() - started:.1f}s"
+        )
         
-        #convert to RGB and normalize
-        if len(resized.shape) == 3:
-            resized=cv2.cvtColor(resized,cv2.COLOR_BGR2RGB)
-            
-        normalized=resized.astype(np.float32) / 255.0
-        return normalized
+    def predict(self,image:np.ndarray)->Detections:
+        return self.predict_batch([image])[0]
     
-    def predict(self,image:np.ndarray):
+    def predict_batch(self,images:List[np.ndarray])->List[Detections]:
+        """
+        Run one batched forward pass over several images and return the columnar detections of each image
+        """
+        return self.submit_batch(images).result()
+    
+    def submit_batch(self,images:List[np.ndarray])->Future:
+        """
+        Future of `predict_batch`. With worker processes several batches run at once,
+        otherwise the batch is computed before returning.
+        """
+        future=Future()
+        if not images:
+            future.set_result([])
+            return future
+        if not self.is_ready:
+            future.set_exception(ModelNotReadyError(f"Model is {self.state}"))
+            return future
+        
+        submitted_at=time.perf_counter()
+        
+        def _resolve(batch_future:Future):
+            observe_stage("model_forward",time.perf_counter() - submitted_at)
+            try:
+                future.set_result(batch_future.result())
+            except Exception as e:
+                logger.error(f"Prediction error :{e}")
+                ERRORS.inc(stage="inference")
+                future.set_result([Detections.empty() for _ in images])
+        
+        BATCH_SIZE.observe(len(images))
         try:
-            results=self.model(
-                image,
+            batch_future=self.model.submit_batch(
+                images,
                 conf=get_settings.CONFIDENCE_THRESHOLD,
                 iou=get_settings.IOU_THRESHOLD,
-                imgsz=get_settings.IMAGE_SIZE,
-                verbose=False
+                imgsz=get_settings.IMAGE_SIZE
             )
-            detections=[]
-            for result in results:
-                boxes=result.boxes
-                if boxes is not None and len(boxes) >0:
-                    for box in boxes:
-                        class_id=int(box.cls.item())
-                        class_name=self._get_class_name(class_id)
-                        detection={
-                            "class_id":class_id,
-                            "class_name":class_name,
-                            "confidence":float(box.conf.item()),
-                            "bbox":{
-                                "x1": float(box.xyxy[0][0]),
-                                "y1": float(box.xyxy[0][1]),
-                                "x2": float(box.xyxy[0][2]),
-                                "y2": float(box.xyxy[0][3])
-                            }
-                        }
-                        detections.append(detection)
-            #sort by confidence 
-            detections.sort(key= lambda x:x['confidence'],reverse=True)
-            return detections
         except Exception as e:
             logger.error(f"Prediction error :{e}")
-            return []
+            ERRORS.inc(stage="inference")
+            future.set_result([Detections.empty() for _ in images])
+            return future
+        batch_future.add_done_callback(_resolve)
+        return future
         
     def _get_class_name(self,class_id:int):
         
@@ -1,4 +1,7 @@
 from .health_check import health
 from .classification import router_classify
 from .batch_classification import batch_router
-from .helps import helper_router
\ No newline at end of file
+from .helps import helper_router
+from .streaming import stream_router
+from .model_versions import models_router
+from .readiness import ModelReadinessMiddleware
\ No newline at end of file
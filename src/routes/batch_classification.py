@@ -1,7 +1,13 @@
-from fastapi import APIRouter, HTTPException, status, UploadFile, File
-from typing import List
-from Schemas import BatchClassificationResponse, BatchClassificationResult
-from .classification import classify_image
+from fastapi import APIRouter, HTTPException, status, UploadFile, File, Query, Request
+from typing import List, Optional
+from Schemas import BatchClassificationResponse, BatchClassificationResult, ClassificationResponse
+from Services import ClassificationService, result_cache
+from helpers.executor import executor
+from helpers.image_utils import decode_for_inference
+from helpers.uploads import read_image_upload
+from helpers.compact_response import compact_response
+from .classification import embed_annotated_image
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,9 +17,64 @@ batch_router = APIRouter(
     tags=["batch_classification"]
 )
 
+
+async def _read_upload(file: UploadFile):
+    """Read and validate one upload, returning (contents, cache_key, error)"""
+    try:
+        contents = await read_image_upload(file)
+        key = await executor.run(result_cache.make_key, contents)
+        return contents, key, None
+    except Exception as e:
+        return None, None, str(e)
+
+
+async def _decode_upload(contents: bytes):
+    """Decode one upload, returning (image, original_size, error)"""
+    try:
+        image, original_size = await executor.run(decode_for_inference, contents)
+        if image is None:
+            return None, None, "Could not decode image. Please check the file format."
+        return image, original_size, None
+    except Exception as e:
+        return None, None, str(e)
+
+
+async def _annotate_results(outcomes: dict, images: dict, contents: dict, image_format: str,
+                            quality: int, max_dim: Optional[int]):
+    """Annotate and encode every successful result in parallel, returning cache key -> AnnotatedImage"""
+    keys = [key for key, (result, _) in outcomes.items() if result is not None]
+    # Cache hits and results computed by other requests still need their image decoded
+    missing = [key for key in keys if key not in images]
+    decoded = await asyncio.gather(*(executor.run(decode_for_inference, contents[key]) for key in missing))
+    for key, (image, original_size) in zip(missing, decoded):
+        if image is not None:
+            images[key] = (image, original_size)
+    keys = [key for key in keys if key in images]
+
+    annotated = await ClassificationService.annotate_batch_async(
+        [images[key][0] for key in keys],
+        [outcomes[key][0] for key in keys],
+        max_dim
+    )
+    embedded = await asyncio.gather(*(
+        executor.run(embed_annotated_image, image, image_format, quality) for image in annotated
+    ))
+    return dict(zip(keys, embedded))
+
+
 @batch_router.post("/batch_classify", response_model=BatchClassificationResponse)
-async def batch_classify(files: List[UploadFile] = File(...), limit: int = 20):
-    """Classify multiple images with batch processing"""
+async def batch_classify(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    limit: int = 20,
+    include_images: bool = Query(False, description="Embed an annotated image per file"),
+    image_format: str = Query("jpeg", pattern="^(jpeg|webp)$", description="Encoding of the embedded images"),
+    quality: int = Query(85, ge=1, le=100, description="JPEG/WebP quality of the embedded images"),
+    max_dim: Optional[int] = Query(None, ge=64, le=8192, description="Downscale embedded images so their long side fits"),
+    response_format: str = Query("default", alias="format", pattern="^(default|columnar)$",
+                                 description="'columnar' returns parallel detection arrays (JSON or msgpack, gzip/br compressed)")
+):
+    """Classify multiple images with batch processing, optionally returning annotated images"""
     
     if len(files) > limit:
         raise HTTPException(
@@ -21,31 +82,117 @@ async def batch_classify(files: List[UploadFile] = File(...), limit: int = 20):
             detail=f"Maximum {limit} images allowed per batch"
         )
 
-    results = []
-    successful = 0
-    failed = 0
+    uploads = await asyncio.gather(*(_read_upload(file) for file in files))
+    outcomes = {}   # cache key -> (result, error)
+    images = {}     # cache key -> (decoded image, original size)
+    waiting = {}    # cache key -> future of a request already computing it
+    owned = {}      # cache key -> upload contents this batch has to compute
 
-    for file in files:
-        try:
-            
-            result = await classify_image(file)
+    # Serve cache hits, join in-flight computations and claim the rest
+    for contents, key, error in uploads:
+        if error is not None or key in outcomes or key in waiting or key in owned:
+            continue
+        cached = result_cache.get(key)
+        if cached is not None:
+            outcomes[key] = (cached, None)
+            continue
+        inflight = result_cache.claim(key)
+        if inflight is not None:
+            waiting[key] = inflight
+        else:
+            owned[key] = contents
 
-            results.append(BatchClassificationResult(
-                filename=file.filename,
-                result=result
-            ))
-            successful += 1
+    try:
+        # Decode every claimed upload in parallel, keeping per-file errors isolated
+        keys = list(owned)
+        decoded = await asyncio.gather(*(_decode_upload(owned[key]) for key in keys))
+        valid_keys = []
+        for key, (image, _, error) in zip(keys, decoded):
+            if image is None:
+                outcomes[key] = (None, error)
+                result_cache.fail(key, ValueError(error))
+            else:
+                valid_keys.append(key)
+
+        # Run the decoded images through the model in chunked batched forward passes
+        if valid_keys:
+            images.update({key: (image, original_size) for key, (image, original_size, _) in zip(keys, decoded)})
+            batch_results = await ClassificationService.classify_batch_async(
+                [images[key][0] for key in valid_keys],
+                original_sizes=[images[key][1] for key in valid_keys]
+            )
+            for key, result in zip(valid_keys, batch_results):
+                outcomes[key] = (result, None)
+                result_cache.resolve(key, result)
+    except BaseException as e:
+        logger.error(f"Batch inference error: {e}")
+        for key in owned:
+            if key not in outcomes:
+                outcomes[key] = (None, str(e))
+            result_cache.fail(key, e)
+        if not isinstance(e, Exception):
+            raise
+
+    for key, future in waiting.items():
+        try:
+            outcomes[key] = (await asyncio.shield(future), None)
+        except Exception as e:
+            outcomes[key] = (None, str(e))
 
+    annotated = {}
+    if include_images:
+        contents = {key: contents for contents, key, error in uploads if error is None}
+        try:
+            annotated = await _annotate_results(outcomes, images, contents, image_format, quality, max_dim)
         except Exception as e:
-            logger.error(f"Batch processing error for {file.filename}: {e}")
-            results.append(BatchClassificationResult(
-                filename=file.filename,
-                error=str(e)
-            ))
+            # Classification results are still returned without images
+            logger.error(f"Batch annotation error: {e}")
+
+    entries = []
+    successful = 0
+    failed = 0
+
+    for file, (_, key, error) in zip(files, uploads):
+        result = None
+        if error is None:
+            result, error = outcomes[key]
+        if result is not None:
+            entries.append((file.filename, result, annotated.get(key), None))
+            successful += 1
+        else:
+            logger.error(f"Batch processing error for {file.filename}: {error}")
+            entries.append((file.filename, None, None, error))
             failed += 1
 
+    if response_format == "columnar":
+        # Class metadata is shared by the whole batch
+        return await compact_response(request, {
+            "format": "columnar",
+            "classes": ClassificationService.class_table(),
+            "results": [
+                {
+                    "filename": filename,
+                    "result": ClassificationService.to_columnar(result) if result is not None else None,
+                    "annotated_image": image.model_dump() if image is not None else None,
+                    "error": error
+                }
+                for filename, result, image, error in entries
+            ],
+            "total_processed": len(files),
+            "successful": successful,
+            "failed": failed
+        })
+
     return BatchClassificationResponse(
-        results=results,
+        results=[
+            BatchClassificationResult(
+                filename=filename,
+                result=ClassificationResponse(**result) if result is not None else None,
+                annotated_image=image,
+                error=error
+            )
+            for filename, result, image, error in entries
+        ],
         total_processed=len(files),
         successful=successful,
         failed=failed
@@ -1,54 +1,54 @@
-from fastapi import APIRouter,UploadFile,File,HTTPException,status
+from fastapi import APIRouter,UploadFile,File,HTTPException,Query,Request,status
 from fastapi.responses import StreamingResponse
-from Schemas import ClassificationResponse
+from Schemas import ClassificationResponse,AnnotatedClassificationResponse,AnnotatedImage
 import logging
-from helpers.Settings import get_settings
 import numpy as np
-import cv2 ,io 
-from typing import List
+import io ,base64
+from typing import List,Optional
 from Schemas import ClassInfo
-from Services import ClassificationService
+from Services import ClassificationService,result_cache,motion_gate,frame_deduplicator
+from helpers.executor import executor
+from helpers.image_utils import decode_for_inference,encode_image,IMAGE_FORMATS
+from helpers.uploads import read_image_upload
+from helpers.compact_response import compact_response
+from helpers.metrics import stage_timer
 logger=logging.getLogger(__name__)
 
 router_classify=APIRouter(prefix="/api/classify",tags=["Classification"])
 
+
 @router_classify.post("",response_model=ClassificationResponse)
-async def classify_image(file:UploadFile = File(...)):
-    if file.content_type not in get_settings.ALLOWED_IMAGE_TYPES:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File type not supported. Allowed types: {', '.join(get_settings.ALLOWED_IMAGE_TYPES)}"
-        )
+async def classify_image(
+    request:Request,
+    file:UploadFile = File(...),
+    source_id:Optional[str]=Query(None,description="Camera/source ID, enables near-duplicate frame reuse"),
+    response_format:str=Query("default",alias="format",pattern="^(default|columnar)$",
+                              description="'columnar' returns parallel detection arrays (JSON or msgpack, gzip/br compressed)"),
+    tiled:Optional[bool]=Query(None,description="Classify images with a long side of at least TILING_MIN_SIDE tile by tile (default: ENABLE_TILED_INFERENCE)")
+):
     try:
-        #validate file size(max 10MB)
-        max_size=10*1024*1024
-        contents=await file.read()
-        if len(contents) > max_size:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="File too large. Maximum size is 10MB."
-            )
-        # Decode Image
-        nparr=np.frombuffer(contents,np.uint8)
-        image=cv2.imdecode(nparr,cv2.IMREAD_COLOR)
+        contents=await read_image_upload(file)
         
-        if image is None:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Could not decode image. Please check the file format."
-            )
-        #Convert BGR to RGB
-        image_rgb=cv2.cvtColor(image,cv2.COLOR_BGR2RGB)
-        
-        #perform classification 
-        result =ClassificationService.classify_image(image=image_rgb)
+        #perform classification, identical uploads share one cached inference
+        if _uses_source_history(source_id):
+            result=await _classify_contents(contents,source_id=source_id,tiled=tiled)
+        else:
+            key=await executor.run(result_cache.make_key,contents,"" if tiled is None else f"tiled={tiled}")
+            result=await result_cache.get_or_compute(key,lambda: _classify_contents(contents,source_id=source_id,tiled=tiled))
         
         logger.info(
             f"Classification completed: {result['total_objects']} objects detected, "
             f"time: {result['processing_time']:.2f}s"
         )
         
-        return ClassificationResponse(**result)
+        if response_format == "columnar":
+            return await compact_response(request,{
+                "format":"columnar",
+                "classes":ClassificationService.class_table(),
+                **ClassificationService.to_columnar(result)
+            })
+        with stage_timer("serialize"):
+            return ClassificationResponse(**result)
     except HTTPException:
         raise
     except Exception as e:
@@ -59,37 +59,123 @@ async def classify_image(file:UploadFile = File(...)):
         )
         
 @router_classify.post("/annotate-image")       
-async def classify_with_annotated_image(file:UploadFile=File(...)):
+async def classify_with_annotated_image(
+    file:UploadFile=File(...),
+    source_id:Optional[str]=Query(None,description="Camera/source ID, enables near-duplicate frame reuse"),
+    quality:Optional[int]=Query(None,ge=1,le=100,description="JPEG quality of the annotated image"),
+    max_dim:Optional[int]=Query(None,ge=64,le=8192,description="Downscale the annotated image so its long side fits")
+):
     """Classify image and return annotated image with bounding boxes."""
     try:
-        contents=await file.read()
-        nparr=np.frombuffer(contents,np.uint8)
-        image=cv2.imdecode(nparr,cv2.IMREAD_COLOR)
-        if image is None:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                                detail="Could not decode image")
-            
-        # Convert to RGB for classification
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        contents=await read_image_upload(file)
         
-        # Perform classification
-        result = ClassificationService.classify_image(image_rgb)
+        result,image=await _classify_with_image(contents,source_id)
         
-        #Draw ounding boxes on original image
-        annotated_image=ClassificationService._draw_detections(image,result["detections"])
-        
-        #Encode annotated image 
-        _,encoded_image=cv2.imencode('.jpg',annotated_image)
-        image_bytes=encoded_image.tobytes()
+        #Draw bounding boxes on the decoded image (possibly reduced) and encode it in the pool
+        image_bytes,_=await executor.run(_annotate_and_encode,image,result,"jpeg",quality,max_dim)
         return StreamingResponse(
             io.BytesIO(image_bytes), 
             media_type="image/jpeg",
             headers={
                 "X-Detection-Count": str(result["total_objects"]),
-                "X-Processing-Time": f"{result['processing_time']:.3f}"
+                "X-Processing-Time": f"{result['processing_time']:.3f}",
+                "X-Detections-Reused": str(result["reused"]).lower(),
+                "X-Reuse-Reason": result["reuse_reason"] or ""
             }
         )
+    except HTTPException:
+        raise
     except Exception as e :
         logger.error(f"Annotated image error: {e}")
         raise HTTPException(status_code=500, detail="Error generating annotated image")
-        
+
+
+@router_classify.post("/annotated",response_model=AnnotatedClassificationResponse)
+async def classify_annotated(
+    file:UploadFile=File(...),
+    source_id:Optional[str]=Query(None,description="Camera/source ID, enables near-duplicate frame reuse"),
+    include_image:bool=Query(True,description="Embed the annotated image in the response"),
+    image_format:str=Query("jpeg",pattern="^(jpeg|webp)$",description="Encoding of the embedded image"),
+    quality:int=Query(85,ge=1,le=100,description="JPEG/WebP quality of the embedded image"),
+    max_dim:Optional[int]=Query(None,ge=64,le=8192,description="Downscale the embedded image so its long side fits")
+):
+    """
+    Classify an image and return the full classification result together with the
+    annotated image (base64) in one response, running inference once.
+    """
+    try:
+        contents=await read_image_upload(file)
+        result,image=await _classify_with_image(contents,source_id)
+        annotated=None
+        if include_image:
+            annotated_image,=await ClassificationService.annotate_batch_async([image],[result],max_dim)
+            annotated=await executor.run(embed_annotated_image,annotated_image,image_format,quality)
+        return AnnotatedClassificationResponse(**result,annotated_image=annotated)
+    except HTTPException:
+        raise
+    except Exception as e :
+        logger.error(f"Annotated classification error: {e}")
+        raise HTTPException(status_code=500, detail="Error generating annotated image")
+
+
+def _uses_source_history(source_id:Optional[str])->bool:
+    """
+    Source-tagged frames bypass the exact-content cache when motion gating or dedup is on:
+    a cache hit would skip updating the source's history, and a result reused from an
+    earlier frame must not be served for these bytes to other callers.
+    """
+    return source_id is not None and (motion_gate.enabled or frame_deduplicator.enabled)
+
+
+async def _classify_with_image(contents:bytes,source_id:Optional[str]=None):
+    """Classify upload bytes (cached) and return (result, decoded BGR image to annotate)"""
+    # Perform classification, reusing the cached result of identical uploads
+    decoded={}
+    if _uses_source_history(source_id):
+        result=await _classify_contents(contents,decoded,source_id)
+    else:
+        key=await executor.run(result_cache.make_key,contents)
+        result=await result_cache.get_or_compute(key,lambda: _classify_contents(contents,decoded,source_id))
+    image=decoded.get("image")
+    if image is None:
+        image,_=await executor.run(decode_for_inference,contents)
+        if image is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="Could not decode image")
+    return result,image
+
+
+async def _classify_contents(contents:bytes,decoded:Optional[dict]=None,source_id:Optional[str]=None,
+                             tiled:Optional[bool]=None):
+    """Decode and classify upload bytes, optionally handing the decoded BGR image back through `decoded`"""
+    # Decode Image off the event loop, the model takes the BGR image as is (in full when it will be tiled)
+    image,original_size=await executor.run(decode_for_inference,contents,None,tiled)
+    if image is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Could not decode image. Please check the file format."
+        )
+    if decoded is not None:
+        decoded["image"]=image
+    return await ClassificationService.classify_image_async(image=image,source_id=source_id,original_size=original_size,tiled=tiled)
+
+
+def _annotate_and_encode(image:np.ndarray,result:dict,image_format:str="jpeg",quality:Optional[int]=None,
+                         max_dim:Optional[int]=None):
+    """Draw the detections of `result` on `image`, returning (encoded bytes, (height, width))"""
+    #detections are in original image coordinates, the image may be a reduced decode
+    scale=image.shape[1] / result["image_size"]["width"]
+    annotated_image=ClassificationService._draw_detections(image,result["detections"],scale,max_dim)
+    return encode_image(annotated_image,IMAGE_FORMATS[image_format][0],quality),annotated_image.shape[:2]
+
+
+def embed_annotated_image(annotated_image:np.ndarray,image_format:str="jpeg",quality:Optional[int]=None)->AnnotatedImage:
+    """Encode an annotated image for embedding in a JSON response"""
+    extension,media_type=IMAGE_FORMATS[image_format]
+    height,width=annotated_image.shape[:2]
+    return AnnotatedImage(
+        media_type=media_type,
+        width=width,
+        height=height,
+        data=base64.b64encode(encode_image(annotated_image,extension,quality)).decode("ascii")
+    )
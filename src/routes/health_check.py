@@ -1,21 +1,109 @@
-from fastapi import APIRouter
+from fastapi import APIRouter,Response,status
+from fastapi.responses import PlainTextResponse
 import logging
 from Schemas import HealthCheck
-from models import classifier
+from models import registry
+from Services import result_cache,frame_deduplicator,motion_gate,stream_registry,annotation_renderer
 from helpers.Settings import get_settings
+from helpers.executor import executor
+from helpers.metrics import metrics
 
 logger=logging.getLogger(__name__)
 health=APIRouter(prefix="/api",tags=["health_check"])
 
 @health.get("/health",response_model=HealthCheck)
 async def health_check():
-    
+    """Overall status: liveness, readiness and model loading progress"""
+    ready=registry.is_ready
+    classifier=registry.main().classifier
     return HealthCheck(
-        status="healthy",
+        status="healthy" if ready else classifier.state,
+        live=True,
+        ready=ready,
         model_loaded=classifier.model is not None ,
+        model=classifier.load_status(),
         total_classes=len(classifier.class_names),
         class_names=classifier.class_names,
-        version=get_settings.APP_VERSION
+        version=get_settings.APP_VERSION,
+        workers=classifier.model.worker_stats() if classifier.model is not None else None,
+        versions=registry.versions()
     )
-    
 
+
+@health.get("/health/live")
+async def liveness():
+    """The process is up and serving requests, even while the model loads"""
+    return {"status":"alive"}
+
+
+@health.get("/health/ready")
+async def readiness(response:Response):
+    """503 until the model is loaded and warmed up"""
+    ready=registry.is_ready
+    if not ready:
+        response.status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+        response.headers["Retry-After"]=str(get_settings.MODEL_RETRY_AFTER_SECONDS)
+    return {"ready":ready,"model":registry.main().classifier.load_status()}
+
+
+@health.get("/stats")
+async def inference_stats():
+    """Counters of the inference layers in front of the model"""
+    main=registry.main()
+    return {
+        "batch_scheduler":main.scheduler.stats(),
+        "batch_schedulers":{version.name:version.scheduler.stats() for version in registry.active_versions()},
+        "input_buffers":main.classifier.model.input_pool.stats() if main.classifier.model is not None else None,
+        "result_cache":result_cache.stats(),
+        "motion_gate":motion_gate.stats(),
+        "frame_dedup":frame_deduplicator.stats(),
+        "streams":stream_registry.stats(),
+        "annotation":annotation_renderer.stats()
+    }
+
+
+metrics.gauge_callback(
+    "batch_queue_depth",
+    "Images waiting for the next batch",
+    lambda: sum(version.scheduler.queue_depth() for version in registry.active_versions())
+)
+metrics.gauge_callback(
+    "model_version_in_flight",
+    "Requests running on each active model version",
+    lambda: {(version.name,):version.in_flight for version in registry.active_versions()},
+    labelnames=("version",)
+)
+metrics.gauge_callback(
+    "model_version_weight",
+    "Traffic weight of each active model version",
+    lambda: {(version.name,):version.weight for version in registry.active_versions()},
+    labelnames=("version",)
+)
+metrics.gauge_callback("executor_pending_jobs","Jobs queued or running on the inference thread pool",executor.pending)
+metrics.gauge_callback("active_streams","Open WebSocket streams",lambda: len(stream_registry))
+metrics.counter_callback(
+    "result_cache_lookups_total",
+    "Result cache lookups by outcome",
+    lambda: {
+        ("hit",):result_cache.hits,
+        ("miss",):result_cache.misses,
+        ("coalesced",):result_cache.coalesced
+    },
+    labelnames=("outcome",)
+)
+metrics.gauge_callback("result_cache_entries","Results held in the cache",lambda: len(result_cache))
+metrics.counter_callback(
+    "reused_frames_total",
+    "Frames answered without inference, by reason",
+    lambda: {
+        ("no_motion",):motion_gate.gated,
+        ("near_duplicate",):frame_deduplicator.reused
+    },
+    labelnames=("reason",)
+)
+
+
+@health.get("/metrics",response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage latency histograms and request/detection/cache counters in Prometheus text format"""
+    return PlainTextResponse(metrics.render(),media_type="text/plain; version=0.0.4")
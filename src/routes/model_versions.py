@@ -0,0 +1,68 @@
+from fastapi import APIRouter,Depends,Header,HTTPException,status
+from typing import List,Optional
+import hmac
+import logging
+
+from Schemas import DeployModelRequest,ModelVersionStatus,ModelWeightsRequest
+from models import registry
+from helpers.Settings import get_settings
+
+logger=logging.getLogger(__name__)
+
+
+def require_admin_token(x_admin_token:Optional[str]=Header(None)):
+    """Model administration is disabled unless MODEL_ADMIN_TOKEN is set, and then requires it"""
+    if not get_settings.MODEL_ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,detail="Model administration is disabled.")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token,get_settings.MODEL_ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,detail="Invalid admin token.")
+
+
+models_router=APIRouter(prefix="/api/models",tags=["Model versions"],dependencies=[Depends(require_admin_token)])
+
+
+@models_router.get("",response_model=List[ModelVersionStatus])
+async def list_versions():
+    """Active, loading and draining model versions with their traffic weights and request counts"""
+    return registry.versions()
+
+
+@models_router.post("",response_model=ModelVersionStatus,status_code=status.HTTP_202_ACCEPTED)
+async def deploy_version(request:DeployModelRequest):
+    """
+    Load a model version in the background. Once warmed up it replaces the active versions,
+    or, with `weight`, serves that share of the traffic next to them. Requests already running
+    finish on the version they started on.
+    """
+    try:
+        version=registry.deploy(request.name,request.model_path,weight=request.weight,backend=request.backend)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,detail=str(e))
+    logger.info(f"Deploying model version '{request.name}' from {request.model_path}")
+    return {**version.stats(),"main":False}
+
+
+@models_router.put("/weights",response_model=List[ModelVersionStatus])
+async def set_weights(request:ModelWeightsRequest):
+    """Change the traffic split between active versions; a weight of 0 keeps a version loaded without traffic"""
+    try:
+        registry.set_weights(request.weights)
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail=str(e))
+    return registry.versions()
+
+
+@models_router.delete("/{name}",response_model=List[ModelVersionStatus])
+async def retire_version(name:str):
+    """Stop routing to a version; it is unloaded once its running requests complete"""
+    try:
+        registry.retire(name)
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,detail=str(e))
+    return registry.versions()
@@ -0,0 +1,67 @@
+import json
+
+from models import registry
+from helpers.Settings import get_settings
+
+#routes that need the model; health, metrics and helper routes stay available while it loads
+MODEL_ROUTE_PREFIXES=("/api/classify","/api/batch_classify","/api/stream")
+
+
+class ModelReadinessMiddleware:
+    """
+    Answer model-backed routes with 503 + Retry-After until a model version is loaded,
+    and pin every accepted HTTP request to one model version for its whole duration.
+
+    Runs before routing and body parsing, so uploads that arrive during startup are
+    turned away without being read. WebSocket handshakes are closed with code 1013
+    (try again later); accepted streams pick a version per frame. The version that
+    served a request is returned in the X-Model-Version header.
+    """
+    def __init__(self,app):
+        self.app=app
+
+    async def __call__(self,scope,receive,send):
+        if scope["type"] not in ("http","websocket") or not scope["path"].startswith(MODEL_ROUTE_PREFIXES):
+            await self.app(scope,receive,send)
+            return
+        if scope["type"] == "websocket":
+            if registry.is_ready:
+                await self.app(scope,receive,send)
+                return
+            await receive()
+            await send({"type":"websocket.close","code":1013,"reason":"Model is loading"})
+            return
+
+        version=registry.acquire()
+        if version is None:
+            await self._not_ready(send)
+            return
+        header=(b"x-model-version",version.name.encode())
+
+        async def send_with_version(message):
+            if message["type"] == "http.response.start":
+                message["headers"]=[*message.get("headers",[]),header]
+            await send(message)
+
+        #released (and a replaced version closed once drained) when the response is complete
+        with registry.use(version):
+            await self.app(scope,receive,send_with_version)
+
+    @staticmethod
+    async def _not_ready(send):
+        status=registry.main().classifier.load_status()
+        body=json.dumps({
+            "detail":"Model is not ready yet. Please retry shortly." if status["state"] != "failed"
+                     else "Model failed to load.",
+            "model":status
+        }).encode()
+        await send({
+            "type":"http.response.start",
+            "status":503,
+            "headers":[
+                (b"content-type",b"application/json"),
+                (b"content-length",str(len(body)).encode()),
+                (b"retry-after",str(get_settings.MODEL_RETRY_AFTER_SECONDS).encode()),
+            ]
+        })
+        await send({"type":"http.response.body","body":body})
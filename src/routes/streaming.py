@@ -0,0 +1,86 @@
+from fastapi import APIRouter,WebSocket,WebSocketDisconnect,Query,HTTPException
+from typing import Optional
+from Schemas import ClassificationResponse
+from Services import ClassificationService,ObjectTracker,stream_registry
+from models import registry
+from helpers.executor import executor
+from helpers.image_utils import decode_for_inference
+from helpers.uploads import check_image_bytes
+import asyncio
+import logging
+logger=logging.getLogger(__name__)
+
+stream_router=APIRouter(prefix="/api",tags=["Streaming"])
+
+@stream_router.websocket("/stream")
+async def classify_stream(
+    websocket:WebSocket,
+    source_id:Optional[str]=Query(None,description="Camera/source ID, enables near-duplicate frame reuse"),
+    mode:str=Query("detect",pattern="^(detect|track)$",description="'track' runs the detector every few frames and tracks boxes in between")
+):
+    """
+    Continuous classification of encoded frames (JPEG/PNG/WebP) sent as binary messages.
+
+    Each processed frame is answered with a JSON message holding its sequence number,
+    the classification result and the stream counters. When inference falls behind,
+    stale frames are dropped and only the newest one is processed.
+    In `track` mode detections carry stable track IDs.
+    """
+    await websocket.accept()
+    session=stream_registry.open(source_id)
+    if mode == "track":
+        session.tracker=ObjectTracker.from_settings()
+    processor=asyncio.create_task(_process_frames(websocket,session))
+    try:
+        while True:
+            frame=await websocket.receive_bytes()
+            try:
+                check_image_bytes(frame)
+            except HTTPException as e:
+                await websocket.send_json({"error":e.detail,"stream":session.stats()})
+                continue
+            session.put(frame)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Stream {session.stream_id} receive error: {e}")
+    finally:
+        stream_registry.close(session)
+        processor.cancel()
+        try:
+            await processor
+        except (asyncio.CancelledError,Exception):
+            pass
+        logger.info(f"Stream {session.stream_id} closed: {session.stats()}")
+
+
+async def _process_frames(websocket:WebSocket,session):
+    while True:
+        item=await session.next_frame()
+        if item is None:
+            return
+        sequence,frame,received_at=item
+        try:
+            image,original_size=await executor.run(decode_for_inference,frame)
+            if image is None:
+                session.done(received_at,error=True)
+                await websocket.send_json({"frame":sequence,"error":"Could not decode frame","stream":session.stats()})
+                continue
+            #each frame is pinned to a model version, a long-lived stream follows version swaps
+            with registry.use():
+                if session.tracker is not None:
+                    result=await ClassificationService.classify_tracked_async(image,session.tracker,original_size=original_size)
+                else:
+                    result=await ClassificationService.classify_image_async(image,source_id=session.source_id,original_size=original_size)
+            session.done(received_at)
+            await websocket.send_json({
+                "frame":sequence,
+                "result":ClassificationResponse(**result).model_dump(mode="json"),
+                "stream":session.stats()
+            })
+        except (asyncio.CancelledError,WebSocketDisconnect):
+            raise
+        except Exception as e:
+            logger.error(f"Stream {session.stream_id} processing error: {e}")
+            session.done(received_at,error=True)
+            await websocket.send_json({"frame":sequence,"error":"Error processing frame","stream":session.stats()})
@@ -0,0 +1,368 @@
+"""
+Load-test the API and write a machine-readable baseline.
+
+Synthetic images of configurable sizes and object densities are sent at several
+concurrency levels to /api/classify, /api/batch_classify and
+/api/classify/annotate-image. Each scenario reports p50/p95/p99 latency,
+images per second and peak RSS. By default `main.app` is driven in-process
+through httpx's ASGI transport (lifespan included); pass --url to load a running
+uvicorn instance instead (--server-pid adds its RSS).
+
+Uploads are made unique by appending bytes after the image data, so the result
+cache does not answer repeated requests (--allow-cache keeps them identical).
+
+Usage (from src/):
+    python -m scripts.benchmark --sizes 640x480,1920x1080 --densities 3,30 --concurrency 1,8 --output bench.json
+    python -m scripts.benchmark --url http://localhost:8000 --compare bench.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from helpers.Settings import get_settings
+
+logger=logging.getLogger(__name__)
+
+ENDPOINTS={
+    "classify":"/api/classify",
+    "batch":"/api/batch_classify",
+    "annotate":"/api/classify/annotate-image",
+}
+MEDIA_TYPES={"jpeg":("image/jpeg",".jpg"),"png":("image/png",".png"),"webp":("image/webp",".webp")}
+RSS_SAMPLE_INTERVAL=0.05
+
+
+def synthetic_image(width:int,height:int,objects:int,rng:np.random.Generator)->np.ndarray:
+    """Noisy gradient background with `objects` filled rectangles and ellipses of random colors"""
+    gradient=np.linspace(40,200,width,dtype=np.float32)[None,:,None]
+    #a copy in C order, cv2 drawing rejects the broadcast stride layout
+    image=np.ascontiguousarray(np.broadcast_to(gradient,(height,width,3)),dtype=np.float32)
+    image+=rng.normal(0,12,(height,width,3)).astype(np.float32)
+    image=image.clip(0,255).astype(np.uint8)
+    short_side=min(width,height)
+    for _ in range(objects):
+        w,h=(int(v) for v in rng.integers(short_side // 20 + 1,short_side // 4 + 2,size=2))
+        x,y=int(rng.integers(0,max(1,width - w))),int(rng.integers(0,max(1,height - h)))
+        color=tuple(int(c) for c in rng.integers(0,256,size=3))
+        if rng.random() < 0.5:
+            cv2.rectangle(image,(x,y),(x + w,y + h),color,cv2.FILLED)
+        else:
+            cv2.ellipse(image,(x + w // 2,y + h // 2),(w // 2,h // 2),0,0,360,color,cv2.FILLED)
+    return image
+
+
+def encode_variants(width:int,height:int,objects:int,image_format:str,variants:int,seed:int)->List[bytes]:
+    rng=np.random.default_rng(seed)
+    extension=MEDIA_TYPES[image_format][1]
+    encoded=[]
+    for _ in range(variants):
+        ok,data=cv2.imencode(extension,synthetic_image(width,height,objects,rng))
+        if not ok:
+            raise SystemExit(f"Could not encode a synthetic {image_format} image")
+        encoded.append(data.tobytes())
+    return encoded
+
+
+class UploadSource:
+    """Round-robin over pre-encoded images, optionally made unique per request"""
+    def __init__(self,images:List[bytes],unique:bool):
+        self._images=itertools.cycle(images)
+        self._counter=itertools.count()
+        self.unique=unique
+
+    def next(self)->bytes:
+        data=next(self._images)
+        if self.unique:
+            #decoders stop at the end-of-image marker, the trailer only changes the content hash
+            data=data + next(self._counter).to_bytes(8,"big")
+        return data
+
+
+def read_rss_mb(pid:int)->Optional[float]:
+    """Current resident set size of a process from /proc (Linux), None elsewhere"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+class RssSampler:
+    """Peak RSS of a process over a scenario, sampled in the background"""
+    def __init__(self,pid:Optional[int]):
+        self.pid=pid
+        self.peak:Optional[float]=None
+        self._task=None
+
+    async def _run(self):
+        while True:
+            rss=read_rss_mb(self.pid)
+            if rss is not None:
+                self.peak=rss if self.peak is None else max(self.peak,rss)
+            await asyncio.sleep(RSS_SAMPLE_INTERVAL)
+
+    def __enter__(self):
+        if self.pid is not None:
+            self._task=asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self,*exc):
+        if self._task is not None:
+            self._task.cancel()
+
+
+def percentiles(latencies:List[float])->Dict[str,float]:
+    if not latencies:
+        return {"p50":0.0,"p95":0.0,"p99":0.0,"mean":0.0,"max":0.0}
+    values=np.asarray(latencies) * 1000
+    return {
+        "p50":float(np.percentile(values,50)),
+        "p95":float(np.percentile(values,95)),
+        "p99":float(np.percentile(values,99)),
+        "mean":float(values.mean()),
+        "max":float(values.max())
+    }
+
+
+async def run_scenario(client,endpoint:str,source:UploadSource,image_format:str,concurrency:int,
+                       requests:int,batch_files:int,rss_pid:Optional[int])->dict:
+    media_type,extension=MEDIA_TYPES[image_format]
+    path=ENDPOINTS[endpoint]
+    images_per_request=batch_files if endpoint == "batch" else 1
+    latencies=[]
+    errors=0
+    remaining=itertools.count()
+
+    async def _worker():
+        nonlocal errors
+        while next(remaining) < requests:
+            if endpoint == "batch":
+                files=[("files",(f"bench_{i}{extension}",source.next(),media_type)) for i in range(batch_files)]
+            else:
+                files={"file":(f"bench{extension}",source.next(),media_type)}
+            start=time.perf_counter()
+            try:
+                response=await client.post(path,files=files)
+                await response.aread()
+                ok=response.status_code == 200
+            except Exception as e:
+                logger.debug(f"Request to {path} failed: {e}")
+                ok=False
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    with RssSampler(rss_pid) as sampler:
+        start=time.perf_counter()
+        await asyncio.gather(*(_worker() for _ in range(concurrency)))
+        elapsed=time.perf_counter() - start
+
+    return {
+        "requests":requests,
+        "errors":errors,
+        "latency_ms":percentiles(latencies),
+        "requests_per_s":requests / elapsed if elapsed else 0.0,
+        "images_per_s":requests * images_per_request / elapsed if elapsed else 0.0,
+        "peak_rss_mb":sampler.peak
+    }
+
+
+async def wait_until_ready(client,timeout:float):
+    """Poll the readiness probe until the model is loaded"""
+    deadline=time.monotonic() + timeout
+    while True:
+        try:
+            response=await client.get("/api/health/ready")
+            if response.status_code == 200:
+                return
+            model=response.json().get("model",{})
+            if model.get("state") == "failed":
+                raise SystemExit(f"Model failed to load: {model.get('error')}")
+        except (OSError,ValueError) as e:
+            logger.debug(f"Readiness probe failed: {e}")
+        if time.monotonic() > deadline:
+            raise SystemExit(f"Model not ready after {timeout:.0f}s")
+        await asyncio.sleep(0.5)
+
+
+def scenario_key(scenario:dict)->Tuple:
+    return (scenario["endpoint"],scenario["size"],scenario["objects"],scenario["concurrency"])
+
+
+def compare(current:dict,baseline:dict,tolerance:float)->List[str]:
+    """Regressions of p95 latency or throughput beyond `tolerance` (relative) against a baseline"""
+    previous={scenario_key(s):s for s in baseline.get("scenarios",[])}
+    regressions=[]
+    for scenario in current["scenarios"]:
+        old=previous.get(scenario_key(scenario))
+        if old is None:
+            continue
+        name="{} {} objects={} concurrency={}".format(*scenario_key(scenario))
+        p95,old_p95=scenario["latency_ms"]["p95"],old["latency_ms"]["p95"]
+        rate,old_rate=scenario["images_per_s"],old["images_per_s"]
+        logger.info(
+            f"{name}: p95 {old_p95:.1f} -> {p95:.1f}ms, "
+            f"{old_rate:.1f} -> {rate:.1f} images/s"
+        )
+        if old_p95 and p95 > old_p95 * (1 + tolerance):
+            regressions.append(f"{name}: p95 latency {old_p95:.1f} -> {p95:.1f}ms")
+        if old_rate and rate < old_rate * (1 - tolerance):
+            regressions.append(f"{name}: throughput {old_rate:.1f} -> {rate:.1f} images/s")
+    return regressions
+
+
+def git_commit()->Optional[str]:
+    try:
+        return subprocess.run(
+            ["git","rev-parse","--short","HEAD"],capture_output=True,text=True,check=True,
+            cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except (OSError,subprocess.CalledProcessError):
+        return None
+
+
+def parse_sizes(value:str)->List[Tuple[int,int]]:
+    sizes=[]
+    for item in value.split(","):
+        width,_,height=item.lower().partition("x")
+        sizes.append((int(width),int(height)))
+    return sizes
+
+
+def parse_ints(value:str)->List[int]:
+    return [int(item) for item in value.split(",")]
+
+
+async def run(args)->dict:
+    import httpx
+
+    if args.url:
+        client=httpx.AsyncClient(base_url=args.url,timeout=args.timeout)
+        rss_pid=args.server_pid
+        lifespan=None
+    else:
+        from main import app
+        client=httpx.AsyncClient(transport=httpx.ASGITransport(app=app),base_url="http://benchmark",timeout=args.timeout)
+        rss_pid=os.getpid()
+        lifespan=app.router.lifespan_context(app)
+
+    scenarios=[]
+    async with client:
+        if lifespan is not None:
+            await lifespan.__aenter__()
+        try:
+            start=time.perf_counter()
+            await wait_until_ready(client,args.ready_timeout)
+            logger.info(f"Model ready after {time.perf_counter() - start:.1f}s")
+            for (width,height),objects in itertools.product(parse_sizes(args.sizes),parse_ints(args.densities)):
+                images=encode_variants(width,height,objects,args.image_format,args.variants,args.seed)
+                source=UploadSource(images,unique=not args.allow_cache)
+                for endpoint in args.endpoints.split(","):
+                    if args.warmup:
+                        await run_scenario(client,endpoint,source,args.image_format,1,args.warmup,args.batch_files,None)
+                    for concurrency in parse_ints(args.concurrency):
+                        result=await run_scenario(
+                            client,endpoint,source,args.image_format,concurrency,args.requests,args.batch_files,rss_pid
+                        )
+                        scenario={
+                            "endpoint":endpoint,
+                            "size":f"{width}x{height}",
+                            "objects":objects,
+                            "concurrency":concurrency,
+                            "upload_kb":round(sum(len(image) for image in images) / len(images) / 1024,1),
+                            **result
+                        }
+                        scenarios.append(scenario)
+                        latency=scenario["latency_ms"]
+                        logger.info(
+                            f"{endpoint} {width}x{height} objects={objects} concurrency={concurrency}: "
+                            f"p50 {latency['p50']:.1f}ms p95 {latency['p95']:.1f}ms p99 {latency['p99']:.1f}ms, "
+                            f"{scenario['images_per_s']:.1f} images/s, errors {scenario['errors']}"
+                        )
+        finally:
+            if lifespan is not None:
+                await lifespan.__aexit__(None,None,None)
+
+    return {
+        "meta":{
+            "timestamp":time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit":git_commit(),
+            "target":args.url or "in-process",
+            "python":sys.version.split()[0],
+            "platform":platform.platform(),
+            "cpu":platform.processor() or platform.machine(),
+            "cpu_count":os.cpu_count(),
+            "image_format":args.image_format,
+            "unique_uploads":not args.allow_cache,
+            "settings":{
+                "INFERENCE_BACKEND":get_settings.INFERENCE_BACKEND,
+                "MODEL_PRECISION":get_settings.MODEL_PRECISION,
+                "INFERENCE_WORKERS":get_settings.INFERENCE_WORKERS,
+                "ENABLE_BATCHING":get_settings.ENABLE_BATCHING,
+                "MAX_BATCH_SIZE":get_settings.MAX_BATCH_SIZE,
+                "IMAGE_SIZE":get_settings.IMAGE_SIZE
+            },
+            #process-lifetime peak of the benchmark process (includes the app when in-process)
+            "max_rss_mb":resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        },
+        "scenarios":scenarios
+    }
+
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url",default=None,help="base URL of a running server (default: in-process ASGI)")
+    parser.add_argument("--server-pid",type=int,default=None,help="PID of the server to sample RSS from with --url")
+    parser.add_argument("--endpoints",default="classify,batch,annotate",help=f"comma-separated subset of {','.join(ENDPOINTS)}")
+    parser.add_argument("--sizes",default="640x480,1920x1080",help="comma-separated WIDTHxHEIGHT list")
+    parser.add_argument("--densities",default="3,30",help="comma-separated object counts per image")
+    parser.add_argument("--concurrency",default="1,8",help="comma-separated concurrent client counts")
+    parser.add_argument("--requests",type=int,default=50,help="requests per scenario")
+    parser.add_argument("--batch-files",type=int,default=8,help="images per /api/batch_classify request")
+    parser.add_argument("--image-format",choices=sorted(MEDIA_TYPES),default="jpeg")
+    parser.add_argument("--variants",type=int,default=8,help="distinct synthetic images per size and density")
+    parser.add_argument("--warmup",type=int,default=3,help="unmeasured requests per endpoint before each size/density")
+    parser.add_argument("--allow-cache",action="store_true",help="send byte-identical uploads, letting the result cache answer")
+    parser.add_argument("--seed",type=int,default=0)
+    parser.add_argument("--timeout",type=float,default=120.0)
+    parser.add_argument("--ready-timeout",type=float,default=600.0,help="seconds to wait for the model to load")
+    parser.add_argument("--output",type=Path,default=None,help="write the results as JSON (a baseline for --compare)")
+    parser.add_argument("--compare",type=Path,default=None,help="baseline JSON to compare p95 latency and throughput against")
+    parser.add_argument("--tolerance",type=float,default=0.1,help="relative change tolerated by --compare")
+    args=parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    for endpoint in args.endpoints.split(","):
+        if endpoint not in ENDPOINTS:
+            parser.error(f"Unknown endpoint '{endpoint}', expected one of {', '.join(ENDPOINTS)}")
+
+    report=asyncio.run(run(args))
+    if args.output:
+        args.output.write_text(json.dumps(report,indent=2))
+        logger.info(f"Wrote {args.output}")
+    if args.compare:
+        regressions=compare(report,json.loads(args.compare.read_text()),args.tolerance)
+        if regressions:
+            logger.error("Regressions against %s:\n  %s",args.compare,"\n  ".join(regressions))
+            raise SystemExit(1)
+        logger.info(f"No regressions beyond {args.tolerance:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
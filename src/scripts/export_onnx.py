@@ -0,0 +1,47 @@
+"""
+Export models/best.pt to ONNX for the onnx inference backend.
+
+Usage (from src/):
+    python -m scripts.export_onnx [--output models/best.onnx] [--opset 17] [--static]
+"""
+import argparse
+import logging
+import shutil
+from pathlib import Path
+
+from helpers.Settings import get_settings
+
+logger=logging.getLogger(__name__)
+
+MODELS_DIR=Path(__file__).resolve().parents[1] / "models"
+
+
+def export_onnx(weights:Path,output:Path,imgsz:int,opset:int,dynamic:bool)->Path:
+    """Export the weights with Ultralytics and move the graph to `output`"""
+    from ultralytics import YOLO
+
+    model=YOLO(weights)
+    #Ultralytics stores the class names in the ONNX metadata, the backend reads them back
+    exported=Path(model.export(format="onnx",imgsz=imgsz,opset=opset,dynamic=dynamic,simplify=True))
+    output.parent.mkdir(parents=True,exist_ok=True)
+    if exported.resolve() != output.resolve():
+        shutil.move(str(exported),str(output))
+    return output
+
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights",type=Path,default=MODELS_DIR / "best.pt")
+    parser.add_argument("--output",type=Path,default=Path(get_settings.ONNX_MODEL_PATH) if get_settings.ONNX_MODEL_PATH else MODELS_DIR / "best.onnx")
+    parser.add_argument("--imgsz",type=int,default=get_settings.IMAGE_SIZE)
+    parser.add_argument("--opset",type=int,default=17)
+    parser.add_argument("--static",action="store_true",help="fixed batch and input size instead of dynamic axes")
+    args=parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    output=export_onnx(args.weights,args.output,args.imgsz,args.opset,dynamic=not args.static)
+    logger.info(f"Exported {args.weights} to {output}, serve it with INFERENCE_BACKEND=onnx")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Measure per-worker memory of the multi-worker launch modes (Linux only).
+
+Starts the API twice with the same number of workers:
+
+    uvicorn   `uvicorn main:app --workers N`, every worker loads its own model
+    preload   `gunicorn -c gunicorn.conf.py main:app`, the model is loaded in the
+              master and shared copy-on-write by the forked workers
+
+and reports, once every worker is ready and again after some traffic, the RSS,
+PSS (shared pages divided between the processes sharing them), shared and
+private memory of each worker. RSS counts shared pages in every process, so
+the total footprint is the sum of PSS.
+
+Usage (from src/):
+    python -m scripts.measure_worker_rss --workers 4 --output rss.json
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from scripts.benchmark import UploadSource, encode_variants
+
+logger=logging.getLogger(__name__)
+
+SRC_DIR=Path(__file__).resolve().parent.parent
+SMAPS_FIELDS={"Rss":"rss","Pss":"pss","Shared_Clean":"shared","Shared_Dirty":"shared","Private_Clean":"private","Private_Dirty":"private"}
+
+
+def launch_command(mode:str,workers:int,port:int)->List[str]:
+    if mode == "uvicorn":
+        return [sys.executable,"-m","uvicorn","main:app","--host","127.0.0.1","--port",str(port),"--workers",str(workers)]
+    return [sys.executable,"-m","gunicorn","-c","gunicorn.conf.py","main:app"]
+
+
+def read_memory_mb(pid:int)->Dict[str,float]:
+    """rss/pss/shared/private of a process from /proc/<pid>/smaps_rollup, in MB"""
+    memory={"rss":0.0,"pss":0.0,"shared":0.0,"private":0.0}
+    with open(f"/proc/{pid}/smaps_rollup") as rollup:
+        for line in rollup:
+            field,_,value=line.partition(":")
+            if field in SMAPS_FIELDS:
+                memory[SMAPS_FIELDS[field]]+=int(value.split()[0]) / 1024
+    return {key:round(value,1) for key,value in memory.items()}
+
+
+def child_pids(pid:int)->List[int]:
+    children=[]
+    for task in Path(f"/proc/{pid}/task").iterdir():
+        children.extend(int(child) for child in (task / "children").read_text().split())
+    return children
+
+
+def worker_pids(master:int)->List[int]:
+    """Server workers among the children of the master, without multiprocessing helper processes"""
+    workers=[]
+    for pid in child_pids(master):
+        cmdline=Path(f"/proc/{pid}/cmdline").read_bytes().replace(b"\0",b" ").decode(errors="replace")
+        if "resource_tracker" not in cmdline:
+            workers.append(pid)
+    return workers
+
+
+def wait_until_ready(client,workers:int,timeout:float):
+    """Readiness is answered by whichever worker accepts, require a run of successes across workers"""
+    deadline=time.monotonic() + timeout
+    successes=0
+    while successes < workers * 4:
+        if time.monotonic() > deadline:
+            raise SystemExit(f"Server not ready after {timeout:.0f}s")
+        try:
+            successes=successes + 1 if client.get("/api/health/ready").status_code == 200 else 0
+        except Exception:
+            successes=0
+            time.sleep(0.5)
+
+
+def snapshot(master:int)->dict:
+    workers=[{"pid":pid,**read_memory_mb(pid)} for pid in worker_pids(master)]
+    master_memory=read_memory_mb(master)
+    return {
+        "master":master_memory,
+        "workers":workers,
+        "per_worker_rss_mb":round(sum(w["rss"] for w in workers) / max(1,len(workers)),1),
+        "per_worker_private_mb":round(sum(w["private"] for w in workers) / max(1,len(workers)),1),
+        "total_pss_mb":round(master_memory["pss"] + sum(w["pss"] for w in workers),1)
+    }
+
+
+def send_traffic(client,requests:int,seed:int):
+    source=UploadSource(encode_variants(1280,720,10,"jpeg",4,seed),unique=True)
+    for _ in range(requests):
+        client.post("/api/classify",files={"file":("rss.jpg",source.next(),"image/jpeg")})
+
+
+def measure(mode:str,args)->dict:
+    import httpx
+
+    port=args.port
+    env={**os.environ,"WEB_WORKERS":str(args.workers),"WEB_BIND":f"127.0.0.1:{port}"}
+    server=subprocess.Popen(launch_command(mode,args.workers,port),cwd=SRC_DIR,env=env)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}",timeout=args.timeout) as client:
+            started=time.perf_counter()
+            wait_until_ready(client,args.workers,args.ready_timeout)
+            ready_seconds=time.perf_counter() - started
+            time.sleep(args.settle)
+            idle=snapshot(server.pid)
+            send_traffic(client,args.requests,args.seed)
+            time.sleep(args.settle)
+            loaded=snapshot(server.pid)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    logger.info(
+        f"{mode}: ready in {ready_seconds:.1f}s, per-worker RSS {idle['per_worker_rss_mb']}MB "
+        f"(private {idle['per_worker_private_mb']}MB), total PSS {idle['total_pss_mb']}MB; "
+        f"after {args.requests} requests: per-worker RSS {loaded['per_worker_rss_mb']}MB "
+        f"(private {loaded['per_worker_private_mb']}MB), total PSS {loaded['total_pss_mb']}MB"
+    )
+    return {"mode":mode,"ready_seconds":round(ready_seconds,1),"idle":idle,"after_traffic":loaded}
+
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers",type=int,default=4)
+    parser.add_argument("--modes",default="uvicorn,preload",help="comma separated: uvicorn, preload")
+    parser.add_argument("--port",type=int,default=8765)
+    parser.add_argument("--requests",type=int,default=50,help="requests sent before the second measurement")
+    parser.add_argument("--settle",type=float,default=5.0,help="seconds to wait before each measurement")
+    parser.add_argument("--timeout",type=float,default=120.0)
+    parser.add_argument("--ready-timeout",type=float,default=600.0)
+    parser.add_argument("--seed",type=int,default=0)
+    parser.add_argument("--output",default=None,help="write the results as JSON")
+    args=parser.parse_args()
+    logging.basicConfig(level=logging.INFO,format="%(message)s")
+
+    if not Path("/proc/self/smaps_rollup").exists():
+        raise SystemExit("Per-process memory is read from /proc/<pid>/smaps_rollup (Linux 4.14+)")
+    results={"workers":args.workers,"modes":[measure(mode,args) for mode in args.modes.split(",")]}
+    if args.output:
+        Path(args.output).write_text(json.dumps(results,indent=2))
+        logger.info(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
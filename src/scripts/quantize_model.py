@@ -0,0 +1,255 @@
+"""
+Build an INT8 variant of the detector and report its cost/benefit against FP32.
+
+The FP32 ONNX graph (scripts.export_onnx) is quantized with ONNX Runtime, either
+statically (QDQ, calibrated on a local folder of images) or dynamically
+(weights only). Both graphs are then run on the evaluation images and a JSON
+report with per-image latency, throughput and detection agreement is written.
+
+Usage (from src/):
+    python -m scripts.quantize_model --calibration-dir data/calibration [--mode static|dynamic]
+    python -m scripts.quantize_model --report-only --eval-dir data/eval
+
+Serve the result with INFERENCE_BACKEND=onnx and MODEL_PRECISION=int8.
+"""
+import argparse
+import json
+import logging
+import platform
+import re
+import time
+from pathlib import Path
+from typing import List
+
+import cv2
+import numpy as np
+
+from helpers.Settings import get_settings
+from models.backends import OnnxBackend, default_onnx_path
+from models.postprocess import box_iou
+from .export_onnx import MODELS_DIR, export_onnx
+
+logger=logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS={".jpg",".jpeg",".png",".webp",".bmp"}
+
+
+def load_images(folder:Path,limit:int)->List[np.ndarray]:
+    paths=sorted(p for p in folder.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)[:limit]
+    images=[cv2.imread(str(p),cv2.IMREAD_COLOR) for p in paths]
+    images=[image for image in images if image is not None]
+    if not images:
+        raise SystemExit(f"No readable images found in {folder}")
+    return images
+
+
+def detection_head_nodes(model_path:Path)->List[str]:
+    """Nodes of the last `model.N` block (the Detect head), which is kept in FP32 for accuracy"""
+    import onnx
+    graph=onnx.load(str(model_path)).graph
+    indices=[int(m.group(1)) for node in graph.node for m in [re.search(r"/model\.(\d+)/",node.name)] if m]
+    if not indices:
+        return []
+    head=f"/model.{max(indices)}/"
+    return [node.name for node in graph.node if head in node.name]
+
+
+def quantize(fp32_path:Path,int8_path:Path,mode:str,calibration:List[np.ndarray],imgsz:int,keep_head_fp32:bool):
+    from onnxruntime.quantization import (
+        CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType, quantize_dynamic, quantize_static
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    prepared_path=fp32_path.with_suffix(".prep.onnx")
+    quant_pre_process(str(fp32_path),str(prepared_path))
+    excluded=detection_head_nodes(prepared_path) if keep_head_fp32 else []
+
+    try:
+        if mode == "dynamic":
+            quantize_dynamic(
+                str(prepared_path),str(int8_path),
+                weight_type=QuantType.QUInt8,
+                nodes_to_exclude=excluded
+            )
+            return
+
+        backend=OnnxBackend(fp32_path)
+        backend.load()
+
+        class ImageCalibrationReader(CalibrationDataReader):
+            def __init__(self):
+                self._images=iter(calibration)
+
+            def get_next(self):
+                image=next(self._images,None)
+                if image is None:
+                    return None
+                tensor,_,_=backend.preprocess(image,imgsz)
+                return {backend.input_name:tensor[None]}
+
+        quantize_static(
+            str(prepared_path),str(int8_path),
+            ImageCalibrationReader(),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            calibrate_method=CalibrationMethod.MinMax,
+            nodes_to_exclude=excluded
+        )
+    finally:
+        prepared_path.unlink(missing_ok=True)
+
+
+def match_detections(reference,candidate,iou_threshold:float):
+    """Greedy same-class matching, returns (matches, confidence deltas)"""
+    if len(reference) == 0 or len(candidate) == 0:
+        return 0,[]
+    iou=box_iou(reference.boxes,candidate.boxes)
+    iou[reference.class_ids[:,None] != candidate.class_ids[None,:]]=0
+    matched=set()
+    deltas=[]
+    for i in range(len(reference)):
+        order=np.argsort(-iou[i])
+        for j in order:
+            if iou[i,j] < iou_threshold:
+                break
+            if j not in matched:
+                matched.add(j)
+                deltas.append(float(candidate.confidences[j] - reference.confidences[i]))
+                break
+    return len(matched),deltas
+
+
+def benchmark(backend:OnnxBackend,images:List[np.ndarray],imgsz:int,batch_size:int,repeats:int):
+    conf,iou=get_settings.CONFIDENCE_THRESHOLD,get_settings.IOU_THRESHOLD
+    backend.predict_batch(images[:1],conf,iou,imgsz)
+
+    latencies=[]
+    detections=[]
+    for image in images:
+        runs=[]
+        for _ in range(repeats):
+            start=time.perf_counter()
+            result=backend.predict_batch([image],conf,iou,imgsz)[0]
+            runs.append(time.perf_counter() - start)
+        latencies.append(min(runs))
+        detections.append(result)
+
+    start=time.perf_counter()
+    for offset in range(0,len(images),batch_size):
+        backend.predict_batch(images[offset:offset+batch_size],conf,iou,imgsz)
+    throughput=len(images) / (time.perf_counter() - start)
+
+    latencies_ms=np.asarray(latencies) * 1000
+    return {
+        "latency_ms":{
+            "mean":float(latencies_ms.mean()),
+            "p50":float(np.percentile(latencies_ms,50)),
+            "p95":float(np.percentile(latencies_ms,95)),
+            "per_image":[round(float(v),3) for v in latencies_ms]
+        },
+        "throughput_images_per_s":throughput,
+        "batch_size":batch_size,
+        "total_detections":int(sum(len(d) for d in detections))
+    },detections
+
+
+def build_report(fp32_path:Path,int8_path:Path,images:List[np.ndarray],imgsz:int,batch_size:int,repeats:int,iou_threshold:float):
+    fp32=OnnxBackend(fp32_path,intra_op_threads=get_settings.ONNX_INTRA_OP_THREADS)
+    int8=OnnxBackend(int8_path,intra_op_threads=get_settings.ONNX_INTRA_OP_THREADS)
+    fp32.load()
+    int8.load()
+    fp32_stats,fp32_detections=benchmark(fp32,images,imgsz,batch_size,repeats)
+    int8_stats,int8_detections=benchmark(int8,images,imgsz,batch_size,repeats)
+
+    matches=0
+    deltas=[]
+    for reference,candidate in zip(fp32_detections,int8_detections):
+        matched,image_deltas=match_detections(reference,candidate,iou_threshold)
+        matches += matched
+        deltas.extend(image_deltas)
+    reference_total=fp32_stats["total_detections"]
+    candidate_total=int8_stats["total_detections"]
+    recall=matches / reference_total if reference_total else 1.0
+    precision=matches / candidate_total if candidate_total else 1.0
+
+    return {
+        "images":len(images),
+        "image_size":imgsz,
+        "cpu":platform.processor() or platform.machine(),
+        "models":{
+            "fp32":{"path":str(fp32_path),"size_mb":fp32_path.stat().st_size / 2**20},
+            "int8":{"path":str(int8_path),"size_mb":int8_path.stat().st_size / 2**20}
+        },
+        "fp32":fp32_stats,
+        "int8":int8_stats,
+        "speedup":{
+            "latency_p50":fp32_stats["latency_ms"]["p50"] / int8_stats["latency_ms"]["p50"],
+            "throughput":int8_stats["throughput_images_per_s"] / fp32_stats["throughput_images_per_s"]
+        },
+        "agreement":{
+            "iou_threshold":iou_threshold,
+            "matched":matches,
+            "recall_vs_fp32":recall,
+            "precision_vs_fp32":precision,
+            "f1_vs_fp32":2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            "mean_confidence_delta":float(np.mean(deltas)) if deltas else 0.0
+        }
+    }
+
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights",type=Path,default=MODELS_DIR / "best.pt")
+    parser.add_argument("--fp32",type=Path,default=None,help="FP32 ONNX graph, exported from --weights if missing")
+    parser.add_argument("--output",type=Path,default=None,help="INT8 ONNX graph (default models/best.int8.onnx)")
+    parser.add_argument("--calibration-dir",type=Path,help="folder of representative images for static calibration")
+    parser.add_argument("--eval-dir",type=Path,help="folder of images for the report (default: calibration images)")
+    parser.add_argument("--mode",choices=["static","dynamic"],default="static")
+    parser.add_argument("--max-images",type=int,default=200)
+    parser.add_argument("--quantize-head",action="store_true",help="also quantize the Detect head (faster, less accurate)")
+    parser.add_argument("--report",type=Path,default=None,help="JSON report path (default next to the INT8 graph)")
+    parser.add_argument("--report-only",action="store_true",help="skip quantization and only compare existing graphs")
+    parser.add_argument("--batch-size",type=int,default=get_settings.MAX_BATCH_SIZE)
+    parser.add_argument("--repeats",type=int,default=3)
+    parser.add_argument("--match-iou",type=float,default=0.5)
+    args=parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    #validated before any export or quantization work
+    if not args.report_only and args.mode == "static" and args.calibration_dir is None:
+        parser.error("--calibration-dir is required for static quantization")
+    eval_dir=args.eval_dir or args.calibration_dir
+    if eval_dir is None:
+        parser.error("the report needs images: pass --eval-dir (or --calibration-dir)")
+    if not eval_dir.is_dir():
+        parser.error(f"image folder {eval_dir} does not exist")
+
+    imgsz=get_settings.IMAGE_SIZE
+    fp32_path=args.fp32 or (Path(get_settings.ONNX_MODEL_PATH) if get_settings.ONNX_MODEL_PATH else default_onnx_path(args.weights))
+    int8_path=args.output or (Path(get_settings.ONNX_INT8_MODEL_PATH) if get_settings.ONNX_INT8_MODEL_PATH else default_onnx_path(args.weights,"int8"))
+    if not fp32_path.exists():
+        logger.info(f"Exporting {args.weights} to {fp32_path}")
+        export_onnx(args.weights,fp32_path,imgsz,opset=17,dynamic=True)
+
+    if not args.report_only:
+        calibration=load_images(args.calibration_dir,args.max_images) if args.calibration_dir else []
+        logger.info(f"Quantizing {fp32_path} ({args.mode}, {len(calibration)} calibration images)")
+        quantize(fp32_path,int8_path,args.mode,calibration,imgsz,keep_head_fp32=not args.quantize_head)
+        logger.info(f"Wrote {int8_path}")
+
+    images=load_images(eval_dir,args.max_images)
+    report=build_report(fp32_path,int8_path,images,imgsz,args.batch_size,args.repeats,args.match_iou)
+    report["quantization"]={"mode":args.mode,"head_quantized":args.quantize_head}
+
+    report_path=args.report or int8_path.with_suffix(".report.json")
+    report_path.write_text(json.dumps(report,indent=2))
+    logger.info(
+        f"p50 latency fp32 {report['fp32']['latency_ms']['p50']:.1f}ms -> int8 {report['int8']['latency_ms']['p50']:.1f}ms, "
+        f"throughput x{report['speedup']['throughput']:.2f}, F1 vs fp32 {report['agreement']['f1_vs_fp32']:.3f}. "
+        f"Report: {report_path}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+import os
+import sys
+from pathlib import Path
+
+SRC_DIR=Path(__file__).resolve().parent.parent
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0,str(SRC_DIR))
+
+#settings without defaults, normally read from src/.env
+REQUIRED_SETTINGS={
+    "APP_NAME":"Garbage Classification API",
+    "APP_VERSION":"test",
+    "IMAGE_SIZE":"640",
+    "CONFIDENCE_THRESHOLD":"0.5",
+    "IOU_THRESHOLD":"0.45",
+    "ALLOWED_IMAGE_TYPES":'["image/jpeg","image/png","image/jpg","image/webp"]',
+}
+for key,value in REQUIRED_SETTINGS.items():
+    os.environ.setdefault(key,value)
@@ -0,0 +1,116 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from models.batch_scheduler import BatchScheduler
+
+
+def frame(value:int)->np.ndarray:
+    return np.full((2,2,3),value,dtype=np.uint8)
+
+
+class RecordingBackend:
+    """submit_batch stand-in answering every image with its fill value, or holding batches until released"""
+    def __init__(self,hold:bool=False,error:Exception=None):
+        self.hold=hold
+        self.error=error
+        self.batches=[]
+        self.pending=[]
+        self.dispatched=threading.Event()
+
+    def submit_batch(self,images):
+        self.batches.append([int(image[0,0,0]) for image in images])
+        future=Future()
+        if self.error is not None:
+            future.set_exception(self.error)
+        elif self.hold:
+            self.pending.append((future,self.batches[-1]))
+        else:
+            future.set_result(self.batches[-1])
+        self.dispatched.set()
+        return future
+
+    def release(self):
+        for future,values in self.pending:
+            future.set_result(values)
+        self.pending=[]
+
+
+def test_concurrent_requests_share_one_batch():
+    backend=RecordingBackend()
+    scheduler=BatchScheduler(backend.submit_batch,max_batch_size=8,max_wait_ms=200)
+    futures=[scheduler.submit(frame(value)) for value in range(4)]
+    assert [future.result(timeout=5) for future in futures] == [0,1,2,3]
+    assert backend.batches == [[0,1,2,3]]
+    assert scheduler.stats()["average_batch_size"] == 4
+    scheduler.close()
+
+
+def test_batches_are_capped_at_max_batch_size():
+    backend=RecordingBackend()
+    scheduler=BatchScheduler(backend.submit_batch,max_batch_size=2,max_wait_ms=200)
+    futures=[scheduler.submit(frame(value)) for value in range(5)]
+    assert [future.result(timeout=5) for future in futures] == [0,1,2,3,4]
+    assert max(len(batch) for batch in backend.batches) <= 2
+    assert sorted(value for batch in backend.batches for value in batch) == [0,1,2,3,4]
+    scheduler.close()
+
+
+def test_requests_accumulate_while_all_inference_slots_are_busy():
+    backend=RecordingBackend(hold=True)
+    scheduler=BatchScheduler(backend.submit_batch,max_batch_size=8,max_wait_ms=50,max_inflight=1)
+    first=scheduler.submit(frame(0))
+    assert backend.dispatched.wait(5)
+    waiting=[scheduler.submit(frame(value)) for value in (1,2,3)]
+    time.sleep(0.05)
+    assert backend.batches == [[0]]
+
+    backend.dispatched.clear()
+    backend.release()
+    assert first.result(timeout=5) == 0
+    assert backend.dispatched.wait(5)
+    backend.release()
+    assert [future.result(timeout=5) for future in waiting] == [1,2,3]
+    assert backend.batches == [[0],[1,2,3]]
+    scheduler.close()
+
+
+def test_batch_failure_is_reported_to_every_request():
+    backend=RecordingBackend(error=RuntimeError("model crashed"))
+    scheduler=BatchScheduler(backend.submit_batch,max_batch_size=8,max_wait_ms=100)
+    futures=[scheduler.submit(frame(value)) for value in range(3)]
+    for future in futures:
+        with pytest.raises(RuntimeError,match="model crashed"):
+            future.result(timeout=5)
+    scheduler.close()
+
+
+def test_cancelled_requests_are_not_sent_to_the_model():
+    backend=RecordingBackend(hold=True)
+    scheduler=BatchScheduler(backend.submit_batch,max_batch_size=8,max_wait_ms=50,max_inflight=1)
+    scheduler.submit(frame(0))
+    assert backend.dispatched.wait(5)
+    cancelled=scheduler.submit(frame(1))
+    kept=scheduler.submit(frame(2))
+    assert cancelled.cancel()
+
+    backend.dispatched.clear()
+    backend.release()
+    assert backend.dispatched.wait(5)
+    backend.release()
+    assert kept.result(timeout=5) == 2
+    assert backend.batches == [[0],[2]]
+    scheduler.close()
+
+
+def test_close_dispatches_queued_requests_and_stops_the_thread():
+    backend=RecordingBackend()
+    scheduler=BatchScheduler(backend.submit_batch,max_batch_size=8,max_wait_ms=500)
+    futures=[scheduler.submit(frame(value)) for value in range(3)]
+    scheduler.close()
+    assert [future.result(timeout=5) for future in futures] == [0,1,2]
+    scheduler._thread.join(timeout=5)
+    assert not scheduler._thread.is_alive()
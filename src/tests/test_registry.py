@@ -0,0 +1,144 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from models.registry import ModelRegistry, ModelVersion
+
+#`models.registry` is shadowed by the registry instance re-exported from the package
+registry_module=sys.modules["models.registry"]
+
+
+class FakeClassifier:
+    """GarbageClassifier stand-in: loads instantly (or fails for weights named broken*) and records close()"""
+    def __init__(self,model_path,backend=None):
+        self.model_path=Path(model_path)
+        self.model_version=self.model_path.stem
+        self.state="not_loaded"
+        self.closed=threading.Event()
+
+    @property
+    def is_ready(self)->bool:
+        return self.state == "ready"
+
+    def load_model(self):
+        if self.model_path.stem.startswith("broken"):
+            self.state="failed"
+            raise RuntimeError("corrupt weights")
+        self.state="ready"
+
+    def load_status(self)->dict:
+        return {"state":self.state}
+
+    def submit_batch(self,images):
+        raise NotImplementedError
+
+    def close(self):
+        self.closed.set()
+
+
+def wait_for(predicate,timeout:float=5.0):
+    deadline=time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline,"timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def registry(monkeypatch,tmp_path):
+    monkeypatch.setattr(registry_module,"GarbageClassifier",FakeClassifier)
+    initial=FakeClassifier(tmp_path / "v1.pt")
+    initial.load_model()
+    return ModelRegistry(ModelVersion("v1",initial))
+
+
+def weights(tmp_path,name:str)->Path:
+    path=tmp_path / f"{name}.pt"
+    path.write_bytes(b"weights")
+    return path
+
+
+def active_names(registry:ModelRegistry):
+    return sorted(version.name for version in registry.active_versions())
+
+
+def test_deploy_swaps_versions_and_drains_the_old_one(registry,tmp_path):
+    old=registry.acquire()
+    assert old.name == "v1"
+    with registry.use(old):
+        registry.deploy("v2",weights(tmp_path,"v2"))
+        wait_for(lambda: active_names(registry) == ["v2"])
+        #the request started on v1 keeps it until it completes
+        assert registry.current() is old
+        assert old.retired
+        assert not old.classifier.closed.is_set()
+        new=registry.acquire()
+        assert new.name == "v2"
+        registry.release(new,0.0)
+    assert old.classifier.closed.wait(5)
+    assert registry.main().name == "v2"
+    assert registry.current().name == "v2"
+
+
+def test_failed_deploy_leaves_active_versions_unchanged(registry,tmp_path):
+    version=registry.deploy("v2",weights(tmp_path,"broken"))
+    wait_for(lambda: version.classifier.state == "failed")
+    assert active_names(registry) == ["v1"]
+    assert registry.acquire().name == "v1"
+    #a failed version may be deployed again under the same name
+    registry.deploy("v2",weights(tmp_path,"v2"))
+    wait_for(lambda: active_names(registry) == ["v2"])
+
+
+def test_deploying_a_name_twice_is_rejected(registry,tmp_path):
+    with pytest.raises(ValueError):
+        registry.deploy("v1",weights(tmp_path,"v1b"))
+    with pytest.raises(FileNotFoundError):
+        registry.deploy("v3",tmp_path / "missing.pt")
+
+
+def test_weighted_split_routes_traffic_by_weight(registry,tmp_path):
+    registry.deploy("v2",weights(tmp_path,"v2"),weight=1.0)
+    wait_for(lambda: active_names(registry) == ["v1","v2"])
+    registry.set_weights({"v1":3.0})
+
+    counts={"v1":0,"v2":0}
+    for _ in range(4000):
+        version=registry.acquire()
+        counts[version.name] += 1
+        registry.release(version,0.0)
+    assert 0.2 < counts["v2"] / 4000 < 0.3
+
+    registry.set_weights({"v1":0.0})
+    picked={registry.acquire().name for _ in range(50)}
+    assert picked == {"v2"}
+
+
+def test_invalid_weights_are_rejected(registry):
+    with pytest.raises(KeyError):
+        registry.set_weights({"unknown":1.0})
+    with pytest.raises(ValueError):
+        registry.set_weights({"v1":-1.0})
+    with pytest.raises(ValueError):
+        registry.set_weights({"v1":0.0})
+
+
+def test_retire_closes_a_version_once_drained(registry,tmp_path):
+    registry.deploy("v2",weights(tmp_path,"v2"),weight=1.0)
+    wait_for(lambda: active_names(registry) == ["v1","v2"])
+    v2=next(version for version in registry.active_versions() if version.name == "v2")
+    registry.set_weights({"v1":0.0})
+    pinned=registry.acquire()
+    assert pinned is v2
+    registry.set_weights({"v1":1.0})
+
+    registry.retire("v2")
+    assert active_names(registry) == ["v1"]
+    assert not v2.classifier.closed.is_set()
+    registry.release(pinned,0.0)
+    assert v2.classifier.closed.wait(5)
+
+    with pytest.raises(ValueError):
+        registry.retire("v1")
@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import pytest
+
+from Services.result_cache import ResultCache
+
+
+def test_concurrent_requests_for_one_key_share_a_single_computation():
+    cache=ResultCache(max_entries=8,ttl_seconds=60)
+    calls=[]
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"total_objects":3}
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_compute("key",compute) for _ in range(5)))
+
+    results=asyncio.run(run())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert (cache.misses,cache.coalesced,cache.hits) == (1,4,0)
+
+    assert asyncio.run(cache.get_or_compute("key",compute)) is results[0]
+    assert cache.hits == 1
+    assert len(calls) == 1
+
+
+def test_failure_reaches_every_waiter_and_is_not_cached():
+    cache=ResultCache(max_entries=8,ttl_seconds=60)
+    calls=[]
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise ValueError("decode failed")
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_compute("key",failing) for _ in range(3)),return_exceptions=True)
+
+    errors=asyncio.run(run())
+    assert len(calls) == 1
+    assert all(isinstance(error,ValueError) for error in errors)
+    assert len(cache) == 0
+
+    async def succeeding():
+        return {"total_objects":0}
+
+    assert asyncio.run(cache.get_or_compute("key",succeeding)) == {"total_objects":0}
+
+
+def test_cancelled_producer_fails_waiters_instead_of_hanging():
+    cache=ResultCache(max_entries=8,ttl_seconds=60)
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def run():
+        producer=asyncio.ensure_future(cache.get_or_compute("key",slow))
+        await asyncio.sleep(0)
+        waiter=asyncio.ensure_future(cache.get_or_compute("key",slow))
+        await asyncio.sleep(0)
+        producer.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(waiter,timeout=1)
+
+    asyncio.run(run())
+    assert len(cache) == 0
+
+
+def test_rejected_values_reach_waiters_but_are_not_stored():
+    cache=ResultCache(max_entries=8,ttl_seconds=60,cacheable=lambda result: not result.get("reused"))
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        return {"reused":True}
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_compute("key",compute) for _ in range(3)))
+
+    assert asyncio.run(run()) == [{"reused":True}] * 3
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache=ResultCache(max_entries=2,ttl_seconds=60)
+    cache.put("a",1)
+    cache.put("b",2)
+    assert cache.get("a") == 1
+    cache.put("c",3)
+    assert cache.get("b") is None
+    assert (cache.get("a"),cache.get("c")) == (1,3)
+    assert cache.evictions == 1
+
+
+def test_entries_expire_after_ttl():
+    cache=ResultCache(max_entries=8,ttl_seconds=0.01)
+    cache.put("a",1)
+    time.sleep(0.03)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_disabled_cache_always_computes():
+    cache=ResultCache(max_entries=8,ttl_seconds=60,enabled=False)
+    calls=[]
+
+    async def compute():
+        calls.append(1)
+        return len(calls)
+
+    assert asyncio.run(cache.get_or_compute("key",compute)) == 1
+    assert asyncio.run(cache.get_or_compute("key",compute)) == 2
+    assert len(cache) == 0
@@ -0,0 +1,76 @@
+import numpy as np
+
+from models.detections import Detections
+from models.tiling import merge_boxes, merge_tile_detections, tile_grid, tile_starts
+
+
+def detections(*rows)->Detections:
+    """Detections from (class_id, confidence, x1, y1, x2, y2) rows"""
+    if not rows:
+        return Detections.empty()
+    data=np.asarray(rows,dtype=np.float32)
+    return Detections.from_arrays(data[:,0],data[:,1],data[:,2:])
+
+
+def test_tile_starts_cover_the_length_with_the_last_tile_on_the_border():
+    assert tile_starts(500,640,0.2) == [0]
+    assert tile_starts(640,640,0.2) == [0]
+    starts=tile_starts(1500,640,0.25)
+    assert starts == [0,480,860]
+    assert starts[-1] + 640 == 1500
+
+
+def test_tile_grid_covers_the_image():
+    height,width=1080,1920
+    covered=np.zeros((height,width),dtype=bool)
+    tiles=tile_grid(height,width,640,0.2)
+    for x1,y1,x2,y2 in tiles:
+        assert x2 - x1 == 640 and y2 - y1 == 640
+        covered[y1:y2,x1:x2]=True
+    assert covered.all()
+    assert len(tiles) == len(tile_starts(width,640,0.2)) * len(tile_starts(height,640,0.2))
+
+
+def test_object_cut_by_a_tile_border_is_merged_into_one_box():
+    #tile A at x=0 sees the left part of the object, tile B at x=500 sees all of it
+    left_part=detections((1,0.6,560,100,640,200))
+    whole=detections((1,0.9,60,100,200,200))
+    merged=merge_tile_detections([left_part,whole],[(0,0),(500,0)],threshold=0.5)
+    assert len(merged) == 1
+    assert merged.class_ids.tolist() == [1]
+    assert merged.confidences.tolist() == [np.float32(0.9)]
+    assert merged.boxes.tolist() == [[560,100,700,200]]
+
+
+def test_overlapping_boxes_of_different_classes_are_kept():
+    merged=merge_tile_detections(
+        [detections((1,0.9,0,0,100,100)),detections((2,0.8,0,0,100,100))],
+        [(0,0),(0,0)],
+        threshold=0.5
+    )
+    assert sorted(merged.class_ids.tolist()) == [1,2]
+
+
+def test_boxes_below_the_merge_threshold_stay_apart():
+    class_ids=np.asarray([0,0],dtype=np.int64)
+    confidences=np.asarray([0.9,0.8],dtype=np.float32)
+    boxes=np.asarray([[0,0,100,100],[80,0,180,100]],dtype=np.float32)
+    _,kept_confidences,kept_boxes=merge_boxes(class_ids,confidences,boxes,threshold=0.5)
+    assert kept_confidences.tolist() == [np.float32(0.9),np.float32(0.8)]
+    assert kept_boxes.tolist() == boxes.tolist()
+
+
+def test_merge_keeps_confidence_order_and_shifts_by_tile_origin():
+    merged=merge_tile_detections(
+        [detections((0,0.3,0,0,10,10)),detections(),detections((0,0.7,0,0,10,10))],
+        [(0,0),(100,0),(200,300)],
+        threshold=0.5
+    )
+    assert merged.confidences.tolist() == [np.float32(0.7),np.float32(0.3)]
+    assert merged.boxes.tolist() == [[200,300,210,310],[0,0,10,10]]
+
+
+def test_merging_nothing_returns_empty_detections():
+    merged=merge_tile_detections([detections(),detections()],[(0,0),(640,0)],threshold=0.5)
+    assert len(merged) == 0
+    assert merged.boxes.shape == (0,4)